@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, users, products, dashboard, menus, templates, generations, admin_drive, attachments, drive
+from app.api.v1.endpoints import auth, users, products, dashboard, menus, templates, generations, admin_drive, admin_cache, attachments, drive, files
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -11,5 +11,7 @@ api_router.include_router(menus.router, prefix="/menus", tags=["menus"])
 api_router.include_router(templates.router, prefix="/templates", tags=["templates"])
 api_router.include_router(generations.router, prefix="/generations", tags=["generations"])
 api_router.include_router(admin_drive.router, prefix="/admin/drive", tags=["admin"])
+api_router.include_router(admin_cache.router, prefix="/admin/cache", tags=["admin"])
 api_router.include_router(drive.router, prefix="/drive", tags=["drive"])
-api_router.include_router(attachments.router, prefix="/attachments", tags=["attachments"]) 
\ No newline at end of file
+api_router.include_router(attachments.router, prefix="/attachments", tags=["attachments"]) 
+api_router.include_router(files.router, prefix="/files", tags=["files"])
\ No newline at end of file
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app import models
+from app.services.annex_cache import annex_cache
+from app.services.docx_service import docx_service
+from app.services.drive_client_pool import drive_client_pool
+from app.services.drive_guard import drive_guard
+from app.services.drive_sharing import drive_sharing
+from app.services.folder_cache import folder_cache
+from app.services.pdf_cache import pdf_cache
+from app.services.purge_queue import purge_worker
+from app.services.setting_cache import setting_cache
+from app.services.template_cache import template_cache
+from app.services.thumbnails import thumbnail_resolver
+
+router = APIRouter()
+
+
+@router.get("/stats", tags=["admin"], summary="Get in-process cache statistics")
+def get_cache_stats(
+    *,
+    current_user: models.User = Depends(deps.get_current_admin_user),
+):
+    """Compteurs des caches du processus courant (hits/misses/évictions)."""
+    return {
+        "docx_templates": docx_service.cache_stats(),
+        "template_files": template_cache.stats(),
+        "pdf_annexes": annex_cache.stats(),
+        "converted_pdfs": pdf_cache.stats(),
+        "drive_folders": folder_cache.stats(),
+        "settings": setting_cache.stats(),
+        "drive_clients": drive_client_pool.stats(),
+        "drive_api": drive_guard.stats(),
+        "drive_purge": purge_worker.stats(),
+        "drive_sharing": drive_sharing.stats(),
+        "thumbnails": thumbnail_resolver.stats(),
+    }
@@ -4,6 +4,7 @@ import json
 
 from app.api import deps
 from app import crud, models
+from app.services.google_drive import google_drive_service
 
 router = APIRouter()
 
@@ -16,8 +17,8 @@ def get_drive_config(
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_admin_user),
 ):
-    creds = crud.setting.get_value(db, SETTINGS_CREDENTIALS)
-    folder_id = crud.setting.get_value(db, SETTINGS_FOLDER)
+    creds = crud.setting.get_cached_value(SETTINGS_CREDENTIALS, db=db)
+    folder_id = crud.setting.get_cached_value(SETTINGS_FOLDER, db=db)
     return {
         "configured": creds is not None,
         "root_folder_id": folder_id,
@@ -39,6 +40,7 @@ async def upload_credentials(
         raise HTTPException(status_code=400, detail="JSON invalide")
 
     crud.setting.set_value(db, SETTINGS_CREDENTIALS, content.decode("utf-8"), "Google Drive service account JSON")
+    google_drive_service.evict_clients()
     return {"detail": "Credentials saved"}
 
 @router.post("/folder", tags=["admin"], summary="Set Drive root folder ID")
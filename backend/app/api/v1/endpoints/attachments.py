@@ -5,7 +5,10 @@ import pathlib
 
 from app import schemas, models, crud
 from app.api import deps
-from app.services.google_drive import google_drive_service
+from app.services import executors, file_dedup
+from app.services.purge_queue import enqueue_deletion, purge_worker
+from app.services.storage import async_storage
+from app.services.thumbnails import thumbnail_resolver
 
 router = APIRouter()
 
@@ -20,7 +23,7 @@ async def upload_attachment(
     current_user: models.User = Depends(deps.get_current_active_user),
 ):
     """Upload d'une pièce jointe et création du modèle Attachment."""
-    product = crud.product.get(db, id=str(product_id))
+    product = await executors.run_in_thread("io", crud.product.get, db, id=str(product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -32,29 +35,32 @@ async def upload_attachment(
 
     effective_alias = ALIAS_BY_FIELD.get(field_key, field_key)
 
-    # Chemin Drive: <Client>/<Produit>/<Ref_formule>/Annexes
-    client_folder = (product.nom_client or "SansClient").strip() or "SansClient"
-    product_folder = (product.nom_produit or str(product.id)).strip() or str(product.id)
-    ref_folder = (product.ref_formule or "REF").strip() or "REF"
-    formula_drive_id = google_drive_service.ensure_folder([
-        client_folder,
-        product_folder,
-        ref_folder,
-        "Annexes",
-    ])
-
     # Renomme le fichier selon l'alias avec l'extension d'origine
     ext = pathlib.Path(file.filename).suffix or ""
     stored_filename = f"{effective_alias}{ext}"
 
-    drive_file_id = google_drive_service.upload(
-        file.file,
-        stored_filename,
-        mime_type=file.content_type or "application/octet-stream",
-        parent_id=formula_drive_id,
-    )
-
-    url = google_drive_service.get_thumbnail_url(drive_file_id)
+    # Même document déjà joint à un produit du même dossier (rapport SPF...) : fichier Drive réutilisé
+    content_digest = await executors.run_in_thread("io", file_dedup.digest, file.file)
+    drive_file_id = await executors.run_in_thread("io", file_dedup.find_existing, db, content_digest, product=product)
+    if drive_file_id is None:
+        # Chemin Drive: <Client>/<Produit>/<Ref_formule>/Annexes
+        client_folder = (product.nom_client or "SansClient").strip() or "SansClient"
+        product_folder = (product.nom_produit or str(product.id)).strip() or str(product.id)
+        ref_folder = (product.ref_formule or "REF").strip() or "REF"
+        formula_drive_id = await async_storage.ensure_folder([
+            client_folder,
+            product_folder,
+            ref_folder,
+            "Annexes",
+        ])
+
+        # Envoi depuis le fichier temporaire, par morceaux pour les gros fichiers
+        drive_file_id = await async_storage.upload(
+            file.file,
+            stored_filename,
+            mime_type=file.content_type or "application/octet-stream",
+            parent_id=formula_drive_id,
+        )
 
     attachment_in = schemas.AttachmentCreate(
         product_id=product_id,
@@ -63,10 +69,12 @@ async def upload_attachment(
         drive_file_id=drive_file_id,
         file_name=stored_filename,
         mime_type=file.content_type,
-        url=url,
+        url=None,  # miniature résolue en arrière-plan (services/thumbnails.py)
+        content_hash=content_digest.sha256,
     )
 
-    attachment = crud.attachment.create(db, obj_in=attachment_in)
+    attachment = await executors.run_in_thread("io", crud.attachment.create, db, obj_in=attachment_in)
+    thumbnail_resolver.wake()
     return attachment
 
 
@@ -91,12 +99,8 @@ async def delete_attachment(
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
 
-    # Delete file on Drive (silently if fails)
-    try:
-        if attachment.drive_file_id:
-            google_drive_service.delete(attachment.drive_file_id)
-    except Exception:
-        pass
-
+    # Le fichier Drive est supprimé en arrière-plan (file de purge)
+    enqueue_deletion(db, [attachment.drive_file_id], reason="attachment")
     crud.attachment.remove(db, id=str(attachment_id))
+    purge_worker.wake()
     return 
\ No newline at end of file
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 import json
 from app.api import deps
 from app import crud, models
+from app.services.google_drive import google_drive_service
 
 router = APIRouter()
 
@@ -17,8 +18,8 @@ def get_drive_config(
     key_credentials = f"drive_credentials_{current_user.id}"
     key_folder = f"drive_root_folder_id_{current_user.id}"
 
-    creds = crud.setting.get_value(db, key_credentials)
-    folder_id = crud.setting.get_value(db, key_folder)
+    creds = crud.setting.get_cached_value(key_credentials, db=db)
+    folder_id = crud.setting.get_cached_value(key_folder, db=db)
     return {
         "configured": creds is not None,
         "root_folder_id": folder_id,
@@ -48,6 +49,7 @@ async def upload_credentials(
         content.decode("utf-8"),
         f"Google Drive service account JSON for user {current_user.id}",
     )
+    google_drive_service.evict_clients(str(current_user.id))
     return {"detail": "Credentials enregistrés"}
 
 
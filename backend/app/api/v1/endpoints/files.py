@@ -0,0 +1,30 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from app.services.local_storage import LocalStorageBackend
+from app.services.storage import storage
+
+router = APIRouter()
+
+
+@router.get("/{file_id:path}", summary="Serve a file from local storage")
+def get_file(file_id: str, sig: str = ""):
+    """Sert un fichier du stockage local (``STORAGE_BACKEND=local``).
+
+    Pas de JWT (URLs utilisées dans des ``<img>``) : l'URL est signée par
+    ``LocalStorageBackend.get_thumbnail_url``. ``FileResponse`` envoie le
+    fichier depuis le disque, sans le charger en mémoire.
+    """
+    if not isinstance(storage, LocalStorageBackend):
+        raise HTTPException(status_code=404, detail="Local storage disabled")
+    if not storage.check_signature(file_id, sig):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    try:
+        path = storage.path_for(file_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, filename=os.path.basename(path), content_disposition_type="inline")
@@ -1,13 +1,29 @@
+import json
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
 from sqlalchemy import cast, String
 
 from app import schemas, crud, models
 from app.api import deps
-from app.services.google_drive import google_drive_service
-from app.services.docx_service import docx_service
+from app.services import executors
+from app.services.annex_cache import annex_cache
+from app.services.storage import storage
+from app.services.generation_batch import run_batch
+from app.services.generation_queue import enqueue_generation
+from app.services.generation_service import (
+    GenerationError,
+    build_context,
+    context_hash,
+    document_filename,
+    find_reusable,
+    formula_folder_path,
+    render_and_upload_async,
+)
+from app.services.pdf_merge import merge_annexes
+from app.services.purge_queue import enqueue_deletion, purge_worker
 from app.schemas.product import ProductStatus
 
 router = APIRouter()
@@ -18,65 +34,109 @@ async def generate_document(
     db: Session = Depends(deps.get_db),
     template_id: UUID = Form(...),
     product_id: UUID = Form(...),
+    async_job: bool = Form(False),
+    force: bool = Form(False),
     current_user: models.User = Depends(deps.get_current_active_user),
 ):
+    """Génère le DOCX d'un produit.
+
+    Avec ``async_job=true``, la génération est créée ``pending`` sans fichier
+    et confiée à la file de jobs : la réponse est immédiate et l'avancement
+    se suit via ``GET /generations/{id}`` (``drive_file_id`` renseigné une
+    fois le document prêt, ``status="error"`` en cas d'échec).
+
+    Si un DOCX a déjà été rendu (ou mis en file) pour le même contexte et la
+    même version du modèle, et n'a été ni validé ni finalisé, il est renvoyé
+    tel quel (``force=true`` pour forcer un nouveau rendu).
+    """
+    # Lectures DB, contexte et mémoïsation : hors de la boucle asyncio
+    prepared = await executors.run_in_thread(
+        "io",
+        _prepare_generation,
+        db,
+        template_id=template_id,
+        product_id=product_id,
+        async_job=async_job,
+        force=force,
+        user_id=current_user.id,
+    )
+    if isinstance(prepared, models.Generation):
+        return prepared  # génération réutilisée ou mise en file
+    template, product, context, ctx_hash = prepared
+
+    try:
+        drive_file_id = await render_and_upload_async(template=template, product=product, context=context)
+    except GenerationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    generation_in = schemas.GenerationCreate(product_id=product_id, template_id=template_id)
+    return await executors.run_in_thread(
+        "io",
+        crud.generation.create_generation,
+        db,
+        obj_in=generation_in,
+        drive_file_id=drive_file_id,
+        context_hash=ctx_hash,
+    )
+
+def _prepare_generation(
+    db: Session, *, template_id: UUID, product_id: UUID, async_job: bool, force: bool, user_id
+):
+    """Renvoie la ``Generation`` finale (réutilisée ou en file) ou ce qu'il faut pour la rendre."""
     template = crud.template.get(db, id=str(template_id))
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     product = crud.product.get(db, id=str(product_id))
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    # Téléchargement du modèle depuis Google Drive
-    template_bytes = google_drive_service.download(template.drive_file_id)
-    if not template_bytes:
-        raise HTTPException(
-            status_code=424,
-            detail="Template file unavailable on Google Drive (id may be deleted)",
-        )
-
-    # Préparation du contexte : on sérialise le produit et le template
-    from app.schemas.product import Product as ProductSchema
-    product_data = ProductSchema.from_orm(product).dict()
-
-    # Récupère les pièces jointes
-    attachment_objs = crud.attachment.get_multi_by_product(db, product_id=product_id)
-    attachments = [schemas.Attachment.from_orm(a).dict() for a in attachment_objs]
-    annexes = {
-        (a.alias or a.file_name): schemas.Attachment.from_orm(a).dict() for a in attachment_objs if (a.alias or a.file_name)
-    }
 
-    # Contexte pour docxtpl
-    rendered_bytes = docx_service.render(
-        template_bytes,
-        context={
-            "product": product_data,
-            "attachments": attachments,
-            "annexes": annexes,
-        },
-    )
-    if not rendered_bytes:
-        raise HTTPException(status_code=500, detail="Failed to render DOCX document")
+    # Mémoïsation : même contexte + même version de modèle => même document
+    context = build_context(db, product)
+    ctx_hash = context_hash(context, template)
+    if not force:
+        existing = find_reusable(db, context_hash=ctx_hash)
+        if existing:
+            return existing
 
-    def _clean(s: str | None) -> str:
-        return (s or "").strip().replace(" ", "_")
+    if async_job:
+        generation_in = schemas.GenerationCreate(product_id=product_id, template_id=template_id)
+        generation = crud.generation.create_generation(db, obj_in=generation_in, context_hash=ctx_hash)
+        enqueue_generation(db, generation=generation, user_id=user_id)
+        return generation
 
-    filename_parts = [
-        _clean(product.nom_client),
-        _clean(product.marque),
-        _clean(product.nom_produit or "document"),
-    ]
-    filename = "-".join(filter(None, filename_parts)) + ".docx"
+    return template, product, context, ctx_hash
 
-    # Détermine le dossier Drive cible : <Client>/<Produit>/<Ref_formule>
-    client_folder = (product.nom_client or "SansClient").strip() or "SansClient"
-    product_folder = (product.nom_produit or str(product.id)).strip() or str(product.id)
-    ref_folder = (product.ref_formule or "REF").strip() or "REF"
-    formula_drive_id = google_drive_service.ensure_folder([client_folder, product_folder, ref_folder])
-
-    drive_file_id = google_drive_service.upload(rendered_bytes, filename, parent_id=formula_drive_id)
+@router.post("/batch")
+def generate_batch(
+    *,
+    batch_in: schemas.GenerationBatchCreate,
+    current_user: models.User = Depends(deps.get_current_active_user),
+):
+    """Génère les DIP de plusieurs produits × modèles en une requête.
+
+    La réponse est un flux NDJSON : une ligne par couple (produit, modèle),
+    émise dès que son document est uploadé (``status`` ``success`` avec
+    ``generation_id``/``drive_file_id``, ou ``error`` avec ``detail``). Un
+    document identique encore en file de jobs est renvoyé ``pending``, sans
+    ``drive_file_id``.
+    """
+    items = run_batch(batch_in.product_ids, batch_in.template_ids, user_id=current_user.id)
+    return StreamingResponse(
+        (json.dumps(item) + "\n" for item in items),
+        media_type="application/x-ndjson",
+    )
 
-    generation_in = schemas.GenerationCreate(product_id=product_id, template_id=template_id)
-    generation = crud.generation.create_generation(db, obj_in=generation_in, drive_file_id=drive_file_id)
+@router.get("/{generation_id}", response_model=schemas.Generation)
+async def read_generation(
+    *,
+    db: Session = Depends(deps.get_db),
+    generation_id: UUID,
+    current_user: models.User = Depends(deps.get_current_active_user),
+):
+    generation = crud.generation.get(db, id=str(generation_id))
+    # Comme la liste : uniquement les générations des produits de l'utilisateur
+    if not generation or str(generation.product.user_id) != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Generation not found")
     return generation
 
 @router.patch("/{generation_id}/finalize", response_model=schemas.Generation)
@@ -87,18 +147,18 @@ async def finalize_document(
     file: UploadFile = File(...),
     current_user: models.User = Depends(deps.get_current_active_user),
 ):
+    return await executors.run_in_thread("io", _finalize_document, db, generation_id, file)
+
+def _finalize_document(db: Session, generation_id: UUID, file: UploadFile) -> models.Generation:
     generation = crud.generation.get(db, id=str(generation_id))
     if not generation:
         raise HTTPException(status_code=404, detail="Generation not found")
     # Upload final file
     # Upload dans le dossier ref_formule
     product = crud.product.get(db, id=str(generation.product_id))
-    client_folder = (product.nom_client or "SansClient").strip() or "SansClient"
-    product_folder = (product.nom_produit or str(product.id)).strip() or str(product.id)
-    ref_folder = (product.ref_formule or "REF").strip() or "REF"
-    formula_drive_id = google_drive_service.ensure_folder([client_folder, product_folder, ref_folder])
+    formula_drive_id = storage.ensure_folder(formula_folder_path(product))
 
-    drive_file_id = google_drive_service.upload(file.file, file.filename, parent_id=formula_drive_id)
+    drive_file_id = storage.upload(file.file, file.filename, parent_id=formula_drive_id)
     generation = crud.generation.update(
         db,
         db_obj=generation,
@@ -134,13 +194,10 @@ async def delete_generation(
     generation = crud.generation.get(db, id=str(generation_id))
     if not generation:
         raise HTTPException(status_code=404, detail="Generation not found")
-    # Optionally delete file from Drive
-    if generation.drive_file_id:
-        try:
-            google_drive_service.delete(generation.drive_file_id)
-        except Exception:
-            pass
+    # Le fichier Drive est supprimé en arrière-plan (file de purge)
+    enqueue_deletion(db, [generation.drive_file_id], reason="generation")
     crud.generation.remove(db, id=str(generation_id))
+    purge_worker.wake()
     return
 
 # ---------------------------------------------------------------------------
@@ -155,55 +212,33 @@ async def validate_generation(
     current_user: models.User = Depends(deps.get_current_active_user),
 ):
     """Convertit la génération DOCX en PDF et marque le produit VALIDATED."""
+    return await executors.run_in_thread("io", _validate_generation, db, generation_id)
+
+def _validate_generation(db: Session, generation_id: UUID) -> models.Generation:
     generation = crud.generation.get(db, id=str(generation_id))
     if not generation:
         raise HTTPException(status_code=404, detail="Generation not found")
 
     if generation.status == "success":
         return generation  # déjà validé
+    if not generation.drive_file_id:
+        raise HTTPException(status_code=409, detail="Generation not ready yet")
 
     # Télécharge / convertit via Google Drive
-    pdf_bytes = google_drive_service.convert_to_pdf(generation.drive_file_id)
+    pdf_bytes = storage.convert_to_pdf(generation.drive_file_id)
     if not pdf_bytes:
         raise HTTPException(status_code=500, detail="Cannot convert document to PDF")
 
     # Fusionne les annexes PDF
     try:
-        from io import BytesIO
-        from pypdf import PdfReader, PdfWriter  # type: ignore
-
         attachment_objs = [
             a for a in crud.attachment.get_multi_by_product(db, product_id=generation.product_id)
             if a.mime_type == "application/pdf"
         ]
-        if attachment_objs:
-            # Prépare dict alias -> annex PdfReader
-            annex_readers: dict[str, PdfReader] = {}
-            for a in attachment_objs:
-                alias = a.alias or a.file_name
-                annex_bytes = google_drive_service.download(a.drive_file_id)
-                if annex_bytes:
-                    annex_readers[alias] = PdfReader(BytesIO(annex_bytes))
-
-            # Parcours du document principal
-            main_reader = PdfReader(BytesIO(pdf_bytes))
-            writer = PdfWriter()
-
-            for page_idx, page in enumerate(main_reader.pages):
-                text = page.extract_text() or ""
-                writer.add_page(page)
-
-                # Recherche marqueurs dans cette page
-                for alias, annex_reader in annex_readers.items():
-                    marker = f"[[ANNEXE:{alias}]]"
-                    if marker in text:
-                        # Insère toutes les pages de l'annexe juste après la page courante
-                        for annex_page in annex_reader.pages:
-                            writer.add_page(annex_page)
-
-            out_buf = BytesIO()
-            writer.write(out_buf)
-            pdf_bytes = out_buf.getvalue()
+        # Prépare dict alias -> annexe analysée (téléchargements parallèles + cache)
+        annexes = annex_cache.fetch(attachment_objs)
+        if annexes:
+            pdf_bytes = executors.run_in_stage("pdf", merge_annexes, pdf_bytes, annexes)
     except Exception:
         # En cas d'erreur de fusion, on conserve le PDF original
         import logging
@@ -212,23 +247,12 @@ async def validate_generation(
 
     # Upload PDF dans le même dossier que la génération initiale
     product = crud.product.get(db, id=str(generation.product_id))
-    client_folder = (product.nom_client or "SansClient").strip() or "SansClient"
-    product_folder = (product.nom_produit or str(product.id)).strip() or str(product.id)
-    ref_folder = (product.ref_formule or "REF").strip() or "REF"
-    formula_drive_id = google_drive_service.ensure_folder([client_folder, product_folder, ref_folder])
+    formula_drive_id = storage.ensure_folder(formula_folder_path(product))
 
     # Construit le même nom que le DOCX initial
-    def _clean(s: str | None) -> str:
-        return (s or "").strip().replace(" ", "_")
-
-    filename_parts = [
-        _clean(product.nom_client),
-        _clean(product.marque),
-        _clean(product.nom_produit or "document"),
-    ]
-    filename = "-".join(filter(None, filename_parts)) + ".pdf"
+    filename = document_filename(product, "pdf")
 
-    pdf_drive_id = google_drive_service.upload(
+    pdf_drive_id = storage.upload(
         pdf_bytes,
         filename,
         mime_type="application/pdf",
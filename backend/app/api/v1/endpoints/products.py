@@ -8,6 +8,7 @@ from sqlalchemy import cast, String
 from app import crud, models, schemas
 from app.api import deps
 from app.schemas.product import ProductStatus
+from app.services.purge_queue import enqueue_product_tree, purge_worker
 
 router = APIRouter()
 
@@ -98,9 +99,37 @@ def delete_product(
     # Convert to schema BEFORE deleting to avoid SQLAlchemy "deleted instance" errors
     product_data = schemas.Product.from_orm(product)
 
+    # Dossier Drive du produit et fichiers : purge en arrière-plan
+    enqueue_product_tree(db, product)
     crud.product.remove(db=db, id=str(product_id))
+    purge_worker.wake()
     return product_data
 
+@router.post("/bulk-delete", response_model=schemas.ProductBulkDeleteResult)
+def bulk_delete_products(
+    *,
+    db: Session = Depends(deps.get_db),
+    payload: schemas.ProductBulkDelete,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> schemas.ProductBulkDeleteResult:
+    """
+    Delete several products at once; their Drive folders are purged in the background.
+    """
+    product_ids = list(dict.fromkeys(payload.product_ids))
+    products = [crud.product.get(db=db, id=str(product_id)) for product_id in product_ids]
+    if any(product is None for product in products):
+        raise HTTPException(status_code=404, detail="Product not found")
+    if any(product.user_id != current_user.id for product in products):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    queued = 0
+    for product in products:
+        queued += enqueue_product_tree(db, product, also_deleted=[p.id for p in products])
+        db.delete(product)
+    db.commit()
+    purge_worker.wake()
+    return schemas.ProductBulkDeleteResult(deleted=product_ids, queued_files=queued)
+
 @router.put("/{product_id}/submit", response_model=schemas.Product)
 def submit_product(
     *,
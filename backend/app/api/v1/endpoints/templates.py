@@ -6,7 +6,11 @@ from sqlalchemy.orm import Session
 
 from app import schemas, models, crud
 from app.api import deps
-from app.services.google_drive import google_drive_service
+from app.services import executors, file_dedup
+from app.services.purge_queue import enqueue_deletion, purge_worker
+from app.services.storage import async_storage
+from app.services.template_cache import template_cache
+from app.services.thumbnails import thumbnail_resolver
 
 router = APIRouter()
 
@@ -21,19 +25,38 @@ async def upload_template(
     """Upload d'un fichier .docx comme nouveau modèle."""
     if not file.filename.endswith(".docx"):
         raise HTTPException(status_code=400, detail="Seuls les fichiers .docx sont acceptés")
-    drive_file_id = google_drive_service.upload(file.file, file.filename)
-    thumb_url = google_drive_service.get_thumbnail_url(drive_file_id)
+    content = await file.read()
+    content_digest = file_dedup.digest(content)
+    latest = await executors.run_in_thread("io", crud.template.get_latest, db, name=name)
+    if latest is not None and latest.content_hash == content_digest.sha256:
+        return latest  # contenu identique à la dernière version : pas de nouvelle version
+
+    # Mêmes octets qu'un autre modèle ou une ancienne version : fichier réutilisé
+    drive_file_id = await executors.run_in_thread("io", file_dedup.find_existing, db, content_digest)
+    if drive_file_id is None:
+        drive_file_id = await async_storage.upload(content, file.filename)
     template_in = schemas.TemplateCreate(name=name, file_name=file.filename)
+    template = await executors.run_in_thread(
+        "io", _create_template, db, template_in, drive_file_id, content, content_digest.sha256
+    )
+    thumbnail_resolver.wake()  # miniature résolue en arrière-plan
+    return template
+
+def _create_template(
+    db: Session,
+    template_in: schemas.TemplateCreate,
+    drive_file_id: str,
+    content: bytes,
+    content_hash: str,
+) -> models.Template:
     try:
         template = crud.template.create_with_file(
-            db, obj_in=template_in, drive_file_id=drive_file_id
+            db, obj_in=template_in, drive_file_id=drive_file_id, content_hash=content_hash
         )
-        template.thumbnail_url = thumb_url
-        db.add(template)
-        db.commit()
-        db.refresh(template)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    # Pré-remplit le cache local : la première génération n'aura pas à retélécharger
+    template_cache.prime(template.drive_file_id, template.version, content)
     return template
 
 @router.get("/", response_model=List[schemas.Template])
@@ -57,7 +80,9 @@ def delete_template(
     template = crud.template.get(db, id=str(template_id))
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
-    # Supprimer le fichier sur Google Drive (silencieux si Drive non configuré)
-    google_drive_service.delete(template.drive_file_id)
+    # Fichier du modèle et documents générés (supprimés en cascade) : purge en arrière-plan
+    generated = db.query(models.Generation.drive_file_id).filter(models.Generation.template_id == template.id)
+    enqueue_deletion(db, [template.drive_file_id, *(file_id for (file_id,) in generated)], reason="template")
     template = crud.template.remove(db, id=str(template_id))
+    purge_worker.wake()
     return template 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseSettings
 from typing import Optional
 import os
+import tempfile
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "DIP-easy"
@@ -21,6 +22,111 @@ class Settings(BaseSettings):
     # Permet de désactiver la validation stricte des produits (tests/end-to-end)
     STRICT_PRODUCT_VALIDATION: bool = False
 
+    # File de jobs de génération (0 = pas de worker dans ce processus)
+    GENERATION_WORKERS: int = 2
+    GENERATION_POLL_INTERVAL: float = 1.0
+    # Au-delà (secondes), un job resté "running" est considéré abandonné et repris
+    GENERATION_JOB_TIMEOUT: int = 600
+    # Un job en cours rafraîchit sa tâche à cet intervalle (secondes) pour ne pas être repris
+    GENERATION_HEARTBEAT_INTERVAL: float = 30.0
+    # Au-delà, un job repris après abandon (worker tué, plantage) passe en erreur
+    GENERATION_MAX_ATTEMPTS: int = 3
+
+    # File de purge des fichiers supprimés (table drive_deletions)
+    PURGE_WORKER_ENABLED: bool = True
+    PURGE_POLL_INTERVAL: float = 5.0
+    PURGE_BATCH_SIZE: int = 100
+    PURGE_JOB_TIMEOUT: int = 300
+    PURGE_MAX_ATTEMPTS: int = 10
+    # Délai avant nouvel essai : PURGE_RETRY_BASE * 2^tentatives, plafonné
+    PURGE_RETRY_BASE: float = 30.0
+    PURGE_RETRY_MAX: float = 3600.0
+
+    # Résolution différée des miniatures des annexes et modèles uploadés
+    THUMBNAIL_RESOLVER_ENABLED: bool = True
+    # Attente après un upload (Drive génère la miniature, les uploads proches sont regroupés)
+    THUMBNAIL_RESOLVE_DELAY: float = 5.0
+    # Intervalle de la relance des liens encore vides
+    THUMBNAIL_REFRESH_INTERVAL: float = 60.0
+    THUMBNAIL_BATCH_SIZE: int = 100
+    # Au-delà, le lien d'aperçu par défaut est enregistré à la place de la miniature
+    THUMBNAIL_MAX_ATTEMPTS: int = 10
+
+    # Pool de processus de rendu docxtpl (0 = nombre de CPU)
+    RENDER_PROCESSES: int = 0
+    # Threads exécutant les appels bloquants (Drive, SQLAlchemy) des endpoints
+    # de génération/validation hors de la boucle asyncio
+    BLOCKING_IO_WORKERS: int = 8
+    # Fusions PDF (pypdf) simultanées ; CPU et GIL, donc peu nombreuses
+    PDF_MERGE_WORKERS: int = 2
+    # Téléchargements d'annexes PDF parallèles lors de la validation
+    ANNEX_FETCH_WORKERS: int = 8
+    # Budget mémoire (taille des PDF sources) du cache des annexes analysées
+    ANNEX_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+    # Uploads Drive parallèles pendant une génération par lot (un client Drive par thread)
+    BATCH_UPLOAD_WORKERS: int = 4
+    # Racine de l'API Drive (à changer pour viser un serveur de substitution, cf. benchmarks/)
+    DRIVE_API_ENDPOINT: str = "https://www.googleapis.com"
+    # Transport HTTP des appels Drive : "httplib2" (une connexion par thread),
+    # "requests" ou "httpx" (pool de connexions keep-alive partagé entre threads)
+    DRIVE_HTTP_TRANSPORT: str = "httplib2"
+    DRIVE_HTTP_POOL_SIZE: int = 20
+    DRIVE_HTTP_KEEPALIVE_SECONDS: float = 60.0
+    DRIVE_HTTP2: bool = True  # httpx uniquement, si le paquet h2 est installé
+    DRIVE_HTTP_TIMEOUT: float = 120.0
+    # Nombre de jeux de credentials Drive (global + utilisateurs) gardés en mémoire
+    DRIVE_CLIENT_MAX_TENANTS: int = 16
+    # Uploads Drive : par morceaux (reprise sur coupure) au-delà du seuil
+    DRIVE_RESUMABLE_THRESHOLD: int = 5 * 1024 * 1024
+    DRIVE_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # multiple de 256 Kio
+    # Garde des appels Drive (voir app/services/drive_guard.py). Quota Drive :
+    # 12 000 requêtes/min par utilisateur ; 20 req/s par processus laisse de la
+    # marge pour plusieurs workers
+    DRIVE_RATE_LIMIT: float = 20.0
+    DRIVE_RATE_BURST: int = 40
+    DRIVE_RETRY_MAX: int = 5
+    DRIVE_BACKOFF_BASE: float = 0.5
+    DRIVE_BACKOFF_MAX: float = 32.0
+    DRIVE_BREAKER_THRESHOLD: int = 5
+    DRIVE_BREAKER_RESET_SECONDS: float = 30.0
+    # Requêtes par lot batch Drive (100 au maximum)
+    DRIVE_BATCH_SIZE: int = 100
+    # Partage des fichiers (voir app/services/drive_sharing.py) : "file"
+    # (permission par fichier) ou "folder" (héritée des dossiers du produit)
+    DRIVE_SHARING_MODE: str = "file"
+    # Délai max (secondes) de regroupement des permissions en lots batch (0 = appel immédiat)
+    DRIVE_PERMISSION_BATCH_DELAY: float = 0.2
+
+    # Stockage des fichiers : "drive" (Google Drive) ou "local" (disque, même
+    # arborescence <Client>/<Produit>/<Ref> sous LOCAL_STORAGE_ROOT)
+    STORAGE_BACKEND: str = "drive"
+    LOCAL_STORAGE_ROOT: str = os.path.join(os.getcwd(), "storage")
+    # Préfixe (schéma + hôte) des URLs de fichiers locaux renvoyées au frontend
+    LOCAL_STORAGE_PUBLIC_URL: str = ""
+
+    # Nombre de modèles prétraités (XML nettoyé + Jinja compilé) gardés en mémoire
+    DOCX_TEMPLATE_CACHE_SIZE: int = 32
+
+    # Conversion DOCX -> PDF locale (Drive non configuré) : pool LibreOffice headless
+    LIBREOFFICE_PATH: Optional[str] = None  # par défaut : soffice/libreoffice du PATH
+    LIBREOFFICE_WORKERS: int = 2
+    LIBREOFFICE_JOB_TIMEOUT: int = 120
+    # Un worker est redémarré après ce nombre de conversions
+    LIBREOFFICE_MAX_JOBS_PER_WORKER: int = 200
+    LIBREOFFICE_QUEUE_SIZE: int = 100
+
+    # Durée (secondes) pendant laquelle une valeur de la table settings est resservie
+    SETTINGS_CACHE_TTL: int = 30
+
+    # Caches disque locaux (modèles .docx, ...)
+    CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "dip-easy")
+    TEMPLATE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Délai (secondes) pendant lequel une copie locale est servie sans vérifier le md5 Drive
+    TEMPLATE_CACHE_REVALIDATE_SECONDS: int = 60
+    # PDF convertis par Drive (validation, aperçus) ; répertoire propre, vide = <CACHE_DIR>/pdf
+    PDF_CACHE_DIR: str = ""
+    PDF_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
     @property
     def get_database_url(self) -> str:
         if self.SQLALCHEMY_DATABASE_URI:
@@ -3,4 +3,8 @@ from .crud_product import product
 from .crud_template import crud_template as template
 from .crud_generation import generation
 from .crud_setting import setting
-from .crud_attachment import attachment 
\ No newline at end of file
+from .crud_attachment import attachment
+from .crud_task import task
+from .crud_log import log
+from .crud_drive_folder import drive_folder
+from .crud_drive_deletion import drive_deletion
\ No newline at end of file
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from typing import Iterable
+
+from sqlalchemy import or_, func
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.drive_deletion import DriveDeletion
+
+
+class DeletionStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    ERROR = "error"
+
+
+class CRUDDriveDeletion(CRUDBase[DriveDeletion, dict, dict]):
+    def enqueue(self, db: Session, *, file_ids: Iterable[str], reason: str) -> list[DriveDeletion]:
+        """Ajoute des suppressions à la session, sans valider.
+
+        Elles sont validées avec la transaction de l'appelant (suppression
+        des lignes en base) : pas de fichier orphelin si l'une échoue.
+        """
+        rows = [DriveDeletion(file_id=file_id, reason=reason) for file_id in dict.fromkeys(file_ids) if file_id]
+        db.add_all(rows)
+        return rows
+
+    def claim_batch(self, db: Session, *, limit: int, stale_after: int) -> list[DriveDeletion]:
+        """Réserve jusqu'à ``limit`` suppressions dues (``FOR UPDATE SKIP LOCKED``).
+
+        Comme pour ``tasks``, les lignes restées ``running`` plus de
+        ``stale_after`` secondes (worker tué) sont reprises.
+        """
+        stale_before = func.now() - timedelta(seconds=stale_after)
+        rows = (
+            db.query(DriveDeletion)
+            .filter(
+                or_(
+                    (DriveDeletion.status == DeletionStatus.QUEUED) & (DriveDeletion.next_attempt_at <= func.now()),
+                    (DriveDeletion.status == DeletionStatus.RUNNING) & (DriveDeletion.updated_at < stale_before),
+                )
+            )
+            .order_by(DriveDeletion.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.rollback()
+            return []
+        for row in rows:
+            row.status = DeletionStatus.RUNNING
+        db.commit()
+        return rows
+
+    def complete(self, db: Session, *, rows: list[DriveDeletion]) -> None:
+        for row in rows:
+            db.delete(row)
+        db.commit()
+
+    def retry_later(self, db: Session, *, db_obj: DriveDeletion, error: str, delay: float, max_attempts: int) -> DriveDeletion:
+        """Replanifie une suppression échouée ; ``error`` au-delà de ``max_attempts``."""
+        db_obj.attempts += 1
+        db_obj.last_error = error[:1000]
+        if db_obj.attempts >= max_attempts:
+            db_obj.status = DeletionStatus.ERROR
+        else:
+            db_obj.status = DeletionStatus.QUEUED
+            db_obj.next_attempt_at = func.now() + timedelta(seconds=delay)
+        db.add(db_obj)
+        db.commit()
+        return db_obj
+
+    def count_by_status(self, db: Session) -> dict[str, int]:
+        return dict(db.query(DriveDeletion.status, func.count()).group_by(DriveDeletion.status).all())
+
+
+drive_deletion = CRUDDriveDeletion(DriveDeletion)
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.drive_folder import DriveFolder
+
+
+class CRUDDriveFolder(CRUDBase[DriveFolder, dict, dict]):
+    def get_by_path(self, db: Session, *, root_id: str, path: str) -> Optional[DriveFolder]:
+        return (
+            db.query(DriveFolder)
+            .filter(DriveFolder.root_id == root_id, DriveFolder.path == path)
+            .first()
+        )
+
+    def get_by_folder_id(self, db: Session, *, folder_id: str) -> Optional[DriveFolder]:
+        return db.query(DriveFolder).filter(DriveFolder.folder_id == folder_id).first()
+
+    def set_folder_id(self, db: Session, *, root_id: str, path: str, folder_id: str) -> DriveFolder:
+        db_obj = self.get_by_path(db, root_id=root_id, path=path)
+        if db_obj:
+            db_obj.folder_id = folder_id
+        else:
+            db_obj = DriveFolder(root_id=root_id, path=path, folder_id=folder_id)
+        db.add(db_obj)
+        db.commit()
+        return db_obj
+
+    def remove_subtree(self, db: Session, *, root_id: str, path: str) -> int:
+        """Supprime le chemin et tous ses sous-dossiers ; renvoie le nombre de lignes."""
+        count = (
+            db.query(DriveFolder)
+            .filter(
+                DriveFolder.root_id == root_id,
+                (DriveFolder.path == path) | DriveFolder.path.startswith(path + "/", autoescape=True),
+            )
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return count
+
+
+drive_folder = CRUDDriveFolder(DriveFolder)
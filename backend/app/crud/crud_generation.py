@@ -1,3 +1,4 @@
+from typing import Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.crud.base import CRUDBase
@@ -10,7 +11,8 @@ class CRUDGeneration(CRUDBase[Generation, GenerationCreate, GenerationCreate]):
         db: Session,
         *,
         obj_in: GenerationCreate,
-        drive_file_id: str,
+        drive_file_id: Optional[str] = None,
+        context_hash: Optional[str] = None,
     ) -> Generation:
         db_obj = Generation(
             product_id=obj_in.product_id,
@@ -18,10 +20,29 @@ class CRUDGeneration(CRUDBase[Generation, GenerationCreate, GenerationCreate]):
             format="docx",
             drive_file_id=drive_file_id,
             status="pending",
+            context_hash=context_hash,
         )
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
         return db_obj
 
+    def get_by_context_hash(self, db: Session, *, context_hash: str) -> Optional[Generation]:
+        """Dernier DOCX rendu (ou en cours de rendu) à partir du même contexte.
+
+        Seuls les rendus bruts comptent : une génération validée (PDF) ou
+        finalisée (fichier retouché par l'utilisateur) passe ``success`` et
+        n'est plus le document rendu depuis ce contexte.
+        """
+        return (
+            db.query(Generation)
+            .filter(
+                Generation.context_hash == context_hash,
+                Generation.format == "docx",
+                Generation.status == "pending",
+            )
+            .order_by(Generation.initiated_at.desc())
+            .first()
+        )
+
 generation = CRUDGeneration(Generation) 
\ No newline at end of file
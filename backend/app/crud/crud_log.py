@@ -0,0 +1,37 @@
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.log import Log
+
+
+class CRUDLog(CRUDBase[Log, dict, dict]):
+    def add(
+        self,
+        db: Session,
+        *,
+        event_type: str,
+        level: str = "info",
+        message: str | None = None,
+        entity_type: str | None = None,
+        entity_id=None,
+        task_id=None,
+        user_id=None,
+        **details,
+    ) -> Log:
+        if message is not None:
+            details["message"] = message
+        db_obj = Log(
+            event_type=event_type,
+            level=level,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            task_id=task_id,
+            user_id=user_id,
+            details=details or None,
+        )
+        db.add(db_obj)
+        db.commit()
+        return db_obj
+
+
+log = CRUDLog(Log)
@@ -8,7 +8,7 @@ from app.crud.base import CRUDBase
 from app.models.product import Product
 from app.schemas.product import ProductCreate, ProductUpdate, ProductStatus
 from app.models import Ingredient, StabilityTest, CompatibilityTest
-from app.services.google_drive import google_drive_service
+from app.services.storage import storage
 
 class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
     def create(self, db: Session, *, obj_in: ProductCreate, user_id: UUID) -> Product:
@@ -30,13 +30,13 @@ class CRUDProduct(CRUDBase[Product, ProductCreate, ProductUpdate]):
             ref_formule_folder = (obj_in.ref_formule or "REF").strip() or "REF"
 
             # 1. Client/Produit  → on stocke cet ID dans la colonne drive_folder_id
-            product_drive_id = google_drive_service.ensure_folder([client_folder, product_folder])
+            product_drive_id = storage.ensure_folder([client_folder, product_folder])
 
             # 2. Produit/Ref_formule
-            formula_drive_id = google_drive_service.ensure_folder([client_folder, product_folder, ref_formule_folder])
+            formula_drive_id = storage.ensure_folder([client_folder, product_folder, ref_formule_folder])
 
             # 3. Produit/Ref_formule/Annexes
-            _ = google_drive_service.ensure_folder([client_folder, product_folder, ref_formule_folder, "Annexes"])
+            _ = storage.ensure_folder([client_folder, product_folder, ref_formule_folder, "Annexes"])
 
             # Sauvegarde sur l'objet avant commit final
             db_obj.drive_folder_id = product_drive_id
@@ -1,12 +1,17 @@
 from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
 from app.models.setting import Setting
+from app.services.setting_cache import setting_cache
 
 class CRUDSetting(CRUDBase[Setting, dict, dict]):
     def get_value(self, db: Session, key: str):
         setting = db.query(Setting).filter(Setting.key == key).first()
         return setting.value if setting else None
 
+    def get_cached_value(self, key: str, db: Session | None = None):
+        """Comme :meth:`get_value`, via le cache TTL partagé (``setting_cache``)."""
+        return setting_cache.get(key, db=db)
+
     def set_value(self, db: Session, key: str, value: str, description: str | None = None):
         setting = db.query(Setting).filter(Setting.key == key).first()
         if setting:
@@ -19,6 +24,7 @@ class CRUDSetting(CRUDBase[Setting, dict, dict]):
             db.add(setting)
         db.commit()
         db.refresh(setting)
+        setting_cache.invalidate(key)
         return setting
 
 setting = CRUDSetting(Setting) 
\ No newline at end of file
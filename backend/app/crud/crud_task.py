@@ -0,0 +1,78 @@
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import or_, func
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.task import Task
+
+
+class TaskStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCESS = "success"
+    ERROR = "error"
+
+
+class CRUDTask(CRUDBase[Task, dict, dict]):
+    def enqueue(self, db: Session, *, generation_id, task_type: str) -> Task:
+        db_obj = Task(generation_id=generation_id, task_type=task_type, status=TaskStatus.QUEUED)
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def claim_next(self, db: Session, *, task_type: str, stale_after: int) -> Optional[Task]:
+        """Réserve le prochain job en attente (``FOR UPDATE SKIP LOCKED``).
+
+        Les jobs restés ``running`` sans signe de vie (:meth:`touch`) depuis
+        plus de ``stale_after`` secondes (worker tué en cours de route) sont
+        repris. Le job réservé passe ``running``, son compteur ``attempts`` est
+        incrémenté et la transaction est validée immédiatement pour libérer le
+        verrou.
+        """
+        stale_before = func.now() - timedelta(seconds=stale_after)
+        task = (
+            db.query(Task)
+            .filter(
+                Task.task_type == task_type,
+                or_(
+                    Task.status == TaskStatus.QUEUED,
+                    (Task.status == TaskStatus.RUNNING) & (Task.updated_at < stale_before),
+                ),
+            )
+            .order_by(Task.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if task is None:
+            db.rollback()
+            return None
+        task.status = TaskStatus.RUNNING
+        task.attempts = (task.attempts or 0) + 1
+        db.add(task)
+        db.commit()
+        db.refresh(task)
+        return task
+
+    def touch(self, db: Session, *, task_id) -> bool:
+        """Signe de vie d'un job en cours : repousse sa reprise par un autre worker."""
+        updated = (
+            db.query(Task)
+            .filter(Task.id == task_id, Task.status == TaskStatus.RUNNING)
+            .update({Task.updated_at: func.now()}, synchronize_session=False)
+        )
+        db.commit()
+        return bool(updated)
+
+    def finish(self, db: Session, *, db_obj: Task, status: str, result: str | None = None) -> Task:
+        db_obj.status = status
+        db_obj.result = result
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+
+task = CRUDTask(Task)
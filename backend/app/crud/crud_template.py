@@ -7,19 +7,26 @@ from app.schemas.template import TemplateCreate, Template as TemplateSchema
 class CRUDTemplate(CRUDBase[Template, TemplateCreate, TemplateCreate]):
     """CRUD spécifique aux modèles de documents (.docx)."""
 
-    def create_with_file(
-        self, db: Session, *, obj_in: TemplateCreate, drive_file_id: str
-    ) -> Template:
-        # Récupère la dernière version existante pour ce nom
-        last_tpl = (
+    def get_latest(self, db: Session, *, name: str) -> Template | None:
+        """Dernière version du modèle ``name``."""
+        return (
             db.query(Template)
-            .filter(Template.name == obj_in.name)
+            .filter(Template.name == name)
             .order_by(cast(Template.version, Integer).desc())
             .first()
         )
 
-        # Si un template existe déjà avec le même fichier Drive, ne crée pas de doublon
-        if last_tpl and last_tpl.drive_file_id == drive_file_id:
+    def create_with_file(
+        self, db: Session, *, obj_in: TemplateCreate, drive_file_id: str, content_hash: str | None = None
+    ) -> Template:
+        # Récupère la dernière version existante pour ce nom
+        last_tpl = self.get_latest(db, name=obj_in.name)
+
+        # Même fichier Drive ou même contenu que la dernière version : pas de nouvelle version
+        if last_tpl and (
+            last_tpl.drive_file_id == drive_file_id
+            or (content_hash is not None and last_tpl.content_hash == content_hash)
+        ):
             return last_tpl
 
         next_version = str((int(last_tpl.version) if last_tpl else 0) + 1)
@@ -28,6 +35,7 @@ class CRUDTemplate(CRUDBase[Template, TemplateCreate, TemplateCreate]):
             name=obj_in.name,
             version=next_version,
             drive_file_id=drive_file_id,
+            content_hash=content_hash,
             toc="[]",
             style_config="{}",
         )
@@ -1,4 +1,4 @@
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 from .base import engine
 
 def ensure_alias_column():
@@ -7,4 +7,28 @@ def ensure_alias_column():
 
 def ensure_pg_extensions():
     with engine.begin() as conn:
-        conn.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"')) 
\ No newline at end of file
+        conn.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"'))
+
+def ensure_generation_columns():
+    with engine.begin() as conn:
+        # Base neuve : create_all() créera la table avec colonne et index
+        if not inspect(conn).has_table("generations"):
+            return
+        conn.execute(text("ALTER TABLE generations ADD COLUMN IF NOT EXISTS context_hash VARCHAR"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_generations_context_hash ON generations (context_hash)"))
+
+def ensure_task_columns():
+    with engine.begin() as conn:
+        # Base neuve : create_all() créera la table avec la colonne
+        if not inspect(conn).has_table("tasks"):
+            return
+        conn.execute(text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0"))
+
+def ensure_content_hash_columns():
+    with engine.begin() as conn:
+        for table in ("attachments", "templates"):
+            # Base neuve : create_all() créera la table avec colonne et index
+            if not inspect(conn).has_table(table):
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash VARCHAR"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_content_hash ON {table} (content_hash)"))
\ No newline at end of file
@@ -1,10 +1,27 @@
-from fastapi import FastAPI
+import math
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.api.v1.api import api_router
-from app.db import ensure_alias_column, ensure_pg_extensions
+from app.db import (
+    ensure_alias_column,
+    ensure_content_hash_columns,
+    ensure_generation_columns,
+    ensure_pg_extensions,
+    ensure_task_columns,
+)
 import app.models  # noqa
 from app.db.base import Base, engine
+from app.services import executors
+from app.services.drive_guard import DriveError, DriveUnavailableError
+from app.services.drive_sharing import drive_sharing
+from app.services.pdf_converter import libreoffice_pool
+from app.services.storage import async_storage
+from app.services.generation_queue import generation_worker_pool
+from app.services.purge_queue import purge_worker
+from app.services.thumbnails import thumbnail_resolver
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -36,11 +53,45 @@ app.add_middleware(
 # Inclusion des routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.exception_handler(DriveUnavailableError)
+async def drive_unavailable_handler(request: Request, exc: DriveUnavailableError):
+    # Drive saturé ou en panne : le client peut réessayer plus tard
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+@app.exception_handler(DriveError)
+async def drive_error_handler(request: Request, exc: DriveError):
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
 @app.get("/")
 def root():
     return {"message": "Welcome to DIP-easy API"}
 
+@app.on_event("startup")
+def start_workers():
+    generation_worker_pool.start()
+    if settings.PURGE_WORKER_ENABLED:
+        purge_worker.start()
+    if settings.THUMBNAIL_RESOLVER_ENABLED:
+        thumbnail_resolver.start()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await async_storage.aclose()
+    generation_worker_pool.stop(timeout=5)
+    purge_worker.stop(timeout=5)
+    thumbnail_resolver.stop(timeout=5)
+    drive_sharing.stop(timeout=5)
+    executors.shutdown()
+    libreoffice_pool.shutdown()
+
 ensure_alias_column()
+ensure_generation_columns()
+ensure_task_columns()
+ensure_content_hash_columns()
 ensure_pg_extensions()
 
 Base.metadata.create_all(bind=engine) 
\ No newline at end of file
@@ -8,4 +8,6 @@ from .template import Template
 from .generation import Generation
 from .task import Task
 from .log import Log
-from .setting import Setting 
\ No newline at end of file
+from .setting import Setting
+from .drive_folder import DriveFolder
+from .drive_deletion import DriveDeletion 
\ No newline at end of file
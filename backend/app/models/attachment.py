@@ -16,6 +16,8 @@ class Attachment(Base):
     url = Column(String, nullable=True)
     uploaded_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     alias = Column(String, nullable=True)
+    # SHA-256 du contenu : déduplication des fichiers (voir services/file_dedup.py)
+    content_hash = Column(String, nullable=True, index=True)
 
     product = relationship(
         "Product",
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, text
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from app.db.base import Base
+from sqlalchemy.sql import func
+
+class DriveDeletion(Base):
+    """Fichier ou dossier à supprimer du stockage (file de purge)."""
+
+    __tablename__ = "drive_deletions"
+
+    id = Column(PGUUID, primary_key=True, server_default=text("uuid_generate_v4()"))
+    file_id = Column(String, nullable=False, index=True)
+    # Origine de la suppression : generation, attachment, template, product
+    reason = Column(String, nullable=True)
+    status = Column(String, nullable=False, server_default="queued")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from app.db.base import Base
+from sqlalchemy.sql import func
+
+class DriveFolder(Base):
+    """Correspondance chemin Drive -> ID de dossier (cache de ``ensure_folder``)."""
+
+    __tablename__ = "drive_folders"
+    __table_args__ = (UniqueConstraint("root_id", "path", name="uq_drive_folders_root_path"),)
+
+    id = Column(PGUUID, primary_key=True, server_default=text("uuid_generate_v4()"))
+    # Dossier racine configuré ("" = racine du Drive)
+    root_id = Column(String, nullable=False, server_default="")
+    # Segments joints par "/" (les "/" des noms sont échappés en "%2F")
+    path = Column(String, nullable=False)
+    folder_id = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
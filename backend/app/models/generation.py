@@ -18,6 +18,8 @@ class Generation(Base):
     initiated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     result = Column(String, nullable=True)
+    # Empreinte du contexte de rendu + version du modèle (mémoïsation des rendus)
+    context_hash = Column(String, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, text
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -12,6 +12,8 @@ class Task(Base):
     task_type = Column(String, nullable=False)
     status = Column(String, nullable=False)
     result = Column(String, nullable=True)
+    # Nombre de réservations par un worker (reprises après abandon comprises)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
 
@@ -12,6 +12,8 @@ class Template(Base):
     version = Column(String, nullable=False)
     drive_file_id = Column(String, nullable=False)
     thumbnail_url = Column(String, nullable=True)
+    # SHA-256 du contenu : déduplication des fichiers (voir services/file_dedup.py)
+    content_hash = Column(String, nullable=True, index=True)
     toc = Column(Text, nullable=False, default="[]")
     style_config = Column(Text, nullable=False, default="{}")
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -1,11 +1,11 @@
 from .user import User, UserCreate, UserInDB, UserUpdate
-from .product import Product, ProductCreate, ProductInDB, ProductUpdate, ProductBase, ProductInDBBase
+from .product import Product, ProductCreate, ProductInDB, ProductUpdate, ProductBase, ProductInDBBase, ProductBulkDelete, ProductBulkDeleteResult
 from .menu import Menu, MenuCreate, MenuUpdate, MenuItem, MenuItemCreate, MenuItemUpdate, MenuItemInDB
 from .ingredient import Ingredient, IngredientCreate, IngredientUpdate, IngredientInDB
 from .stability_test import StabilityTest, StabilityTestCreate, StabilityTestUpdate, StabilityTestInDB
 from .compatibility_test import CompatibilityTest, CompatibilityTestCreate, CompatibilityTestUpdate, CompatibilityTestInDB
 from .template import Template, TemplateCreate
-from .generation import Generation, GenerationCreate
+from .generation import Generation, GenerationCreate, GenerationBatchCreate
 from .attachment import Attachment, AttachmentCreate, AttachmentUpdate
 
 # Mettre à jour les forward refs Pydantic
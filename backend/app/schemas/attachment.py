@@ -16,7 +16,7 @@ class AttachmentBase(BaseModel):
 
 
 class AttachmentCreate(AttachmentBase):
-    pass
+    content_hash: Optional[str] = None
 
 
 class AttachmentUpdate(BaseModel):
@@ -1,6 +1,6 @@
 from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class GenerationStatus(str):
@@ -18,10 +18,15 @@ class GenerationCreate(BaseModel):
     product_id: UUID
     template_id: UUID
 
+class GenerationBatchCreate(BaseModel):
+    product_ids: List[UUID] = Field(..., min_items=1)
+    template_ids: List[UUID] = Field(..., min_items=1)
+
 class GenerationInDBBase(GenerationBase):
     id: UUID
     drive_file_id: Optional[str] = None
     error_message: Optional[str] = None
+    context_hash: Optional[str] = None
     initiated_at: datetime
     completed_at: Optional[datetime]
 
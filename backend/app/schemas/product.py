@@ -97,6 +97,15 @@ class Product(ProductInDBBase):
 class ProductInDB(ProductInDBBase):
     pass
 
+# Suppression groupée
+class ProductBulkDelete(BaseModel):
+    product_ids: List[UUID] = Field(..., min_items=1)
+
+class ProductBulkDeleteResult(BaseModel):
+    deleted: List[UUID]
+    # Fichiers et dossiers mis en file de purge
+    queued_files: int
+
 # Forward references
 from .ingredient import Ingredient, IngredientCreate
 from .stability_test import StabilityTest, StabilityTestCreate
@@ -0,0 +1,128 @@
+"""Récupération des annexes PDF et cache des annexes déjà analysées.
+
+La validation d'un produit téléchargeait ses annexes une par une puis
+reconstruisait un ``PdfReader`` pour chacune, à chaque validation. Les
+annexes sont maintenant récupérées en parallèle (``ANNEX_FETCH_WORKERS``) et
+les documents analysés sont gardés en mémoire sous la clé
+``(drive_file_id, md5Checksum)``, dans un LRU borné à
+``ANNEX_CACHE_MAX_BYTES`` (taille des PDF sources). Un simple appel de
+métadonnées suffit alors pour resservir une annexe inchangée.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Optional, Sequence
+
+from app import models
+from app.core.config import settings
+from app.services import executors
+from app.services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedAnnex:
+    """Annexe analysée ; ``lock`` sérialise l'accès au ``PdfReader`` partagé."""
+
+    def __init__(self, data: bytes):
+        from pypdf import PdfReader  # type: ignore
+
+        self.reader = PdfReader(BytesIO(data))
+        self.size = len(data)
+        self.lock = threading.Lock()
+
+
+class AnnexCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple[str, str], ParsedAnnex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, drive_file_id: str, md5: str) -> Optional[ParsedAnnex]:
+        with self._lock:
+            annex = self._entries.get((drive_file_id, md5))
+            if annex is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((drive_file_id, md5))
+            self.hits += 1
+            return annex
+
+    def put(self, drive_file_id: str, md5: str, annex: ParsedAnnex) -> None:
+        if annex.size > self.max_bytes:
+            return
+        key = (drive_file_id, md5)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = annex
+            self._bytes += annex.size
+            while self._bytes > self.max_bytes:
+                _key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Récupération
+    # ------------------------------------------------------------------
+
+    def load(self, drive_file_id: str) -> Optional[ParsedAnnex]:
+        """Annexe analysée depuis le cache, sinon téléchargée depuis Drive.
+
+        ``None`` si le fichier est introuvable ou n'est pas un PDF lisible.
+        Sans md5 Drive (Drive non configuré), rien n'est mis en cache.
+        """
+        md5 = storage.get_md5(drive_file_id)
+        if md5 is not None:
+            annex = self.get(drive_file_id, md5)
+            if annex is not None:
+                return annex
+
+        data = storage.download(drive_file_id)
+        if not data:
+            return None
+        try:
+            annex = ParsedAnnex(data)
+        except Exception as e:
+            logger.warning("Annexe PDF %s illisible: %s", drive_file_id, e)
+            return None
+        # Fichier modifié entre la lecture du md5 et le téléchargement : pas de cache
+        if md5 is not None and md5 == hashlib.md5(data).hexdigest():
+            self.put(drive_file_id, md5, annex)
+        return annex
+
+    def fetch(self, attachments: Sequence[models.Attachment]) -> Dict[str, ParsedAnnex]:
+        """Récupère en parallèle les annexes PDF, indexées par alias."""
+        by_alias = {(a.alias or a.file_name): a.drive_file_id for a in attachments}
+        if not by_alias:
+            return {}
+        # Pool partagé : les transports HTTP par thread sont réutilisés d'une validation à l'autre
+        pool = executors.get_thread_pool("annex")
+        loaded = dict(zip(by_alias, pool.map(self.load, by_alias.values())))
+        return {alias: annex for alias, annex in loaded.items() if annex is not None}
+
+
+annex_cache = AnnexCache(max_bytes=settings.ANNEX_CACHE_MAX_BYTES)
@@ -0,0 +1,443 @@
+"""Client Google Drive asynchrone pour les endpoints ``async def``.
+
+Même surface que :class:`GoogleDriveService` (``upload``, ``download``,
+``ensure_folder``, ``convert_to_pdf``, ``delete``...) mais sur l'API REST v3
+via ``httpx.AsyncClient`` : les appels n'occupent ni la boucle asyncio ni un
+thread, et les appels indépendants peuvent être lancés ensemble avec
+``asyncio.gather``. Les gros fichiers partent par morceaux (protocole
+resumable, voir :mod:`app.services.drive_upload`).
+
+Les comportements de repli sont ceux du service synchrone : Drive non
+configuré -> IDs factices / octets vides. Ce qui reste synchrone (lecture des
+réglages, cache des dossiers en base, conversion locale) passe par l'étage
+``io`` de :mod:`app.services.executors`.
+"""
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from typing import IO, Any, Optional
+
+from app.core.config import settings
+from app.services import executors
+from app.services.drive_client_pool import drive_client_pool
+from app.services.drive_guard import DriveError, DriveUnavailableError, drive_guard, is_idempotent
+from app.services.drive_transport import http2_available
+from app.services.drive_upload import (
+    ChecksumMismatchError,
+    HashingReader,
+    chunk_size,
+    tag_upload,
+    use_resumable,
+    verify_md5,
+)
+from app.services.google_drive import GoogleDriveService, google_drive_service
+
+logger = logging.getLogger(__name__)
+
+def _is_not_found(exc: Exception) -> bool:
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 404
+
+
+class AsyncGoogleDriveService:
+    SETTINGS_FOLDER = GoogleDriveService.SETTINGS_FOLDER
+
+    def __init__(self, base_url: str | None = None):
+        self.base_url = (base_url or settings.DRIVE_API_ENDPOINT).rstrip("/")
+        self._client = None
+        self._client_loop = None
+        # Rafraîchissement des jetons (bloquant, fait dans un thread)
+        self._refresh_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Client HTTP et authentification
+    # ------------------------------------------------------------------
+
+    def _http(self):
+        import httpx  # type: ignore
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                http2=settings.DRIVE_HTTP2 and http2_available(),
+                limits=httpx.Limits(
+                    max_connections=settings.DRIVE_HTTP_POOL_SIZE,
+                    max_keepalive_connections=settings.DRIVE_HTTP_POOL_SIZE,
+                    keepalive_expiry=settings.DRIVE_HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=settings.DRIVE_HTTP_TIMEOUT,
+                follow_redirects=True,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def _credentials(self, user_id: Optional[str] = None) -> Any:
+        try:
+            return await executors.run_in_thread("io", drive_client_pool.credentials, user_id)
+        except Exception as e:
+            logger.warning("Unable to load Google Drive credentials: %s", e)
+            return None
+
+    def _refresh(self, creds) -> None:
+        from google.auth.transport.requests import Request  # type: ignore
+
+        with self._refresh_lock:
+            if not creds.valid:
+                creds.refresh(Request())
+
+    async def _send(self, creds, method: str, url: str, **kwargs):
+        """Requête authentifiée sur une URL complète, sans contrôle du statut."""
+        if not creds.valid:
+            await executors.run_in_thread("io", self._refresh, creds)
+        headers = dict(kwargs.pop("headers", None) or {})
+        creds.apply(headers)
+        return await self._http().request(method, url, headers=headers, **kwargs)
+
+    async def _request(self, creds, method: str, path: str, **kwargs):
+        """Requête authentifiée sous ``drive_guard`` ; lève ``httpx.HTTPStatusError`` si la réponse est en erreur.
+
+        Une requête qui crée un fichier (``files.copy``...) n'est pas rejouée
+        après une erreur passagère (voir ``drive_guard.is_idempotent``).
+        """
+
+        async def _once():
+            resp = await self._send(creds, method, self.base_url + path, **kwargs)
+            resp.raise_for_status()
+            return resp
+
+        resumable = (kwargs.get("params") or {}).get("uploadType") == "resumable"
+        if is_idempotent(method, path, resumable):
+            return await drive_guard.call_async(_once)
+        return await drive_guard.call_create_async(_once, None)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+
+    async def upload(
+        self,
+        file_obj: IO[bytes] | bytes,
+        filename: str,
+        mime_type: str = "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        *,
+        parent_id: str | None = None,
+    ) -> str:
+        """Upload un fichier et retourne son ID Google Drive (voir ``GoogleDriveService.upload``).
+
+        ``file_obj`` peut être le fichier temporaire d'un ``UploadFile`` : il est
+        lu par morceaux dans l'étage ``io``, jamais chargé en entier en mémoire.
+        """
+        creds = await self._credentials()
+        if creds is None:
+            return f"mock-{uuid.uuid4()}"
+
+        if parent_id is None:
+            from app.crud.crud_setting import setting as crud_setting
+
+            parent_id = await executors.run_in_thread("io", crud_setting.get_cached_value, self.SETTINGS_FOLDER)
+
+        try:
+            try:
+                file_id = await self._create_file(creds, file_obj, filename, mime_type, parent_id)
+            except ChecksumMismatchError as e:
+                # Octets altérés en route : fichier corrompu purgé, un seul nouvel essai complet
+                from app.services.purge_queue import enqueue_orphan
+
+                logger.warning("%s, nouvel envoi", e)
+                await executors.run_in_thread("io", enqueue_orphan, e.file_id, reason="checksum")
+                file_id = await self._create_file(creds, file_obj, filename, mime_type, parent_id)
+            except Exception as e:
+                # Dossier parent issu du cache mais supprimé sur Drive : on le recrée et on réessaie
+                from app.services.folder_cache import folder_cache
+
+                cached_path = None
+                if parent_id and _is_not_found(e):
+                    cached_path = await executors.run_in_thread("io", folder_cache.path_for, parent_id)
+                if cached_path is None:
+                    raise
+                root_id, path = cached_path
+                await executors.run_in_thread("io", folder_cache.invalidate, root_id, path)
+                parent_id = await self.ensure_folder(path)
+                file_id = await self._create_file(creds, file_obj, filename, mime_type, parent_id)
+
+            # Rendre le fichier publiquement lisible pour les vignettes et la preview
+            # (hérité du dossier ou permission regroupée, voir drive_sharing)
+            from app.services.drive_sharing import ANYONE_READER, drive_sharing
+
+            needs_grant = drive_sharing.mode != "folder" or await executors.run_in_thread(
+                "io", drive_sharing.file_needs_grant, parent_id
+            )
+            if needs_grant and drive_sharing.batched:
+                drive_sharing.grant(file_id)
+            elif needs_grant:
+                try:
+                    await self._request(
+                        creds, "POST", f"/drive/v3/files/{file_id}/permissions", params={"fields": "id"}, json=ANYONE_READER
+                    )
+                except Exception:
+                    # On ignore les erreurs de permission (souvent déjà accordée)
+                    pass
+            return file_id
+        except ChecksumMismatchError as e:
+            # Nouvel envoi corrompu lui aussi : pas d'orphelin sur Drive
+            from app.services.purge_queue import enqueue_orphan
+
+            await executors.run_in_thread("io", enqueue_orphan, e.file_id, reason="checksum")
+            raise
+        except DriveError:
+            raise
+        except Exception as e:
+            logger.exception("Erreur lors de l'upload sur Google Drive: %s", e)
+            raise DriveError(f"Upload de {filename} sur Google Drive impossible: {e}") from e
+
+    async def _create_file(
+        self, creds, file_obj: IO[bytes] | bytes, filename: str, mime_type: str, parent_id: str | None
+    ) -> str:
+        """Un envoi complet (simple ou par morceaux) suivi de la vérification du md5."""
+        metadata: dict = {"name": filename}
+        if parent_id:
+            metadata["parents"] = [parent_id]
+        reader = await executors.run_in_thread("io", HashingReader, file_obj)
+        if use_resumable(reader.size):
+            result = await self._upload_resumable(creds, reader, metadata, mime_type)
+        else:
+            data = await executors.run_in_thread("io", reader.read_at, 0, reader.size)
+            result = await self._upload_multipart(creds, data, metadata, mime_type)
+        verify_md5(reader, result.get("md5Checksum"), result["id"])
+        return result["id"]
+
+    async def _upload_multipart(self, creds, data: bytes, metadata: dict, mime_type: str) -> dict:
+        """Envoi simple ; après une erreur passagère, le fichier est cherché par son jeton avant tout nouvel envoi."""
+        metadata = dict(metadata)
+        query = tag_upload(metadata)
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(metadata)}\r\n--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n"
+        ).encode("utf-8") + data + f"\r\n--{boundary}--".encode("utf-8")
+
+        async def _once():
+            resp = await self._send(
+                creds,
+                "POST",
+                self.base_url + "/upload/drive/v3/files",
+                params={"uploadType": "multipart", "fields": "id,md5Checksum"},
+                headers={"Content-Type": f"multipart/related; boundary={boundary}"},
+                content=body,
+            )
+            resp.raise_for_status()
+            return resp.json()
+
+        async def _recover():
+            resp = await self._request(
+                creds, "GET", "/drive/v3/files", params={"q": query, "spaces": "drive", "fields": "files(id,md5Checksum)"}
+            )
+            found = resp.json().get("files", [])
+            return found[0] if found else None
+
+        return await drive_guard.call_create_async(_once, _recover)
+
+    async def _upload_resumable(self, creds, reader: HashingReader, metadata: dict, mime_type: str) -> dict:
+        """Protocole resumable : ouverture de session puis un PUT par morceau.
+
+        Après une erreur réseau ou 5xx (rejouée par ``drive_guard``), Drive est interrogé (``Content-Range:
+        bytes */<taille>``) et l'envoi reprend au dernier octet reçu.
+        """
+        resp = await self._request(
+            creds,
+            "POST",
+            "/upload/drive/v3/files",
+            params={"uploadType": "resumable", "fields": "id,md5Checksum"},
+            headers={"X-Upload-Content-Type": mime_type, "X-Upload-Content-Length": str(reader.size)},
+            json=metadata,
+        )
+        session_url = resp.headers["location"]
+        size, step = reader.size, chunk_size()
+        offset = 0
+        query = False
+
+        async def _step():
+            # Rejoué par drive_guard après une erreur : commence alors par
+            # demander à Drive ce qu'il a déjà reçu
+            nonlocal offset, query
+            if query:
+                resp = await self._send(creds, "PUT", session_url, headers={"Content-Range": f"bytes */{size}"})
+            else:
+                chunk = await executors.run_in_thread("io", reader.read_at, offset, step)
+                query = True
+                resp = await self._send(
+                    creds,
+                    "PUT",
+                    session_url,
+                    headers={"Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"},
+                    content=chunk,
+                )
+            if resp.status_code in (200, 201):
+                return resp.json()
+            if resp.status_code != 308:
+                query = True
+                resp.raise_for_status()
+            # 308 Resume Incomplete : Range = octets déjà reçus par Drive
+            query = False
+            received = resp.headers.get("range")
+            offset = int(received.rsplit("-", 1)[1]) + 1 if received else 0
+            return None
+
+        while True:
+            result = await drive_guard.call_async(_step)
+            if result is not None:
+                return result
+
+    async def download(self, file_id: str) -> bytes:
+        """Télécharge un fichier Drive ; ``b""`` si Drive non configuré ou erreur, ``DriveUnavailableError`` si indisponible."""
+        creds = await self._credentials()
+        if creds is None:
+            return b""
+        try:
+            resp = await self._request(creds, "GET", f"/drive/v3/files/{file_id}", params={"alt": "media"})
+            return resp.content
+        except DriveUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning("Erreur téléchargement fichier Drive %s: %s", file_id, e)
+            return b""
+
+    async def get_md5(self, file_id: str) -> str | None:
+        creds = await self._credentials()
+        if creds is None:
+            return None
+        try:
+            resp = await self._request(creds, "GET", f"/drive/v3/files/{file_id}", params={"fields": "md5Checksum"})
+            return resp.json().get("md5Checksum")
+        except DriveUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning("Erreur lecture md5 fichier Drive %s: %s", file_id, e)
+            return None
+
+    async def delete(self, file_id: str) -> None:
+        """Supprime un fichier depuis Google Drive (silencieusement si Drive non configuré)."""
+        creds = await self._credentials()
+        if creds is None:
+            return
+        try:
+            await self._request(creds, "DELETE", f"/drive/v3/files/{file_id}")
+        except Exception as e:
+            logger.warning("Erreur suppression fichier Drive %s: %s", file_id, e)
+
+    async def ensure_folder(self, path: list[str]) -> str:
+        """Équivalent asynchrone de ``GoogleDriveService.ensure_folder``.
+
+        Les chemins connus du cache des dossiers sont servis sans appel Drive.
+        Les segments inconnus (rares : une fois par chemin) sont résolus par le
+        service synchrone, sous ses verrous anti-doublons, dans l'étage ``io``.
+        """
+        if not path:
+            raise ValueError("Path must contain at least one segment")
+
+        creds = await self._credentials()
+        if creds is None:
+            # Fallback mock – concat path pour rester unique entre appels
+            return f"mock-{ '/'.join(path) }-{uuid.uuid4()}"
+
+        from app.crud.crud_setting import setting as crud_setting
+        from app.services.folder_cache import folder_cache
+
+        def _cached() -> Optional[str]:
+            root_id = crud_setting.get_cached_value(self.SETTINGS_FOLDER) or ""
+            return folder_cache.get(root_id, path)
+
+        cached = await executors.run_in_thread("io", _cached)
+        if cached:
+            return cached
+        return await executors.run_in_thread("io", google_drive_service.ensure_folder, path)
+
+    async def convert_to_pdf(self, file_id: str) -> bytes:
+        """Équivalent asynchrone de ``GoogleDriveService.convert_to_pdf`` (même cache PDF)."""
+        creds = await self._credentials()
+        if creds is None:
+            # Drive non configuré : conversion locale (LibreOffice / docx2pdf), bloquante
+            return await executors.run_in_thread("io", google_drive_service.convert_to_pdf, file_id)
+
+        from app.services.pdf_cache import pdf_cache, version_of
+
+        try:
+            resp = await self._request(
+                creds, "GET", f"/drive/v3/files/{file_id}", params={"fields": pdf_cache.FIELDS}
+            )
+            version = version_of(resp.json())
+        except DriveUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning("Métadonnées Drive de %s illisibles, PDF non mis en cache: %s", file_id, e)
+            version = None
+        cached = await executors.run_in_thread("io", pdf_cache.get, file_id, version)
+        if cached is not None:
+            return cached
+
+        # Export direct (fichiers Docs/Sheets), sauf s'il a déjà échoué pour ce fichier
+        if not await executors.run_in_thread("io", pdf_cache.needs_copy, file_id):
+            try:
+                resp = await self._request(
+                    creds, "GET", f"/drive/v3/files/{file_id}/export", params={"mimeType": "application/pdf"}
+                )
+                if resp.content:
+                    await executors.run_in_thread("io", pdf_cache.put, file_id, version, resp.content)
+                    return resp.content
+            except DriveUnavailableError:
+                raise
+            except Exception as e:
+                logger.warning("Export PDF direct impossible: %s", e)
+
+        # Fallback : on tente de copier + convertir (Drive crée un Google Doc)
+        try:
+            resp = await self._request(
+                creds,
+                "POST",
+                f"/drive/v3/files/{file_id}/copy",
+                params={"fields": "id"},
+                json={"mimeType": "application/vnd.google-apps.document"},
+            )
+            tmp_id = resp.json()["id"]
+            try:
+                resp = await self._request(
+                    creds, "GET", f"/drive/v3/files/{tmp_id}/export", params={"mimeType": "application/pdf"}
+                )
+            finally:
+                # Nettoyage copie
+                await self.delete(tmp_id)
+            await executors.run_in_thread("io", pdf_cache.put, file_id, version, resp.content, via_copy=True)
+            return resp.content
+        except DriveUnavailableError:
+            raise
+        except Exception as e:
+            logger.warning("Conversion Drive -> PDF fallback échouée: %s", e)
+            await executors.run_in_thread("io", pdf_cache.discard, file_id)  # l'export direct sera retenté
+            # En dernier recours, renvoie le docx brut
+            return await self.download(file_id)
+
+    async def get_thumbnail_url(self, file_id: str) -> str:
+        """Construit (ou récupère) l'URL miniature/preview pour un fichier."""
+        fallback = f"https://drive.google.com/thumbnail?id={file_id}"
+        creds = await self._credentials()
+        if creds is None:
+            return fallback
+        try:
+            resp = await self._request(
+                creds, "GET", f"/drive/v3/files/{file_id}", params={"fields": "thumbnailLink, webViewLink"}
+            )
+            meta = resp.json()
+            return meta.get("thumbnailLink") or meta.get("webViewLink") or fallback
+        except Exception:
+            return fallback
+
+
+async_drive_service = AsyncGoogleDriveService()
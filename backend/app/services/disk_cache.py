@@ -0,0 +1,220 @@
+"""Cache disque adressé par contenu avec éviction LRU sur un budget d'octets.
+
+Les fichiers sont stockés sous leur empreinte SHA-256 (``blobs/ab/abcd...``) :
+deux clés qui pointent vers le même contenu partagent un seul fichier. Un
+index JSON associe chaque clé logique à son empreinte et à des métadonnées
+libres (md5 Drive, date de dernière vérification...). L'ordre de l'index est
+l'ordre LRU ; il est réécrit atomiquement à chaque modification, y compris
+le déplacement en fin de liste d'une clé lue par :meth:`get`.
+
+Le répertoire est partagé par tous les workers uvicorn. Chaque opération
+prend donc un verrou fichier exclusif (``index.lock``, ``fcntl.flock``) et
+relit ``index.json`` s'il a été réécrit par un autre processus : les
+modifications ne s'écrasent pas et un blob n'est supprimé que si aucune clé
+de l'index commun n'y renvoie plus. Sans ``fcntl`` (Windows), seul le verrou
+de thread s'applique : un répertoire par processus.
+
+Chaque cache applicatif a son propre répertoire, marqué par son espace de
+noms (fichier ``namespace``) : deux caches configurés sur le même répertoire
+évinceraient les blobs l'un de l'autre, ce qui lève une ``ValueError``.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    def __init__(self, directory: str, max_bytes: int, namespace: Optional[str] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self._namespace_checked = namespace is None
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, dict]" = OrderedDict()
+        # Identité du fichier index.json reflété par _index (inode, mtime, taille)
+        self._index_stamp: Optional[tuple] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Stockage
+    # ------------------------------------------------------------------
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[tuple]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Verrous de thread et de fichier, avec l'index à jour du disque."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "index.lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._check_namespace()
+                    self._load()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _check_namespace(self) -> None:
+        if self._namespace_checked:
+            return
+        path = os.path.join(self.directory, "namespace")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                owner = f.read().strip()
+        except FileNotFoundError:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.namespace)
+            owner = self.namespace
+        if owner != self.namespace:
+            raise ValueError(f"Répertoire de cache {self.directory} déjà utilisé par le cache {owner!r}")
+        self._namespace_checked = True
+
+    def _load(self) -> None:
+        """Relit ``index.json`` s'il a changé depuis la dernière lecture ou écriture."""
+        stamp = self._stamp(self._index_path)
+        if stamp == self._index_stamp:
+            return
+        self._index_stamp = stamp
+        self._index.clear()
+        if stamp is None:
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning("Index du cache %s illisible, il est ignoré: %s", self.directory, e)
+            return
+        for key, entry in entries:
+            if os.path.exists(self._blob_path(entry["sha256"])):
+                self._index[key] = entry
+
+    def _save(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".index-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(list(self._index.items()), f)
+        os.replace(tmp_path, self._index_path)
+        self._index_stamp = self._stamp(self._index_path)
+
+    def _write_blob(self, digest: str, data: bytes) -> None:
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".blob-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _drop_blob_if_unused(self, digest: str) -> None:
+        if any(e["sha256"] == digest for e in self._index.values()):
+            return
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _total_bytes(self) -> int:
+        return sum({e["sha256"]: e["size"] for e in self._index.values()}.values())
+
+    def _evict(self) -> None:
+        while self._index and self._total_bytes() > self.max_bytes:
+            _key, entry = self._index.popitem(last=False)
+            self._drop_blob_if_unused(entry["sha256"])
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # API publique
+    # ------------------------------------------------------------------
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        """Métadonnées associées à ``key`` (sans compter un accès)."""
+        with self._locked():
+            entry = self._index.get(key)
+            return dict(entry) if entry else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._locked():
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._blob_path(entry["sha256"]), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                del self._index[key]
+                self._save()
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self._save()
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes, **meta) -> str:
+        """Stocke ``data`` sous ``key`` et renvoie son empreinte SHA-256."""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._locked():
+            self._write_blob(digest, data)
+            previous = self._index.pop(key, None)
+            self._index[key] = {"sha256": digest, "size": len(data), **meta}
+            if previous and previous["sha256"] != digest:
+                self._drop_blob_if_unused(previous["sha256"])
+            self._evict()
+            self._save()
+        return digest
+
+    def update_meta(self, key: str, **meta) -> None:
+        with self._locked():
+            if key in self._index:
+                self._index[key].update(meta)
+                self._save()
+
+    def discard(self, key: str) -> None:
+        with self._locked():
+            entry = self._index.pop(key, None)
+            if entry is not None:
+                self._drop_blob_if_unused(entry["sha256"])
+                self._save()
+
+    def stats(self) -> dict:
+        with self._locked():
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,22 +1,160 @@
-from typing import Dict
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from app.core.config import settings
+
+
+class _PreparedTemplate:
+    """État prétraité d'un modèle : document vierge + sources Jinja compilées.
+
+    La préparation (dézippage, parsing XML, ``patch_xml`` qui recolle les
+    balises Jinja coupées en plusieurs runs, compilation Jinja) est faite une
+    seule fois ; chaque rendu part ensuite d'une copie du document vierge.
+    """
+
+    def __init__(self, template_bytes: bytes, digest: str):
+        import io
+        from docxtpl import DocxTemplate  # type: ignore
+        from jinja2 import Environment
+
+        self.digest = digest
+        self._lock = threading.Lock()
+
+        tpl = DocxTemplate(io.BytesIO(template_bytes))
+        tpl.init_docx()
+        env = Environment()
+
+        def _compile(xml: str):
+            # Même mise en forme que DocxTemplate.render_xml_part avant compilation
+            return env.from_string(re.sub(r"<w:p([ >])", r"\n<w:p\1", tpl.patch_xml(xml)))
+
+        self.body = _compile(tpl.get_xml())
+        # (uri, relKey) -> (template compilé, encodage du XML d'origine)
+        self.parts: dict[tuple[str, str], tuple] = {}
+        for uri in (DocxTemplate.HEADER_URI, DocxTemplate.FOOTER_URI):
+            for rel_key, part in tpl.get_headers_footers(uri):
+                xml = tpl.get_part_xml(part)
+                self.parts[(uri, rel_key)] = (_compile(xml), tpl.get_headers_footers_encoding(xml))
+        self._docx = tpl.docx
+
+    def clone_docx(self):
+        import copy
+
+        with self._lock:
+            return copy.deepcopy(self._docx)
+
+
+def _compiled_template_class():
+    from docxtpl import DocxTemplate  # type: ignore
+
+    class _CompiledDocxTemplate(DocxTemplate):
+        """DocxTemplate qui rend à partir d'un :class:`_PreparedTemplate`."""
+
+        def __init__(self, prepared: _PreparedTemplate):
+            super().__init__(None)
+            self._prepared = prepared
+
+        def init_docx(self, reload: bool = True):
+            if not self.docx or (self.is_rendered and reload):
+                self.docx = self._prepared.clone_docx()
+                self.is_rendered = False
+
+        def _render_compiled(self, template, part, context) -> str:
+            # Reprend le post-traitement de DocxTemplate.render_xml_part
+            self.current_rendering_part = part
+            dst_xml = template.render(context)
+            dst_xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", dst_xml)
+            dst_xml = (
+                dst_xml.replace("{_{", "{{")
+                .replace("}_}", "}}")
+                .replace("{_%", "{%")
+                .replace("%_}", "%}")
+            )
+            return self.resolve_listing(dst_xml)
+
+        def build_xml(self, context, jinja_env=None):
+            return self._render_compiled(self._prepared.body, self.docx._part, context)
+
+        def build_headers_footers_xml(self, context, uri, jinja_env=None):
+            for rel_key, part in self.get_headers_footers(uri):
+                compiled, encoding = self._prepared.parts[(uri, rel_key)]
+                xml = self._render_compiled(compiled, part, context)
+                yield rel_key, xml.encode(encoding)
+
+    return _CompiledDocxTemplate
+
 
 class DocxService:
     """Stub de génération .docx à partir d'un modèle.
     On remplacera par docxtpl ultérieurement."""
 
-    def render(self, template_bytes: bytes, context: Dict) -> bytes:
+    def __init__(self, cache_size: int = 32):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Hashable, _PreparedTemplate]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._template_class = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _prepared(self, template_bytes: bytes, cache_key: Optional[Hashable]) -> _PreparedTemplate:
+        """Renvoie l'état prétraité du modèle (LRU borné à ``cache_size``).
+
+        La clé est ``(template_id, version)`` ; l'empreinte des octets est
+        vérifiée pour ne jamais servir un modèle modifié sous la même version.
+        """
+        digest = hashlib.sha1(template_bytes).hexdigest()
+        key = cache_key if cache_key is not None else digest
+        with self._cache_lock:
+            prepared = self._cache.get(key)
+            if prepared is not None and prepared.digest == digest:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return prepared
+            self.misses += 1
+
+        prepared = _PreparedTemplate(template_bytes, digest)
+        with self._cache_lock:
+            self._cache[key] = prepared
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return prepared
+
+    def cache_stats(self) -> dict:
+        with self._cache_lock:
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def render(self, template_bytes: bytes, context: Dict, cache_key: Optional[Hashable] = None) -> bytes:
         """Rend un .docx en utilisant docxtpl.
 
         Le *template_bytes* doit contenir le fichier modèle Word (.docx).
         Le *context* suit la syntaxe Jinja utilisée par docxtpl.
+        *cache_key* (``(template_id, version)``) identifie le modèle dans le
+        cache des modèles prétraités.
         """
         try:
-            from docxtpl import DocxTemplate, RichText  # type: ignore
+            from docxtpl import RichText  # type: ignore
             from docx.opc.constants import RELATIONSHIP_TYPE as RT  # type: ignore
             import io
 
-            buf = io.BytesIO(template_bytes)
-            doc = DocxTemplate(buf)
+            if self._template_class is None:
+                self._template_class = _compiled_template_class()
+            doc = self._template_class(self._prepared(template_bytes, cache_key))
 
             def _hlink(url: str, text: str | None = None):
                 """Fonction utilitaire Jinja pour insérer un hyperlien cliquable.
@@ -39,15 +177,19 @@ class DocxService:
             flat_ctx = {**context.get("product", {}), **context, "hlink": _hlink}
             doc.render(flat_ctx)
 
-            out_buf = io.BytesIO()
-            doc.save(out_buf)
+            # URL texte -> hyperliens et marqueurs d'annexe -> signets, directement
+            # sur l'arbre rendu avant l'unique sauvegarde
+            from app.utils.annex_markers import add_annex_bookmarks
+            from app.utils.docx_links import link_urls
 
-            from app.utils.docx_links import make_links_clickable
+            link_urls(doc.docx)
+            add_annex_bookmarks(doc.docx)
 
-            clickable_bytes = make_links_clickable(out_buf.getvalue())
-            return clickable_bytes
+            out_buf = io.BytesIO()
+            doc.save(out_buf)
+            return out_buf.getvalue()
         except Exception:
             # En cas d'erreur, on renvoie le template original pour ne pas bloquer
             return template_bytes
 
-docx_service = DocxService() 
\ No newline at end of file
+docx_service = DocxService(cache_size=settings.DOCX_TEMPLATE_CACHE_SIZE)
@@ -0,0 +1,146 @@
+"""Pool de clients Google Drive : un client par thread et par jeu de credentials.
+
+Les clients ``googleapiclient`` reposent sur httplib2, qui n'est pas
+thread-safe : un client partagé entre les threads de FastAPI et les pools
+d'exécution risque de mélanger deux réponses sur la même connexion. Chaque
+thread obtient donc son propre client, construit à partir du document de
+découverte et des credentials du tenant (``None`` = compte global, sinon
+l'ID utilisateur), tous deux préparés une seule fois.
+
+Les clients d'un tenant partagent son transport HTTP poolé si
+``DRIVE_HTTP_TRANSPORT`` en choisit un (voir :mod:`app.services.drive_transport`).
+
+Au plus ``DRIVE_CLIENT_MAX_TENANTS`` tenants sont gardés en mémoire (LRU).
+Un tenant est évincé quand ses credentials changent (``/drive/credentials``)
+ou lorsque le JSON lu en base ne correspond plus à celui du client.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.services.drive_guard import request_builder
+from app.services.drive_transport import create_shared_http, create_thread_http
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CREDENTIALS = "drive_credentials"
+SCOPES = ["https://www.googleapis.com/auth/drive"]
+DEFAULT_ROOT_URL = "https://www.googleapis.com/"
+
+
+def credentials_key(user_id: Optional[str]) -> str:
+    return f"{SETTINGS_CREDENTIALS}_{user_id}" if user_id else SETTINGS_CREDENTIALS
+
+
+class _Tenant:
+    def __init__(self, fingerprint: str, credentials):
+        self.fingerprint = fingerprint
+        self.credentials = credentials
+        self.shared_http = create_shared_http(credentials)
+        self.local = threading.local()
+
+
+class DriveClientPool:
+    def __init__(self, max_tenants: int):
+        self.max_tenants = max(1, max_tenants)
+        self._tenants: "OrderedDict[Optional[str], _Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._discovery_doc: Optional[str] = None
+        self.clients_built = 0
+        self.evictions = 0
+
+    def _discovery(self) -> Optional[str]:
+        if self._discovery_doc is None:
+            from googleapiclient import discovery_cache  # type: ignore
+
+            doc = discovery_cache.get_static_doc("drive", "v3")
+            root = settings.DRIVE_API_ENDPOINT.rstrip("/") + "/"
+            if doc and root != DEFAULT_ROOT_URL:
+                # API servie ailleurs (serveur de substitution des benchmarks)
+                parsed = json.loads(doc)
+                parsed["rootUrl"] = root
+                parsed["baseUrl"] = root + parsed["servicePath"]
+                doc = json.dumps(parsed)
+            self._discovery_doc = doc
+        return self._discovery_doc
+
+    def _tenant(self, user_id: Optional[str]) -> Optional[_Tenant]:
+        from app.crud.crud_setting import setting as crud_setting
+
+        creds_json = crud_setting.get_cached_value(credentials_key(user_id))
+        if creds_json is None:
+            self.evict(user_id)
+            return None
+        fingerprint = hashlib.sha256(creds_json.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            tenant = self._tenants.get(user_id)
+            if tenant is not None and tenant.fingerprint == fingerprint:
+                self._tenants.move_to_end(user_id)
+                return tenant
+
+        from google.oauth2 import service_account  # type: ignore
+
+        creds = service_account.Credentials.from_service_account_info(json.loads(creds_json), scopes=SCOPES)
+        tenant = _Tenant(fingerprint, creds)
+        with self._lock:
+            # Un autre thread a pu créer le même tenant entre-temps
+            existing = self._tenants.get(user_id)
+            if existing is not None and existing.fingerprint == fingerprint:
+                self._tenants.move_to_end(user_id)
+                return existing
+            self._tenants[user_id] = tenant
+            self._tenants.move_to_end(user_id)
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+                self.evictions += 1
+        return tenant
+
+    def _build(self, tenant: _Tenant) -> Any:
+        from googleapiclient.discovery import build, build_from_document  # type: ignore
+
+        http = tenant.shared_http or create_thread_http(tenant.credentials)
+        doc = self._discovery()
+        self.clients_built += 1
+        # Chaque requête passe par drive_guard (débit, reprises, disjoncteur)
+        if doc:
+            return build_from_document(doc, http=http, requestBuilder=request_builder())
+        # 'cache_discovery=False' to avoid writing to disk when running inside some environments
+        return build("drive", "v3", http=http, cache_discovery=False, requestBuilder=request_builder())
+
+    def get(self, user_id: Optional[str] = None) -> Any:
+        """Client Drive v3 du thread courant pour ce tenant (``None`` si non configuré)."""
+        tenant = self._tenant(user_id)
+        if tenant is None:
+            return None
+        client = getattr(tenant.local, "client", None)
+        if client is None:
+            client = tenant.local.client = self._build(tenant)
+        return client
+
+    def credentials(self, user_id: Optional[str] = None) -> Any:
+        """Credentials du tenant (``None`` si non configuré), pour les clients hors googleapiclient."""
+        tenant = self._tenant(user_id)
+        return tenant.credentials if tenant is not None else None
+
+    def evict(self, user_id: Optional[str] = None) -> None:
+        """Oublie les clients du tenant (credentials modifiés ou supprimés)."""
+        with self._lock:
+            if self._tenants.pop(user_id, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants": len(self._tenants),
+                "max_tenants": self.max_tenants,
+                "clients_built": self.clients_built,
+                "evictions": self.evictions,
+            }
+
+
+drive_client_pool = DriveClientPool(max_tenants=settings.DRIVE_CLIENT_MAX_TENANTS)
@@ -0,0 +1,384 @@
+"""Protection des appels Drive : débit limité, reprises et disjoncteur.
+
+Tous les appels à l'API Drive du processus (clients ``googleapiclient`` de
+:mod:`app.services.drive_client_pool` et client asynchrone) passent par
+``drive_guard`` :
+
+* un seau à jetons partagé limite le débit à ``DRIVE_RATE_LIMIT`` requêtes/s
+  (rafales de ``DRIVE_RATE_BURST``), sous le quota Drive par utilisateur ;
+* les erreurs passagères (429, 403 ``rateLimitExceeded``, 5xx, coupures
+  réseau) sont rejouées jusqu'à ``DRIVE_RETRY_MAX`` fois, avec un délai
+  exponentiel tiré au hasard (« full jitter ») et au moins ``Retry-After`` ;
+  un 429 suspend aussi le seau pour tous les threads. Seuls les appels
+  idempotents sont rejoués tels quels : une création (``files.create``
+  simple, ``files.copy``) a pu aboutir malgré l'erreur, elle n'est rejouée
+  que si l'appelant fournit de quoi retrouver le fichier créé
+  (:meth:`DriveGuard.call_create`) ;
+* après ``DRIVE_BREAKER_THRESHOLD`` pannes consécutives (5xx, réseau), le
+  disjoncteur s'ouvre : les appels échouent aussitôt avec
+  :class:`DriveUnavailableError` (HTTP 503) pendant
+  ``DRIVE_BREAKER_RESET_SECONDS``, puis un seul appel d'essai est autorisé.
+
+Les limitations de débit ne comptent pas comme des pannes : Drive a répondu.
+"""
+import asyncio
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class DriveError(Exception):
+    """Échec d'un appel Drive alors que Drive est configuré (HTTP 502)."""
+
+
+class DriveUnavailableError(DriveError):
+    """Drive indisponible ou quota épuisé malgré les reprises (HTTP 503)."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ----------------------------------------------------------------------
+# Classification des erreurs
+# ----------------------------------------------------------------------
+
+
+def _status_content_headers(exc: Exception) -> tuple[Optional[int], bytes, Any]:
+    resp = getattr(exc, "resp", None)  # googleapiclient.errors.HttpError
+    if resp is not None and getattr(resp, "status", None) is not None:
+        return int(resp.status), getattr(exc, "content", b"") or b"", resp
+    response = getattr(exc, "response", None)  # httpx.HTTPStatusError
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code, response.content or b"", response.headers
+    return None, b"", None
+
+
+def _reasons(content: bytes) -> set:
+    try:
+        error = json.loads(content).get("error", {})
+    except Exception:
+        return set()
+    if not isinstance(error, dict):
+        return set()
+    return {item.get("reason") for item in error.get("errors", []) if isinstance(item, dict)}
+
+
+def classify(exc: Exception) -> Optional[str]:
+    """``"rate_limited"``, ``"unavailable"`` (erreur rejouable) ou ``None``."""
+    status, content, _ = _status_content_headers(exc)
+    if status is not None:
+        if status == 429 or (status == 403 and _reasons(content) & RATE_LIMIT_REASONS):
+            return "rate_limited"
+        if status >= 500:
+            return "unavailable"
+        return None
+    if isinstance(exc, (ConnectionError, TimeoutError, socket.timeout)):
+        return "unavailable"
+    try:
+        import httplib2  # type: ignore
+
+        if isinstance(exc, httplib2.HttpLib2Error):
+            return "unavailable"
+    except ImportError:
+        pass
+    try:
+        import httpx  # type: ignore
+
+        if isinstance(exc, httpx.TransportError):
+            return "unavailable"
+    except ImportError:
+        pass
+    return None
+
+
+def retry_after(exc: Exception) -> float:
+    _, _, headers = _status_content_headers(exc)
+    try:
+        return max(0.0, float(headers.get("retry-after"))) if headers is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ----------------------------------------------------------------------
+# Seau à jetons et disjoncteur
+# ----------------------------------------------------------------------
+
+
+class TokenBucket:
+    """Seau à jetons thread-safe ; chaque appel réserve un créneau et attend son tour."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def reserve(self) -> float:
+        """Prend un jeton et renvoie le délai (s) à respecter avant l'appel."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+            if delay > 0:
+                self.waits += 1
+            return delay
+
+    def pause(self, seconds: float) -> None:
+        """Suspend tous les appels (quota dépassé côté Drive)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise DriveUnavailableError("Google Drive indisponible (disjoncteur ouvert)", retry_after=remaining)
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                # Un seul appel d'essai à la fois ; les autres échouent aussitôt
+                if self._trial_running:
+                    self.rejected += 1
+                    raise DriveUnavailableError("Google Drive indisponible (essai en cours)", retry_after=1.0)
+                self._trial_running = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Google Drive de nouveau disponible, disjoncteur refermé")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def abandon_trial(self) -> None:
+        """L'appel d'essai s'est interrompu sans résultat (annulation...) : un autre pourra essayer."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                if self.state == self.CLOSED:
+                    logger.error("Google Drive indisponible (%d échecs consécutifs), disjoncteur ouvert", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.opens += 1
+
+
+# ----------------------------------------------------------------------
+# Garde
+# ----------------------------------------------------------------------
+
+
+class DriveGuard:
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        breaker: CircuitBreaker,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def backoff(self, attempt: int, exc: Exception) -> float:
+        """Délai avant la reprise ``attempt`` (0 = première) : full jitter, au moins Retry-After."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return max(random.uniform(0, ceiling), retry_after(exc))
+
+    def _before(self) -> float:
+        self.breaker.before_call()
+        self.calls += 1
+        return self.bucket.reserve()
+
+    def _on_error(self, exc: Exception, attempt: int, retry: bool = True) -> float:
+        """Enregistre l'échec ; renvoie le délai avant reprise ou relève l'erreur."""
+        kind = classify(exc)
+        if kind is None:
+            # Réponse Drive définitive (404, 400...) : le service fonctionne
+            self.breaker.record_success()
+            raise exc
+        delay = self.backoff(attempt, exc)
+        if kind == "rate_limited":
+            self.rate_limited += 1
+            self.breaker.record_success()
+            self.bucket.pause(delay)
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries or not retry:
+            raise DriveUnavailableError(f"Google Drive indisponible: {exc}", retry_after=delay) from exc
+        self.retries += 1
+        logger.warning("Appel Drive en échec (%s), nouvel essai dans %.1fs", exc, delay)
+        return delay
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Exécute ``fn`` (appel Drive bloquant et idempotent) sous la garde."""
+        return self._call(fn, args, kwargs, idempotent=True)
+
+    def call_create(self, fn: Callable[..., Any], recover: Optional[Callable[[], Any]], *args, **kwargs) -> Any:
+        """Comme :meth:`call`, pour un appel qui crée une ressource Drive.
+
+        Avant chaque reprise, ``recover()`` cherche la ressource que l'essai en
+        échec a pu créer ; si elle existe, elle tient lieu de résultat. Sans
+        ``recover``, une erreur passagère n'est pas rejouée
+        (:class:`DriveUnavailableError`).
+        """
+        return self._call(fn, args, kwargs, idempotent=False, recover=recover)
+
+    def _call(self, fn, args, kwargs, *, idempotent: bool, recover: Optional[Callable[[], Any]] = None) -> Any:
+        attempt = 0
+        while True:
+            delay = self._before()
+            try:
+                if delay:
+                    time.sleep(delay)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._on_error(e, attempt, retry=idempotent or recover is not None))
+                if not idempotent:
+                    found = recover()
+                    if found is not None:
+                        logger.info("Création Drive aboutie malgré l'erreur (%s), pas de nouvel envoi", e)
+                        return found
+                attempt += 1
+                continue
+            except BaseException:
+                # KeyboardInterrupt... : l'essai du disjoncteur ne doit pas rester réservé
+                self.breaker.abandon_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Équivalent asynchrone de :meth:`call` (``fn`` est une coroutine)."""
+        return await self._call_async(fn, args, kwargs, idempotent=True)
+
+    async def call_create_async(self, fn: Callable[..., Any], recover, *args, **kwargs) -> Any:
+        """Équivalent asynchrone de :meth:`call_create` (``recover`` est une coroutine)."""
+        return await self._call_async(fn, args, kwargs, idempotent=False, recover=recover)
+
+    async def _call_async(self, fn, args, kwargs, *, idempotent: bool, recover=None) -> Any:
+        attempt = 0
+        while True:
+            delay = self._before()
+            try:
+                if delay:
+                    await asyncio.sleep(delay)
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._on_error(e, attempt, retry=idempotent or recover is not None))
+                if not idempotent:
+                    found = await recover()
+                    if found is not None:
+                        logger.info("Création Drive aboutie malgré l'erreur (%s), pas de nouvel envoi", e)
+                        return found
+                attempt += 1
+                continue
+            except BaseException:
+                # Requête annulée (CancelledError) : l'essai du disjoncteur ne doit pas rester réservé
+                self.breaker.abandon_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttled": self.bucket.waits,
+            "breaker_state": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "breaker_rejected": self.breaker.rejected,
+        }
+
+
+def is_idempotent(method: str, uri: str, resumable: bool = False) -> bool:
+    """``True`` si rejouer la requête ne peut pas créer de doublon sur Drive.
+
+    Lectures, mises à jour et morceaux d'upload (``PUT``) se rejouent sans
+    risque, comme l'ouverture d'une session d'upload (aucun fichier tant que
+    les octets ne sont pas envoyés) et le partage « anyone » (Drive renvoie la
+    permission existante). Les autres ``POST`` (``files.create`` simple,
+    ``files.copy``) créent un fichier à chaque essai.
+    """
+    if method.upper() != "POST" or resumable:
+        return True
+    return uri.split("?", 1)[0].rstrip("/").endswith("/permissions")
+
+
+drive_guard = DriveGuard(
+    TokenBucket(rate=settings.DRIVE_RATE_LIMIT, burst=settings.DRIVE_RATE_BURST),
+    CircuitBreaker(threshold=settings.DRIVE_BREAKER_THRESHOLD, reset_timeout=settings.DRIVE_BREAKER_RESET_SECONDS),
+    max_retries=settings.DRIVE_RETRY_MAX,
+    backoff_base=settings.DRIVE_BACKOFF_BASE,
+    backoff_max=settings.DRIVE_BACKOFF_MAX,
+)
+
+
+@lru_cache(maxsize=None)
+def request_builder():
+    """``HttpRequest`` de googleapiclient dont chaque envoi passe par ``drive_guard``.
+
+    ``num_retries`` est ignoré : les reprises sont celles de la garde. Un
+    ``next_chunk`` rejoué après une erreur demande d'abord à Drive l'octet
+    atteint (voir ``HttpRequest._in_error_state``). Une requête non
+    idempotente n'est rejouée que si son attribut ``recover`` est renseigné.
+    """
+    from googleapiclient.http import HttpRequest  # type: ignore
+
+    class GuardedHttpRequest(HttpRequest):
+        # Recherche de la ressource créée par un essai en échec (voir DriveGuard.call_create)
+        recover: Optional[Callable[[], Any]] = None
+
+        def execute(self, http=None, num_retries=0):
+            if is_idempotent(self.method, self.uri, self.resumable is not None):
+                return drive_guard.call(super().execute, http=http)
+            return drive_guard.call_create(super().execute, self.recover, http=http)
+
+        def next_chunk(self, http=None, num_retries=0):
+            return drive_guard.call(super().next_chunk, http=http)
+
+    return GuardedHttpRequest
@@ -0,0 +1,219 @@
+"""Partage « tout le monde avec le lien » des fichiers Drive (vignettes, aperçus).
+
+Chaque upload était suivi d'un ``permissions.create`` : deux allers-retours
+Drive par fichier. Deux leviers, réglés par la configuration :
+
+* ``DRIVE_SHARING_MODE = "folder"`` : le partage est posé une fois sur les
+  dossiers ``<Client>/<Produit>/<Ref>...`` résolus par ``ensure_folder`` et
+  les fichiers qu'ils contiennent en héritent. Un fichier déposé ailleurs (à
+  la racine, dans un dossier non géré par l'application) reste partagé
+  individuellement. Un dossier créé avant le passage à ce mode est partagé
+  au premier upload qu'il reçoit dans le processus. Le partage d'un dossier
+  est envoyé immédiatement et le dossier n'est considéré comme partagé
+  qu'une fois la permission accordée : en cas d'échec, ses fichiers sont
+  partagés un par un et le partage du dossier est retenté au prochain appel.
+* ``DRIVE_PERMISSION_BATCH_DELAY > 0`` : les partages individuels restants
+  sont regroupés par un thread en requêtes batch Drive (``DRIVE_BATCH_SIZE``
+  au plus), envoyées dès qu'un lot est plein ou après ce délai. Le partage
+  arrive alors quelques centaines de millisecondes après l'upload.
+
+Attention : en mode ``folder``, quiconque a le lien d'un dossier en voit le
+contenu (les autres documents du produit).
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.services.drive_guard import classify, drive_guard
+
+logger = logging.getLogger(__name__)
+
+ANYONE_READER = {"type": "anyone", "role": "reader"}
+SHARING_MODES = ("file", "folder")
+MAX_ATTEMPTS = 3
+
+
+class DriveSharing:
+    def __init__(self, mode: str, batch_delay: float, batch_size: int):
+        if mode not in SHARING_MODES:
+            logger.warning("DRIVE_SHARING_MODE=%s inconnu, partage par fichier", mode)
+            mode = "file"
+        self.mode = mode
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self._shared_folders: set[str] = set()
+        self._pending: list[tuple[str, int]] = []  # (file_id, tentative)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self.grants = 0
+        self.folders_shared = 0
+        self.inherited = 0
+        self.batches = 0
+        self.failures = 0
+
+    @property
+    def batched(self) -> bool:
+        return self.batch_delay > 0
+
+    # ------------------------------------------------------------------
+    # Décisions
+    # ------------------------------------------------------------------
+
+    def folder_resolved(self, folder_id: str) -> bool:
+        """Dossier trouvé ou créé par ``ensure_folder`` : partagé en mode ``folder``.
+
+        Renvoie ``True`` si le dossier est partagé (ses fichiers en héritent).
+        """
+        if self.mode != "folder":
+            return False
+        with self._cond:
+            if folder_id in self._shared_folders:
+                return True
+        if not self._create_permission(folder_id):
+            return False
+        with self._cond:
+            if folder_id not in self._shared_folders:
+                self._shared_folders.add(folder_id)
+                self.folders_shared += 1
+        return True
+
+    def file_needs_grant(self, parent_id: Optional[str]) -> bool:
+        """``False`` si le fichier hérite du partage de son dossier parent."""
+        if self.mode != "folder" or not parent_id:
+            return True
+        with self._cond:
+            if parent_id in self._shared_folders:
+                self.inherited += 1
+                return False
+        from app.services.folder_cache import folder_cache
+
+        if folder_cache.path_for(parent_id) is None:
+            return True  # dossier non géré par l'application : on ne le partage pas
+        if not self.folder_resolved(parent_id):
+            return True
+        with self._cond:
+            self.inherited += 1
+        return False
+
+    # ------------------------------------------------------------------
+    # Envoi des permissions
+    # ------------------------------------------------------------------
+
+    def grant(self, file_id: str) -> None:
+        """Partage ``file_id`` : en lot si ``batched``, sinon immédiatement."""
+        if self.batched:
+            self._enqueue(file_id, 0)
+            return
+        self._create_permission(file_id)
+
+    def _create_permission(self, file_id: str) -> bool:
+        """Envoie le partage de ``file_id`` ; ``True`` si la permission est accordée."""
+        from app.services.google_drive import google_drive_service
+
+        service = google_drive_service._get_service()
+        if service is None:
+            return False
+        try:
+            service.permissions().create(fileId=file_id, body=ANYONE_READER, fields="id").execute()
+        except Exception as e:
+            # On ignore les erreurs de permission (souvent déjà accordée)
+            logger.debug("Partage de %s impossible: %s", file_id, e)
+            with self._cond:
+                self.failures += 1
+            return False
+        with self._cond:
+            self.grants += 1
+        return True
+
+    def _enqueue(self, file_id: str, attempt: int) -> None:
+        with self._cond:
+            self._pending.append((file_id, attempt))
+            if self._thread is None:
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, name="drive-sharing", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if not self._pending:
+                    self._thread = None
+                    return
+                # Attend que le lot se remplisse, au plus batch_delay
+                deadline = time.monotonic() + self.batch_delay
+                while len(self._pending) < self.batch_size and not self._stop:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size:]
+            try:
+                self._send(batch)
+            except Exception:
+                logger.exception("Erreur inattendue lors du partage de fichiers Drive")
+
+    def _send(self, batch: list[tuple[str, int]]) -> None:
+        from app.services.google_drive import google_drive_service
+
+        service = google_drive_service._get_service()
+        if service is None:
+            return
+        errors: dict[str, Exception] = {}
+
+        def _on_response(request_id, _response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+
+        request = service.new_batch_http_request(callback=_on_response)
+        for i, (file_id, _attempt) in enumerate(batch):
+            request.add(service.permissions().create(fileId=file_id, body=ANYONE_READER, fields="id"), request_id=str(i))
+        try:
+            drive_guard.call(request.execute)
+        except Exception as e:
+            logger.warning("Lot de %d partages Drive en échec: %s", len(batch), e)
+            errors = {str(i): e for i in range(len(batch))}
+
+        with self._cond:
+            self.batches += 1
+            self.grants += len(batch) - len(errors)
+            self.failures += len(errors)
+        for i, exc in errors.items():
+            file_id, attempt = batch[int(i)]
+            if classify(exc) is not None and attempt + 1 < MAX_ATTEMPTS:
+                self._enqueue(file_id, attempt + 1)
+            else:
+                logger.warning("Partage du fichier Drive %s impossible: %s", file_id, exc)
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Envoie les partages en attente puis arrête le thread."""
+        with self._cond:
+            self._stop = True
+            thread = self._thread
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "mode": self.mode,
+                "grants": self.grants,
+                "folders_shared": self.folders_shared,
+                "inherited": self.inherited,
+                "batches": self.batches,
+                "failures": self.failures,
+                "pending": len(self._pending),
+            }
+
+
+drive_sharing = DriveSharing(
+    mode=settings.DRIVE_SHARING_MODE,
+    batch_delay=settings.DRIVE_PERMISSION_BATCH_DELAY,
+    batch_size=settings.DRIVE_BATCH_SIZE,
+)
@@ -0,0 +1,138 @@
+"""Transports HTTP des clients Google Drive.
+
+``googleapiclient`` attend un objet au format httplib2 (``request(uri,
+method, body, headers)`` -> ``(Response, contenu)``). Par défaut chaque
+thread a son propre ``httplib2.Http`` : pas de mutualisation des connexions
+entre threads et une poignée de main TLS à chaque connexion froide.
+
+``DRIVE_HTTP_TRANSPORT`` permet de choisir un client qui mutualise ses
+connexions entre threads, partagé par tous les clients d'un même tenant :
+
+* ``httplib2`` : comportement historique (une connexion par thread) ;
+* ``requests`` : ``AuthorizedSession`` avec un pool urllib3 de
+  ``DRIVE_HTTP_POOL_SIZE`` connexions keep-alive ;
+* ``httpx`` : ``httpx.Client`` avec les mêmes limites, en HTTP/2 si
+  ``DRIVE_HTTP2`` est actif et que le paquet ``h2`` est installé
+  (``httpx[http2]``).
+
+Si le paquet du transport choisi n'est pas installé, httplib2 est utilisé.
+"""
+import abc
+import logging
+import threading
+from typing import Any, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("httplib2", "requests", "httpx")
+
+
+def _response(status: int, headers, content: bytes):
+    import httplib2  # type: ignore
+
+    info = {k.lower(): v for k, v in headers.items()}
+    info["status"] = str(status)
+    return httplib2.Response(info), content
+
+
+class _PooledHttp(abc.ABC):
+    """Adaptateur httplib2 -> client poolé, partagé entre threads."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.timeout = settings.DRIVE_HTTP_TIMEOUT
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        status, resp_headers, content = self._send(method, uri, body, dict(headers or {}))
+        return _response(status, resp_headers, content)
+
+    @abc.abstractmethod
+    def _send(self, method: str, uri: str, body, headers: dict):
+        """Envoie la requête ; renvoie ``(statut, en-têtes, contenu)``."""
+
+
+class _RequestsHttp(_PooledHttp):
+    def __init__(self, credentials):
+        super().__init__(credentials)
+        from google.auth.transport.requests import AuthorizedSession  # type: ignore
+        from requests.adapters import HTTPAdapter  # type: ignore
+
+        self.session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=settings.DRIVE_HTTP_POOL_SIZE, pool_maxsize=settings.DRIVE_HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _send(self, method, uri, body, headers):
+        resp = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        return resp.status_code, resp.headers, resp.content
+
+
+class _HttpxHttp(_PooledHttp):
+    def __init__(self, credentials):
+        super().__init__(credentials)
+        import httpx  # type: ignore
+        from google.auth.transport.requests import Request  # type: ignore
+
+        http2 = settings.DRIVE_HTTP2 and http2_available()
+        self.client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.DRIVE_HTTP_POOL_SIZE,
+                max_keepalive_connections=settings.DRIVE_HTTP_POOL_SIZE,
+                keepalive_expiry=settings.DRIVE_HTTP_KEEPALIVE_SECONDS,
+            ),
+            timeout=self.timeout,
+            follow_redirects=True,
+        )
+        self._auth_request = Request()
+        # Le rafraîchissement du jeton n'est pas thread-safe
+        self._auth_lock = threading.Lock()
+
+    def _send(self, method, uri, body, headers):
+        with self._auth_lock:
+            self.credentials.before_request(self._auth_request, method, uri, headers)
+        resp = self.client.request(method, uri, content=body, headers=headers)
+        if resp.status_code == 401:
+            # Jeton révoqué ou expiré côté serveur : un rafraîchissement puis un essai
+            with self._auth_lock:
+                self.credentials.refresh(self._auth_request)
+                self.credentials.apply(headers)
+            resp = self.client.request(method, uri, content=body, headers=headers)
+        return resp.status_code, resp.headers, resp.content
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_shared_http(credentials) -> Optional[_PooledHttp]:
+    """Transport poolé partagé par les threads d'un tenant (``None`` pour httplib2)."""
+    name = settings.DRIVE_HTTP_TRANSPORT
+    transport = {"requests": _RequestsHttp, "httpx": _HttpxHttp}.get(name)
+    if transport is None:
+        if name not in TRANSPORTS:
+            logger.warning("DRIVE_HTTP_TRANSPORT=%s inconnu, utilisation de httplib2", name)
+        return None
+    try:
+        return transport(credentials)
+    except ImportError as e:
+        logger.warning("Transport %s indisponible (%s), utilisation de httplib2", name, e)
+        return None
+
+
+def create_thread_http(credentials) -> Any:
+    """Transport httplib2 propre à un thread (httplib2 n'est pas thread-safe)."""
+    import google_auth_httplib2  # type: ignore
+    import httplib2  # type: ignore
+
+    http = httplib2.Http(timeout=settings.DRIVE_HTTP_TIMEOUT)
+    # 308 = « Resume Incomplete » des uploads par morceaux, pas une redirection
+    # (comme googleapiclient.http.build_http)
+    http.redirect_codes = http.redirect_codes - {308}
+    return google_auth_httplib2.AuthorizedHttp(credentials, http=http)
@@ -0,0 +1,128 @@
+"""Outils d'upload Drive par morceaux (protocole « resumable »).
+
+Un fichier au-delà de ``DRIVE_RESUMABLE_THRESHOLD`` est envoyé par morceaux
+de ``DRIVE_UPLOAD_CHUNK_SIZE`` lus directement dans le fichier source (le
+fichier temporaire de ``UploadFile``) : la mémoire reste bornée à un morceau
+et une coupure reprend au dernier octet reçu par Drive au lieu de tout
+renvoyer.
+
+:class:`HashingReader` calcule le md5 au fil de la lecture, sans seconde
+passe sur le fichier, pour le comparer au ``md5Checksum`` renvoyé par Drive.
+"""
+import hashlib
+import io
+import os
+import threading
+import uuid
+from typing import IO, Optional
+
+from app.core.config import settings
+from app.services.drive_guard import DriveError
+
+# Drive impose des morceaux multiples de 256 Kio (sauf le dernier)
+CHUNK_GRANULARITY = 256 * 1024
+# Propriété d'application posée sur les fichiers créés par un envoi simple
+UPLOAD_TOKEN_PROPERTY = "dipUploadToken"
+
+
+class ChecksumMismatchError(DriveError):
+    """Le md5 calculé par Drive ne correspond pas aux octets envoyés.
+
+    ``file_id`` est le fichier corrompu déjà créé sur Drive, à supprimer.
+    """
+
+    def __init__(self, message: str, file_id: str):
+        super().__init__(message)
+        self.file_id = file_id
+
+
+def chunk_size() -> int:
+    size = max(settings.DRIVE_UPLOAD_CHUNK_SIZE, CHUNK_GRANULARITY)
+    return size - size % CHUNK_GRANULARITY
+
+
+def use_resumable(size: int) -> bool:
+    return size > settings.DRIVE_RESUMABLE_THRESHOLD
+
+
+def tag_upload(metadata: dict) -> str:
+    """Marque ``metadata`` d'un jeton unique ; renvoie la requête ``files.list`` qui le retrouve.
+
+    Un ``files.create`` simple en erreur (5xx, coupure) a pu créer le fichier :
+    avant de le rejouer, on le cherche par ce jeton (``DriveGuard.call_create``)
+    au lieu d'en créer un second.
+    """
+    token = uuid.uuid4().hex
+    metadata["appProperties"] = {**metadata.get("appProperties", {}), UPLOAD_TOKEN_PROPERTY: token}
+    return f"appProperties has {{ key='{UPLOAD_TOKEN_PROPERTY}' and value='{token}' }} and trashed=false"
+
+
+class HashingReader(io.RawIOBase):
+    """Lecteur seekable qui calcule le md5 du flux au fil des lectures.
+
+    Les octets ne sont hachés qu'une fois, dans l'ordre : relire un morceau
+    déjà envoyé (reprise après erreur) ne fausse pas l'empreinte. ``md5()``
+    ne renvoie l'empreinte qu'une fois le flux entièrement lu.
+    """
+
+    def __init__(self, raw: IO[bytes] | bytes):
+        if isinstance(raw, (bytes, bytearray)):
+            raw = io.BytesIO(raw)
+        self.raw = raw
+        self.raw.seek(0, os.SEEK_END)
+        self.size = self.raw.tell()
+        self.raw.seek(0)
+        self._pos = 0
+        self._hash = hashlib.md5()
+        self._hashed = 0
+        self._lock = threading.Lock()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._pos = self.raw.seek(offset, whence)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.raw.read(size)
+        start, self._pos = self._pos, self._pos + len(data)
+        # Ne hache que la partie qui prolonge ce qui l'a déjà été
+        if start <= self._hashed < self._pos:
+            self._hash.update(data[self._hashed - start:])
+            self._hashed = self._pos
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Lecture positionnée, sûre entre threads (uploads asynchrones)."""
+        with self._lock:
+            self.seek(offset)
+            return self.read(size)
+
+    def md5(self) -> Optional[str]:
+        if self._hashed < self.size:
+            return None
+        return self._hash.hexdigest()
+
+
+def verify_md5(reader: HashingReader, remote_md5: Optional[str], file_id: str) -> None:
+    """Lève :class:`ChecksumMismatchError` si Drive a reçu d'autres octets.
+
+    Sans ``md5Checksum`` (fichiers convertis en Google Docs) rien n'est vérifié.
+    """
+    local_md5 = reader.md5()
+    if remote_md5 and local_md5 and remote_md5 != local_md5:
+        raise ChecksumMismatchError(
+            f"md5 Drive {remote_md5} != md5 local {local_md5} pour le fichier {file_id}", file_id
+        )
@@ -0,0 +1,110 @@
+"""Exécuteurs partagés pour le travail bloquant des endpoints et des workers.
+
+Quatre étages, chacun borné par un réglage :
+
+* ``render`` : pool de processus pour le rendu docxtpl, purement CPU et qui
+  tient le GIL (``RENDER_PROCESSES``). Le contexte ``spawn`` évite de forker
+  un processus qui porte déjà des threads (workers, pool SQLAlchemy).
+* ``io`` : threads pour les appels Drive et SQLAlchemy synchrones des
+  endpoints ``async`` (``BLOCKING_IO_WORKERS``).
+* ``pdf`` : threads pour la fusion pypdf (``PDF_MERGE_WORKERS``), gardés peu
+  nombreux pour limiter la contention du GIL avec la boucle asyncio.
+* ``annex`` : téléchargements parallèles des annexes PDF
+  (``ANNEX_FETCH_WORKERS``).
+
+Les endpoints ``async`` attendent ces étages via :func:`run_in_thread` : la
+boucle d'événements reste libre pour les requêtes légères pendant qu'une
+génération tourne.
+"""
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+_render_pool: ProcessPoolExecutor | None = None
+_render_pool_lock = threading.Lock()
+
+_thread_pools: dict[str, ThreadPoolExecutor] = {}
+_thread_pools_lock = threading.Lock()
+
+
+def _render(template_bytes: bytes, context: Dict, cache_key: Optional[Hashable]) -> bytes:
+    # Exécuté dans le processus enfant : l'import se fait côté worker, et
+    # chaque processus garde son propre cache de modèles prétraités
+    from app.services.docx_service import docx_service
+
+    return docx_service.render(template_bytes, context=context, cache_key=cache_key)
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=settings.RENDER_PROCESSES or None,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def submit_render(
+    template_bytes: bytes, context: Dict, cache_key: Optional[Hashable] = None
+) -> "Future[bytes]":
+    """Soumet un rendu DOCX au pool de processus."""
+    return get_render_pool().submit(_render, template_bytes, context, cache_key)
+
+
+def render(template_bytes: bytes, context: Dict, cache_key: Optional[Hashable] = None) -> bytes:
+    """Rendu DOCX bloquant, exécuté dans le pool de processus."""
+    return submit_render(template_bytes, context, cache_key).result()
+
+
+def _thread_limits() -> dict[str, int]:
+    return {
+        "io": settings.BLOCKING_IO_WORKERS,
+        "pdf": settings.PDF_MERGE_WORKERS,
+        "annex": settings.ANNEX_FETCH_WORKERS,
+    }
+
+
+def get_thread_pool(stage: str) -> ThreadPoolExecutor:
+    """Pool de threads borné de l'étage ``stage`` (``io``, ``pdf`` ou ``annex``)."""
+    with _thread_pools_lock:
+        pool = _thread_pools.get(stage)
+        if pool is None:
+            limit = _thread_limits()[stage]
+            pool = ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix=f"dip-{stage}")
+            _thread_pools[stage] = pool
+        return pool
+
+
+def run_in_stage(stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Exécute ``fn`` dans l'étage ``stage`` et attend son résultat (code synchrone)."""
+    return get_thread_pool(stage).submit(fn, *args, **kwargs).result()
+
+
+async def run_in_thread(stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Attend ``fn`` exécutée dans l'étage ``stage`` sans bloquer la boucle asyncio.
+
+    Les exceptions (``HTTPException`` comprises) remontent telles quelles.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(stage), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown() -> None:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+    with _thread_pools_lock:
+        for pool in _thread_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pools.clear()
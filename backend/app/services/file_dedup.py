@@ -0,0 +1,83 @@
+"""Déduplication des fichiers uploadés (annexes, modèles) par empreinte du contenu.
+
+Le même rapport SPF ou toxicologique est joint à des dizaines de produits :
+chaque upload créait pourtant un nouveau fichier Drive. Les lignes
+``attachments`` et ``templates`` portent maintenant le SHA-256 de leur
+contenu (``content_hash``, indexé) : c'est l'index empreinte -> fichier.
+Avant d'envoyer un fichier, on cherche une ligne de même empreinte et l'on
+réutilise son ``drive_file_id`` si le fichier existe toujours et que son md5
+(métadonnée Drive, un seul appel) correspond aux octets reçus.
+
+La recherche reste dans l'arborescence du fichier : une annexe ne réutilise
+que les annexes des produits du même utilisateur rangés dans le même dossier
+``<Client>/<Produit>`` (le fichier disparaît avec ce dossier, qui n'est purgé
+qu'une fois plus aucun produit ne l'utilise), un modèle que les modèles.
+Un fichier partagé n'est supprimé qu'une fois plus aucune ligne ne le
+référence (contrôle fait par la file de purge, :mod:`app.services.purge_queue`).
+"""
+import hashlib
+import logging
+import os
+from typing import IO, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+READ_BUFFER = 1024 * 1024
+
+
+class ContentDigest(NamedTuple):
+    sha256: str
+    md5: str
+    size: int
+
+
+def digest(file_obj: IO[bytes] | bytes) -> ContentDigest:
+    """Empreintes du contenu, en une passe par blocs (le flux est rembobiné)."""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    if isinstance(file_obj, (bytes, bytearray)):
+        sha256.update(file_obj)
+        md5.update(file_obj)
+        return ContentDigest(sha256.hexdigest(), md5.hexdigest(), len(file_obj))
+    file_obj.seek(0)
+    size = 0
+    for block in iter(lambda: file_obj.read(READ_BUFFER), b""):
+        sha256.update(block)
+        md5.update(block)
+        size += len(block)
+    file_obj.seek(0, os.SEEK_SET)
+    return ContentDigest(sha256.hexdigest(), md5.hexdigest(), size)
+
+
+def find_existing(
+    db: Session, content: ContentDigest, *, product: Optional[models.Product] = None
+) -> Optional[str]:
+    """``drive_file_id`` d'un fichier déjà stocké avec ce contenu, sinon ``None``.
+
+    Avec ``product``, cherche parmi les annexes de son arborescence (même
+    utilisateur, même dossier produit) ; sans, parmi les modèles. Les
+    candidats sont vérifiés sur le stockage (md5) : un fichier supprimé ou
+    modifié hors de l'application n'est pas réutilisé. Sans md5 (Drive non
+    configuré), rien n'est réutilisé.
+    """
+    if product is None:
+        query = db.query(models.Template.drive_file_id).filter(models.Template.content_hash == content.sha256)
+    else:
+        query = (
+            db.query(models.Attachment.drive_file_id)
+            .join(models.Product, models.Product.id == models.Attachment.product_id)
+            .filter(models.Attachment.content_hash == content.sha256, models.Product.user_id == product.user_id)
+        )
+        if product.drive_folder_id:
+            query = query.filter(models.Product.drive_folder_id == product.drive_folder_id)
+        else:
+            query = query.filter(models.Product.id == product.id)
+    for (file_id,) in query.distinct():
+        if storage.get_md5(file_id) == content.md5:
+            return file_id
+        logger.info("Fichier %s de même empreinte introuvable ou modifié, non réutilisé", file_id)
+    return None
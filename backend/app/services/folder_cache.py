@@ -0,0 +1,148 @@
+"""Cache chemin Drive -> ID de dossier pour ``GoogleDriveService.ensure_folder``.
+
+Sans cache, chaque appel relisait le dossier racine puis envoyait une requête
+``files().list`` par segment de chemin. Les correspondances sont gardées en
+mémoire et persistées dans la table ``drive_folders`` (partagée entre
+processus et redémarrages).
+
+La résolution d'un segment manquant se fait sous un verrou propre au chemin :
+verrou de thread dans le processus, plus un verrou consultatif PostgreSQL
+(``pg_advisory_xact_lock``) entre processus. Deux requêtes concurrentes ne
+créent donc pas deux fois le même dossier. Une entrée n'est pas revérifiée à
+chaque lecture : elle est invalidée (avec ses sous-chemins) lorsque Drive
+répond 404 sur l'ID mis en cache.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+from sqlalchemy import func, select
+
+from app import crud
+from app.db.base import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def path_key(path: Sequence[str]) -> str:
+    return "/".join(segment.replace("%", "%25").replace("/", "%2F") for segment in path)
+
+
+def _split_key(key: str) -> list[str]:
+    return [segment.replace("%2F", "/").replace("%25", "%") for segment in key.split("/")]
+
+
+class FolderPathCache:
+    def __init__(self):
+        self._ids: dict[tuple[str, str], str] = {}
+        self._paths: dict[str, tuple[str, str]] = {}  # folder_id -> (root_id, path_key)
+        self._lock = threading.Lock()
+        self._path_locks: dict[tuple[str, str], threading.Lock] = {}
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _remember(self, root_id: str, key: str, folder_id: str) -> None:
+        with self._lock:
+            previous = self._ids.get((root_id, key))
+            if previous is not None:
+                self._paths.pop(previous, None)
+            self._ids[(root_id, key)] = folder_id
+            self._paths[folder_id] = (root_id, key)
+
+    def get(self, root_id: str, path: Sequence[str]) -> Optional[str]:
+        """ID du dossier en cache (mémoire, sinon table ``drive_folders``)."""
+        key = path_key(path)
+        with self._lock:
+            folder_id = self._ids.get((root_id, key))
+            if folder_id is not None:
+                self.hits += 1
+                return folder_id
+
+        db = SessionLocal()
+        try:
+            row = crud.drive_folder.get_by_path(db, root_id=root_id, path=key)
+        finally:
+            db.close()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(root_id, key, row.folder_id)
+        with self._lock:
+            self.db_hits += 1
+        return row.folder_id
+
+    def set(self, root_id: str, path: Sequence[str], folder_id: str) -> None:
+        key = path_key(path)
+        db = SessionLocal()
+        try:
+            crud.drive_folder.set_folder_id(db, root_id=root_id, path=key, folder_id=folder_id)
+        finally:
+            db.close()
+        self._remember(root_id, key, folder_id)
+
+    def path_for(self, folder_id: str) -> Optional[tuple[str, list[str]]]:
+        """``(root_id, chemin)`` d'un dossier en cache, pour le revalider."""
+        with self._lock:
+            found = self._paths.get(folder_id)
+        if found is None:
+            db = SessionLocal()
+            try:
+                row = crud.drive_folder.get_by_folder_id(db, folder_id=folder_id)
+            finally:
+                db.close()
+            if row is None:
+                return None
+            found = (row.root_id, row.path)
+        return found[0], _split_key(found[1])
+
+    def invalidate(self, root_id: str, path: Sequence[str]) -> None:
+        """Oublie le chemin et ses sous-chemins (dossier supprimé sur Drive)."""
+        key = path_key(path)
+        with self._lock:
+            for cached in [k for k in self._ids if k[0] == root_id and (k[1] == key or k[1].startswith(key + "/"))]:
+                self._paths.pop(self._ids.pop(cached), None)
+            self.invalidations += 1
+        db = SessionLocal()
+        try:
+            crud.drive_folder.remove_subtree(db, root_id=root_id, path=key)
+        finally:
+            db.close()
+        logger.info("Chemin Drive %s invalidé dans le cache des dossiers", key)
+
+    @contextmanager
+    def lock(self, root_id: str, path: Sequence[str]) -> Iterator[None]:
+        """Verrou de résolution d'un chemin (single-flight, inter-processus sous PostgreSQL)."""
+        key = (root_id, path_key(path))
+        with self._lock:
+            path_lock = self._path_locks.setdefault(key, threading.Lock())
+        with path_lock:
+            db = SessionLocal()
+            try:
+                if db.bind.dialect.name == "postgresql":
+                    db.execute(select(func.pg_advisory_xact_lock(func.hashtext("drive_folder:" + "|".join(key)))))
+                yield
+                db.commit()
+            finally:
+                db.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            self._paths.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._ids),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+folder_cache = FolderPathCache()
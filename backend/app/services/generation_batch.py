@@ -0,0 +1,123 @@
+"""Génération par lot : produits × modèles.
+
+Chaque modèle distinct n'est téléchargé qu'une fois. Les rendus docxtpl
+partent dans le pool de processus (:mod:`app.services.executors`) et chaque
+rendu terminé est aussitôt confié à un pool de threads d'upload : les uploads
+Drive se font pendant que les rendus suivants tournent. Les résultats sont
+produits au fil de l'eau, dans l'ordre de fin de traitement.
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Iterator, Sequence
+from uuid import UUID
+
+from app import crud, schemas
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.services import executors
+from app.services.generation_service import (
+    GenerationError,
+    build_context,
+    context_hash,
+    download_template,
+    find_reusable,
+    template_cache_key,
+    upload_document,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _item(product_id, template_id, status: str, **extra) -> dict:
+    return {"product_id": str(product_id), "template_id": str(template_id), "status": status, **extra}
+
+
+def run_batch(product_ids: Sequence[UUID], template_ids: Sequence[UUID], *, user_id) -> Iterator[dict]:
+    """Génère tous les couples (produit, modèle) et produit un dict par élément.
+
+    La session DB n'est utilisée que depuis le thread appelant ; les pools ne
+    manipulent que des octets. Un document déjà rendu pour le même contexte
+    est renvoyé tel quel ; s'il est encore dans la file de jobs, l'élément est
+    ``pending`` (sans ``drive_file_id``) et se suit via ``GET /generations/{id}``.
+    """
+    db = SessionLocal()
+    upload_pool = ThreadPoolExecutor(max_workers=max(1, settings.BATCH_UPLOAD_WORKERS))
+    pending: dict[Future, tuple] = {}
+    try:
+        templates = {}
+        for template_id in dict.fromkeys(template_ids):
+            template = crud.template.get(db, id=str(template_id))
+            if template is None:
+                for product_id in product_ids:
+                    yield _item(product_id, template_id, "error", detail="Template not found")
+                continue
+            try:
+                templates[template_id] = (template, download_template(template))
+            except GenerationError as e:
+                for product_id in product_ids:
+                    yield _item(product_id, template_id, "error", detail=e.detail)
+
+        products = {}
+        for product_id in dict.fromkeys(product_ids):
+            product = crud.product.get(db, id=str(product_id))
+            if product is None or product.user_id != user_id:
+                detail = "Product not found" if product is None else "Not enough permissions"
+                for template_id in templates:
+                    yield _item(product_id, template_id, "error", detail=detail)
+                continue
+            products[product_id] = product
+            context = build_context(db, product)
+            for template_id, (template, template_bytes) in templates.items():
+                ctx_hash = context_hash(context, template)
+                existing = find_reusable(db, context_hash=ctx_hash)
+                if existing is not None:
+                    yield _item(
+                        product_id,
+                        template_id,
+                        "success" if existing.drive_file_id else "pending",
+                        generation_id=str(existing.id),
+                        drive_file_id=existing.drive_file_id,
+                        reused=True,
+                    )
+                    continue
+                future = executors.submit_render(template_bytes, context, template_cache_key(template))
+                pending[future] = ("render", product_id, template_id, ctx_hash)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, product_id, template_id, ctx_hash = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.exception("Échec %s lot (%s, %s)", stage, product_id, template_id)
+                    yield _item(product_id, template_id, "error", detail=str(e) or stage)
+                    continue
+
+                if stage == "render":
+                    if not result:
+                        yield _item(product_id, template_id, "error", detail="Failed to render DOCX document")
+                        continue
+                    upload = upload_pool.submit(upload_document, products[product_id], result)
+                    pending[upload] = ("upload", product_id, template_id, ctx_hash)
+                    continue
+
+                generation = crud.generation.create_generation(
+                    db,
+                    obj_in=schemas.GenerationCreate(product_id=product_id, template_id=template_id),
+                    drive_file_id=result,
+                    context_hash=ctx_hash,
+                )
+                yield _item(
+                    product_id,
+                    template_id,
+                    "success",
+                    generation_id=str(generation.id),
+                    drive_file_id=result,
+                )
+    finally:
+        # Client déconnecté ou erreur : on abandonne le travail non commencé
+        for future in pending:
+            future.cancel()
+        upload_pool.shutdown(wait=False, cancel_futures=True)
+        db.close()
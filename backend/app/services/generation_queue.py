@@ -0,0 +1,218 @@
+"""File de jobs de génération adossée à la table ``tasks``.
+
+``POST /generations`` en mode job crée la ``Generation`` (``pending``, sans
+fichier) puis une ``Task`` ``queued``. Un pool de threads workers réserve les
+tâches avec ``SELECT ... FOR UPDATE SKIP LOCKED`` : plusieurs workers (y
+compris dans des processus uvicorn différents) peuvent dépiler la même table
+sans se marcher dessus. Chaque transition d'étape est tracée dans ``logs``.
+
+Un job en cours rafraîchit sa tâche (``GENERATION_HEARTBEAT_INTERVAL``) :
+seul un job sans signe de vie depuis ``GENERATION_JOB_TIMEOUT`` est repris,
+et au plus ``GENERATION_MAX_ATTEMPTS`` fois (un job qui fait tomber son
+worker n'est pas rejoué indéfiniment).
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.config import settings
+from app.crud.crud_task import TaskStatus
+from app.db.base import SessionLocal
+
+TASK_TYPE = "generate_docx"
+
+logger = logging.getLogger(__name__)
+
+
+def _log_stage(db: Session, task: models.Task, generation: models.Generation, stage: str, level: str = "info", **details):
+    user_id = generation.product.user_id if generation.product is not None else None
+    crud.log.add(
+        db,
+        event_type=f"generation.{stage}",
+        level=level,
+        entity_type="generation",
+        entity_id=generation.id,
+        task_id=task.id,
+        user_id=user_id,
+        stage=stage,
+        **details,
+    )
+
+
+def enqueue_generation(db: Session, *, generation: models.Generation, user_id=None) -> models.Task:
+    """Ajoute la génération à la file et trace l'événement ``generation.queued``."""
+    task = crud.task.enqueue(db, generation_id=generation.id, task_type=TASK_TYPE)
+    crud.log.add(
+        db,
+        event_type="generation.queued",
+        entity_type="generation",
+        entity_id=generation.id,
+        task_id=task.id,
+        user_id=user_id,
+        stage="queued",
+        message="Génération mise en file d'attente",
+    )
+    return task
+
+
+def process_task(db: Session, task: models.Task) -> None:
+    """Exécute une tâche réservée et met à jour ``Task``/``Generation``."""
+    from app.services.generation_service import (
+        GenerationError,
+        build_context,
+        context_hash,
+        render_and_upload,
+    )
+
+    generation = crud.generation.get(db, id=str(task.generation_id))
+    if generation is None:
+        crud.task.finish(db, db_obj=task, status=TaskStatus.ERROR, result="Generation not found")
+        return
+
+    _log_stage(db, task, generation, "started", message="Génération démarrée")
+    try:
+        template = crud.template.get(db, id=str(generation.template_id))
+        product = crud.product.get(db, id=str(generation.product_id))
+        if template is None or product is None:
+            raise GenerationError(404, "Template or product not found")
+
+        # Le contexte a pu changer depuis la mise en file : empreinte recalculée
+        context = build_context(db, product)
+        ctx_hash = context_hash(context, template)
+        drive_file_id = render_and_upload(
+            db,
+            template=template,
+            product=product,
+            context=context,
+            on_stage=lambda stage: _log_stage(db, task, generation, stage),
+        )
+    except Exception as e:
+        detail = e.detail if isinstance(e, GenerationError) else str(e)
+        logger.exception("Échec de la génération %s", generation.id)
+        db.rollback()
+        _fail(db, task, generation, detail)
+        return
+
+    crud.generation.update(
+        db, db_obj=generation, obj_in={"drive_file_id": drive_file_id, "context_hash": ctx_hash}
+    )
+    crud.task.finish(db, db_obj=task, status=TaskStatus.SUCCESS, result=drive_file_id)
+    _log_stage(db, task, generation, "completed", level="success", message="Document généré")
+
+
+def abandon_task(db: Session, task: models.Task) -> None:
+    """Job repris trop de fois : passe en erreur sans être relancé."""
+    generation = crud.generation.get(db, id=str(task.generation_id))
+    detail = f"Génération abandonnée après {task.attempts - 1} tentatives interrompues"
+    logger.error("Tâche %s: %s", task.id, detail)
+    if generation is None:
+        crud.task.finish(db, db_obj=task, status=TaskStatus.ERROR, result=detail)
+        return
+    _fail(db, task, generation, detail)
+
+
+def _fail(db: Session, task: models.Task, generation: models.Generation, detail: str) -> None:
+    crud.generation.update(
+        db,
+        db_obj=generation,
+        obj_in={"status": "error", "error_message": detail, "completed_at": datetime.utcnow()},
+    )
+    crud.task.finish(db, db_obj=task, status=TaskStatus.ERROR, result=detail)
+    _log_stage(db, task, generation, "failed", level="error", message=detail)
+
+
+class GenerationWorkerPool:
+    """Pool de threads qui dépilent la table ``tasks``."""
+
+    def __init__(
+        self,
+        workers: int,
+        poll_interval: float,
+        stale_after: int,
+        heartbeat_interval: float,
+        max_attempts: int,
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self.max_attempts = max(1, max_attempts)
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"generation-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def run_once(self) -> bool:
+        """Traite au plus une tâche ; renvoie ``False`` si la file est vide."""
+        db = SessionLocal()
+        try:
+            task = crud.task.claim_next(db, task_type=TASK_TYPE, stale_after=self.stale_after)
+            if task is None:
+                return False
+            if task.attempts > self.max_attempts:
+                abandon_task(db, task)
+                return True
+            with self._heartbeat(task.id):
+                process_task(db, task)
+            return True
+        finally:
+            db.close()
+
+    @contextmanager
+    def _heartbeat(self, task_id):
+        """Rafraîchit la tâche pendant le rendu (session dédiée, thread à part)."""
+        done = threading.Event()
+
+        def _beat():
+            while not done.wait(self.heartbeat_interval):
+                db = SessionLocal()
+                try:
+                    crud.task.touch(db, task_id=task_id)
+                except Exception as e:
+                    logger.warning("Signe de vie de la tâche %s impossible: %s", task_id, e)
+                finally:
+                    db.close()
+
+        thread = threading.Thread(target=_beat, name="generation-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception("Erreur inattendue du worker de génération")
+                busy = False
+            if not busy:
+                self._stop.wait(self.poll_interval)
+
+
+generation_worker_pool = GenerationWorkerPool(
+    workers=settings.GENERATION_WORKERS,
+    poll_interval=settings.GENERATION_POLL_INTERVAL,
+    stale_after=settings.GENERATION_JOB_TIMEOUT,
+    heartbeat_interval=settings.GENERATION_HEARTBEAT_INTERVAL,
+    max_attempts=settings.GENERATION_MAX_ATTEMPTS,
+)
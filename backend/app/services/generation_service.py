@@ -0,0 +1,192 @@
+"""Pipeline de génération DOCX partagé par l'API et les workers.
+
+Le rendu (téléchargement du modèle, docxtpl, upload Drive) était auparavant
+codé en dur dans l'endpoint ``POST /generations`` ; il est regroupé ici pour
+pouvoir être exécuté aussi bien dans la requête HTTP que par les workers de la
+file de jobs (:mod:`app.services.generation_queue`).
+"""
+import asyncio
+import hashlib
+import json
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.services import executors
+from app.services.storage import async_storage, storage
+from app.services.template_cache import template_cache
+
+
+class GenerationError(Exception):
+    """Erreur métier du pipeline ; ``status_code`` est repris tel quel par l'API."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _clean(s: str | None) -> str:
+    return (s or "").strip().replace(" ", "_")
+
+
+def document_filename(product: models.Product, ext: str) -> str:
+    """Nom du document généré : ``<Client>-<Marque>-<Produit>.<ext>``."""
+    filename_parts = [
+        _clean(product.nom_client),
+        _clean(product.marque),
+        _clean(product.nom_produit or "document"),
+    ]
+    return "-".join(filter(None, filename_parts)) + f".{ext}"
+
+
+def formula_folder_path(product: models.Product) -> list[str]:
+    """Chemin Drive cible : ``<Client>/<Produit>/<Ref_formule>``."""
+    client_folder = (product.nom_client or "SansClient").strip() or "SansClient"
+    product_folder = (product.nom_produit or str(product.id)).strip() or str(product.id)
+    ref_folder = (product.ref_formule or "REF").strip() or "REF"
+    return [client_folder, product_folder, ref_folder]
+
+
+def build_context(db: Session, product: models.Product) -> dict:
+    """Contexte docxtpl : produit sérialisé, pièces jointes et annexes par alias."""
+    from app.schemas.product import Product as ProductSchema
+
+    product_data = ProductSchema.from_orm(product).dict()
+
+    attachment_objs = crud.attachment.get_multi_by_product(db, product_id=product.id)
+    attachments = [schemas.Attachment.from_orm(a).dict() for a in attachment_objs]
+    annexes = {
+        (a.alias or a.file_name): schemas.Attachment.from_orm(a).dict() for a in attachment_objs if (a.alias or a.file_name)
+    }
+    return {
+        "product": product_data,
+        "attachments": attachments,
+        "annexes": annexes,
+    }
+
+
+# Champs du contexte qui changent sans que le document change : exclus de l'empreinte
+# (date de modification du produit, lien de miniature résolu après l'upload)
+VOLATILE_PRODUCT_FIELDS = ("updated_at",)
+VOLATILE_ATTACHMENT_FIELDS = ("url",)
+
+
+def _without(data: dict, fields: tuple) -> dict:
+    return {k: v for k, v in data.items() if k not in fields}
+
+
+def context_hash(context: dict, template: models.Template) -> str:
+    """Empreinte stable du contexte de rendu et de la version du modèle.
+
+    Deux générations de même empreinte produisent le même document : la
+    seconde peut réutiliser la première au lieu de rendre et d'uploader.
+    """
+    stable = {
+        "product": _without(context["product"], VOLATILE_PRODUCT_FIELDS),
+        "attachments": [_without(a, VOLATILE_ATTACHMENT_FIELDS) for a in context["attachments"]],
+        "annexes": {
+            alias: _without(a, VOLATILE_ATTACHMENT_FIELDS) for alias, a in context["annexes"].items()
+        },
+    }
+    payload = {
+        "template_id": str(template.id),
+        "template_version": template.version,
+        "context": stable,
+    }
+    canonical = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def find_reusable(db: Session, *, context_hash: str) -> Optional[models.Generation]:
+    """DOCX déjà rendu (ou en file) pour la même empreinte, s'il y en a un."""
+    return crud.generation.get_by_context_hash(db, context_hash=context_hash)
+
+
+def template_cache_key(template: models.Template) -> tuple:
+    """Clé du modèle dans le cache des modèles prétraités de ``DocxService``."""
+    return (str(template.id), template.version)
+
+
+def download_template(template: models.Template) -> bytes:
+    """Récupère le fichier .docx du modèle (cache local, sinon Google Drive)."""
+    template_bytes = template_cache.fetch(template.drive_file_id, template.version)
+    if not template_bytes:
+        raise GenerationError(424, "Template file unavailable on Google Drive (id may be deleted)")
+    return template_bytes
+
+
+def upload_document(product: models.Product, rendered_bytes: bytes) -> str:
+    """Upload le DOCX rendu dans ``<Client>/<Produit>/<Ref_formule>``."""
+    formula_drive_id = storage.ensure_folder(formula_folder_path(product))
+    return storage.upload(
+        rendered_bytes,
+        document_filename(product, "docx"),
+        parent_id=formula_drive_id,
+    )
+
+
+def render_and_upload(
+    db: Session,
+    *,
+    template: models.Template,
+    product: models.Product,
+    context: Optional[dict] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Télécharge le modèle, rend le DOCX et l'upload sur Drive.
+
+    ``context`` évite de reconstruire le contexte si l'appelant l'a déjà
+    calculé. Retourne l'ID Drive du document. ``on_stage`` est appelé après chaque
+    étape (``template_downloaded``, ``rendered``, ``uploaded``) ; les workers
+    s'en servent pour tracer l'avancement dans ``logs``.
+    """
+    def _stage(name: str) -> None:
+        if on_stage is not None:
+            on_stage(name)
+
+    template_bytes = download_template(template)
+    _stage("template_downloaded")
+
+    # Rendu dans le pool de processus : le thread appelant ne fait qu'attendre
+    rendered_bytes = executors.render(
+        template_bytes,
+        context=context if context is not None else build_context(db, product),
+        cache_key=template_cache_key(template),
+    )
+    if not rendered_bytes:
+        raise GenerationError(500, "Failed to render DOCX document")
+    _stage("rendered")
+
+    drive_file_id = upload_document(product, rendered_bytes)
+    _stage("uploaded")
+    return drive_file_id
+
+
+async def render_and_upload_async(
+    *,
+    template: models.Template,
+    product: models.Product,
+    context: dict,
+) -> str:
+    """Variante asynchrone de :func:`render_and_upload` pour les endpoints.
+
+    Le téléchargement du modèle et la résolution du dossier Drive cible sont
+    indépendants : ils sont lancés ensemble. Le rendu part dans le pool de
+    processus et l'upload passe par le client Drive asynchrone.
+    """
+    template_bytes, formula_drive_id = await asyncio.gather(
+        executors.run_in_thread("io", download_template, template),
+        async_storage.ensure_folder(formula_folder_path(product)),
+    )
+    rendered_bytes = await asyncio.wrap_future(
+        executors.submit_render(template_bytes, context, template_cache_key(template))
+    )
+    if not rendered_bytes:
+        raise GenerationError(500, "Failed to render DOCX document")
+    return await async_storage.upload(
+        rendered_bytes,
+        document_filename(product, "docx"),
+        parent_id=formula_drive_id,
+    )
@@ -1,7 +1,15 @@
 from typing import IO, Optional
 from functools import lru_cache
 
-class GoogleDriveService:
+from app.services.storage_backend import StorageBackend
+
+def _is_not_found(exc: Exception) -> bool:
+    """``True`` si ``exc`` est une réponse 404 de l'API Drive."""
+    resp = getattr(exc, "resp", None)
+    return getattr(resp, "status", None) == 404
+
+
+class GoogleDriveService(StorageBackend):
     """Service stub pour interagir avec Google Drive.
 
     En production, il s'appuie sur l'API Google Drive.
@@ -9,47 +17,33 @@ class GoogleDriveService:
     pour éviter les appels réseau.
     """
 
-    _service_cache: dict[Optional[str], Optional["Any"]] = {}  # user_id -> service (ou None)
-
     SETTINGS_CREDENTIALS = "drive_credentials"
     SETTINGS_FOLDER = "drive_root_folder_id"
 
     def _get_service(self, user_id: str | None = None):
-        """Retourne (et met en cache) le client Google Drive v3."""
-        if user_id in self._service_cache:
-            return self._service_cache[user_id]
-
-        # Lazy import pour éviter le coût lorsque non utilisé (& faciliter les tests unitaires)
-        from googleapiclient.discovery import build  # type: ignore
-        from google.oauth2 import service_account  # type: ignore
-        import json, logging
+        """Retourne le client Google Drive v3 du thread courant.
 
-        from app.db.base import SessionLocal
-        from app.crud.crud_setting import setting as crud_setting
+        Les clients sont tenus par :mod:`app.services.drive_client_pool` (un par
+        thread et par jeu de credentials) : httplib2 n'est pas thread-safe.
+        """
+        import logging
+        from app.services.drive_client_pool import drive_client_pool
 
-        db = SessionLocal()
         try:
-            key_credentials = (
-                f"{self.SETTINGS_CREDENTIALS}_{user_id}" if user_id else self.SETTINGS_CREDENTIALS
-            )
-            creds_json = crud_setting.get_value(db, key_credentials)
-            if creds_json is None:
-                raise RuntimeError("Google Drive credentials not configured (drive_credentials)")
-
-            creds_info = json.loads(creds_json)
-            scopes = ["https://www.googleapis.com/auth/drive"]
-            creds = service_account.Credentials.from_service_account_info(creds_info, scopes=scopes)
-
-            # 'cache_discovery=False' to avoid writing to disk when running inside some environments
-            self._service_cache[user_id] = build("drive", "v3", credentials=creds, cache_discovery=False)
-            return self._service_cache[user_id]
+            service = drive_client_pool.get(user_id)
+            if service is None:
+                logging.debug("Google Drive credentials not configured (drive_credentials)")
+            return service
         except Exception as e:
-            logging.exception("Unable to build Google Drive service: %s", e)
+            logging.warning("Unable to build Google Drive service: %s", e)
             # Fallback to mocked behaviour to éviter plantage complet
-            self._service_cache[user_id] = None
             return None
-        finally:
-            db.close()
+
+    def evict_clients(self, user_id: str | None = None) -> None:
+        """Oublie les clients Drive du tenant (à appeler quand ses credentials changent)."""
+        from app.services.drive_client_pool import drive_client_pool
+
+        drive_client_pool.evict(user_id)
 
     # ------------------------------------------------------------------
     # API publique
@@ -65,69 +59,117 @@ class GoogleDriveService:
     ) -> str:
         """Upload un fichier et retourne son ID Google Drive.
 
+        Au-delà de ``DRIVE_RESUMABLE_THRESHOLD`` l'envoi se fait par morceaux,
+        lus au fil de l'eau dans ``file_obj`` (voir :mod:`app.services.drive_upload`).
+        Le md5 des octets envoyés est comparé à celui calculé par Drive.
+
         Si le service n'est pas configuré correctement, renvoie un ID factice
-        (permet de continuer en dev sans Drive).
+        (permet de continuer en dev sans Drive). Drive configuré, un échec lève
+        :class:`~app.services.drive_guard.DriveError` : jamais d'ID factice en base.
         """
-        import io, uuid, logging
+        import uuid, logging
+        from app.services.drive_guard import DriveError
+        from app.services.drive_upload import ChecksumMismatchError
+
         service = self._get_service()
         if service is None:
             return f"mock-{uuid.uuid4()}"
 
-        from googleapiclient.http import MediaIoBaseUpload  # type: ignore
-
-        # Supportes aussi un 'bytes' brut : on le convertit en BytesIO pour obtenir l'API .seek()
-        if isinstance(file_obj, (bytes, bytearray)):
-            file_obj = io.BytesIO(file_obj)  # type: ignore[arg-type]
-
-        # Assure que l'objet est bien positionné au début s'il possède seek()
-        if hasattr(file_obj, "seek"):
-            try:
-                file_obj.seek(0)
-            except Exception:
-                pass
-
         # Détermine le(s) dossier(s) parent(s)
         if parent_id is None:
             # Récupère le dossier racine configuré (optionnel)
-            from app.db.base import SessionLocal
             from app.crud.crud_setting import setting as crud_setting
 
-            db = SessionLocal()
-            try:
-                parent_id = crud_setting.get_value(db, self.SETTINGS_FOLDER)
-            finally:
-                db.close()
+            parent_id = crud_setting.get_cached_value(self.SETTINGS_FOLDER)
 
         file_metadata = {"name": filename}
         if parent_id:
             file_metadata["parents"] = [parent_id]
 
-        media = MediaIoBaseUpload(file_obj, mimetype=mime_type, resumable=False)
-
         try:
-            result = (
-                service.files()
-                .create(body=file_metadata, media_body=media, fields="id")
-                .execute()
-            )
-            file_id = result["id"]
+            try:
+                file_id = self._create_file(service, file_obj, file_metadata, mime_type)
+            except ChecksumMismatchError as e:
+                # Octets altérés en route : fichier corrompu purgé, un seul nouvel essai complet
+                from app.services.purge_queue import enqueue_orphan
+
+                logging.warning("%s, nouvel envoi", e)
+                enqueue_orphan(e.file_id, reason="checksum")
+                file_id = self._create_file(service, file_obj, file_metadata, mime_type)
+            except Exception as e:
+                # Dossier parent issu du cache mais supprimé sur Drive : on le recrée et on réessaie
+                from app.services.folder_cache import folder_cache
+
+                cached_path = folder_cache.path_for(parent_id) if parent_id and _is_not_found(e) else None
+                if cached_path is None:
+                    raise
+                root_id, path = cached_path
+                folder_cache.invalidate(root_id, path)
+                file_metadata["parents"] = [self.ensure_folder(path)]
+                file_id = self._create_file(service, file_obj, file_metadata, mime_type)
 
             # Rendre le fichier publiquement lisible pour les vignettes et la preview
-            try:
-                service.permissions().create(
-                    fileId=file_id,
-                    body={"type": "anyone", "role": "reader"},
-                    fields="id",
-                ).execute()
-            except Exception:
-                # On ignore les erreurs de permission (souvent déjà accordée)
-                pass
+            # (hérité du dossier ou permission regroupée, voir drive_sharing)
+            from app.services.drive_sharing import drive_sharing
+
+            if drive_sharing.file_needs_grant(file_metadata.get("parents", [None])[0]):
+                drive_sharing.grant(file_id)
 
             return file_id
+        except ChecksumMismatchError as e:
+            # Nouvel envoi corrompu lui aussi : pas d'orphelin sur Drive
+            from app.services.purge_queue import enqueue_orphan
+
+            enqueue_orphan(e.file_id, reason="checksum")
+            raise
+        except DriveError:
+            raise
         except Exception as e:
             logging.exception("Erreur lors de l'upload sur Google Drive: %s", e)
-            # Fallback mock
-            return f"mock-{uuid.uuid4()}"
+            raise DriveError(f"Upload de {filename} sur Google Drive impossible: {e}") from e
+
+    @staticmethod
+    def _create_file(service, file_obj: IO[bytes] | bytes, file_metadata: dict, mime_type: str) -> str:
+        """Un envoi complet (simple ou par morceaux) suivi de la vérification du md5."""
+        from googleapiclient.http import MediaIoBaseUpload  # type: ignore
+        from app.services.drive_upload import HashingReader, chunk_size, tag_upload, use_resumable, verify_md5
+
+        reader = HashingReader(file_obj)
+        resumable = use_resumable(reader.size)
+        media = MediaIoBaseUpload(
+            reader,
+            mimetype=mime_type,
+            chunksize=chunk_size() if resumable else -1,
+            resumable=resumable,
+        )
+        if not resumable:
+            # Envoi simple non idempotent : un essai en échec a pu créer le
+            # fichier, on le cherche par son jeton avant de le renvoyer
+            file_metadata = dict(file_metadata)
+            query = tag_upload(file_metadata)
+            request = service.files().create(body=file_metadata, media_body=media, fields="id, md5Checksum")
+
+            def _recover():
+                found = (
+                    service.files()
+                    .list(q=query, spaces="drive", fields="files(id, md5Checksum)")
+                    .execute()
+                    .get("files", [])
+                )
+                return found[0] if found else None
+
+            request.recover = _recover
+            result = request.execute()
+        else:
+            request = service.files().create(body=file_metadata, media_body=media, fields="id, md5Checksum")
+            # Chaque morceau est rejoué par drive_guard ; après une erreur,
+            # googleapiclient demande à Drive l'octet atteint et reprend de là
+            result = None
+            while result is None:
+                _, result = request.next_chunk()
+
+        verify_md5(reader, result.get("md5Checksum"), result["id"])
+        return result["id"]
 
     def delete(self, file_id: str) -> None:
         """Supprime un fichier depuis Google Drive (silencieusement si Drive non configuré)."""
@@ -139,13 +181,52 @@ class GoogleDriveService:
             service.files().delete(fileId=file_id).execute()
         except Exception as e:
             logging.warning("Erreur suppression fichier Drive %s: %s", file_id, e)
+            return
+        from app.services.pdf_cache import pdf_cache
+
+        pdf_cache.discard(file_id)
+
+    def delete_many(self, file_ids: list[str]) -> dict[str, Exception]:
+        """Supprime des fichiers par requêtes batch Drive (``DRIVE_BATCH_SIZE`` par lot).
+
+        Renvoie les échecs par ID (un 404 compte comme supprimé) ; lève
+        ``DriveUnavailableError`` si Drive reste indisponible pour un lot.
+        """
+        from app.core.config import settings
+        from app.services.drive_guard import drive_guard
+        from app.services.pdf_cache import pdf_cache
+
+        service = self._get_service()
+        if service is None:
+            return {}  # Drive non configuré
+
+        failures: dict[str, Exception] = {}
+
+        def _on_response(request_id, _response, exception):
+            if exception is not None and not _is_not_found(exception):
+                failures[request_id] = exception
+
+        file_ids = list(dict.fromkeys(file_ids))
+        for start in range(0, len(file_ids), settings.DRIVE_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=_on_response)
+            for file_id in file_ids[start:start + settings.DRIVE_BATCH_SIZE]:
+                batch.add(service.files().delete(fileId=file_id), request_id=file_id)
+            drive_guard.call(batch.execute)
+        for file_id in file_ids:
+            if file_id not in failures:
+                pdf_cache.discard(file_id)
+        return failures
 
     def download(self, file_id: str) -> bytes:
         """Télécharge un fichier Drive.
 
-        Renvoie un tableau d'octets vide si Drive non configuré ou erreur.
+        Renvoie un tableau d'octets vide si Drive non configuré ou erreur ;
+        lève :class:`~app.services.drive_guard.DriveUnavailableError` si Drive
+        est indisponible.
         """
         import io, logging
+        from app.services.drive_guard import DriveUnavailableError, drive_guard
+
         service = self._get_service()
         if service is None:
             return b""
@@ -156,22 +237,50 @@ class GoogleDriveService:
             downloader = MediaIoBaseDownload(fh, request)
             done = False
             while done is False:
-                _status, done = downloader.next_chunk()
+                # MediaIoBaseDownload n'utilise pas HttpRequest.execute : garde explicite
+                _status, done = drive_guard.call(downloader.next_chunk)
             return fh.getvalue()
+        except DriveUnavailableError:
+            raise
         except Exception as e:
             logging.warning("Erreur téléchargement fichier Drive %s: %s", file_id, e)
             return b""
 
+    def get_md5(self, file_id: str) -> str | None:
+        """Renvoie le ``md5Checksum`` Drive du fichier.
+
+        ``None`` si Drive n'est pas configuré, en cas d'erreur ou pour les
+        fichiers natifs Google (Docs, Sheets...) qui n'ont pas de md5.
+        """
+        import logging
+        from app.services.drive_guard import DriveUnavailableError
+
+        service = self._get_service()
+        if service is None:
+            return None
+        try:
+            meta = service.files().get(fileId=file_id, fields="md5Checksum").execute()
+            return meta.get("md5Checksum")
+        except DriveUnavailableError:
+            raise
+        except Exception as e:
+            logging.warning("Erreur lecture md5 fichier Drive %s: %s", file_id, e)
+            return None
+
     # ------------------------------------------------------------------
     # Folder helpers
     # ------------------------------------------------------------------
 
-    def ensure_folder(self, path: list[str]) -> str:
+    def ensure_folder(self, path: list[str], _retried: bool = False) -> str:
         """Vérifie l'existence (ou crée) une hiérarchie de dossiers et
         renvoie l'ID du dernier dossier de la liste `path`.
 
         Si le service Drive n'est pas configuré, renvoie un ID factice basé
         sur le chemin pour permettre l'enchaînement des appels sans erreur.
+
+        Les correspondances chemin -> ID sont mises en cache
+        (:mod:`app.services.folder_cache`) : seuls les segments inconnus
+        coûtent des appels Drive.
         """
         import uuid, logging
 
@@ -183,15 +292,17 @@ class GoogleDriveService:
             # Fallback mock – concat path pour rester unique entre appels
             return f"mock-{ '/'.join(path) }-{uuid.uuid4()}"
 
+        from app.services.drive_sharing import drive_sharing
+        from app.services.folder_cache import folder_cache
+
         # Récupère le dossier racine configuré (optionnel)
-        from app.db.base import SessionLocal
         from app.crud.crud_setting import setting as crud_setting
 
-        db = SessionLocal()
-        try:
-            parent_id = crud_setting.get_value(db, self.SETTINGS_FOLDER)
-        finally:
-            db.close()
+        root_id = crud_setting.get_cached_value(self.SETTINGS_FOLDER) or ""
+
+        cached = folder_cache.get(root_id, path)
+        if cached:
+            return cached
 
         # Fonction interne pour trouver un sous-dossier par nom
         def _find_child_folder(p_id: str | None, name: str) -> str | None:
@@ -216,24 +327,46 @@ class GoogleDriveService:
             files = query.get("files", [])
             return files[0]["id"] if files else None
 
-        # Boucle sur chaque segment
-        for segment in path:
-            # Cherche l'existence dans le parent courant
-            existing_id = _find_child_folder(parent_id, segment)
-            if existing_id:
-                parent_id = existing_id
-                continue
-            # Sinon, crée le dossier
-            folder_metadata = {
-                "name": segment,
-                "mimeType": "application/vnd.google-apps.folder",
-            }
-            if parent_id:
-                folder_metadata["parents"] = [parent_id]
-            new_folder = service.files().create(body=folder_metadata, fields="id").execute()
-            parent_id = new_folder["id"]
+        # Boucle sur chaque segment : les préfixes déjà connus ne coûtent rien,
+        # les autres sont résolus un par un sous verrou (pas de doublons)
+        parent_id = root_id or None
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            folder_id = folder_cache.get(root_id, prefix)
+            if folder_id is None:
+                with folder_cache.lock(root_id, prefix):
+                    folder_id = folder_cache.get(root_id, prefix)
+                    if folder_id is None:
+                        try:
+                            folder_id = self._find_or_create_folder(service, _find_child_folder, parent_id, prefix[-1])
+                        except Exception as e:
+                            # Parent en cache supprimé sur Drive : on oublie le chemin et on recommence
+                            if _is_not_found(e) and depth > 1 and not _retried:
+                                logging.warning("Dossier Drive %s introuvable, revalidation du cache", "/".join(prefix[:-1]))
+                                folder_cache.invalidate(root_id, prefix[:-1])
+                                return self.ensure_folder(path, _retried=True)
+                            raise
+                        folder_cache.set(root_id, prefix, folder_id)
+                        drive_sharing.folder_resolved(folder_id)
+            parent_id = folder_id
         return parent_id
 
+    @staticmethod
+    def _find_or_create_folder(service, find_child, parent_id: str | None, name: str) -> str:
+        # Cherche l'existence dans le parent courant
+        existing_id = find_child(parent_id, name)
+        if existing_id:
+            return existing_id
+        # Sinon, crée le dossier
+        folder_metadata = {
+            "name": name,
+            "mimeType": "application/vnd.google-apps.folder",
+        }
+        if parent_id:
+            folder_metadata["parents"] = [parent_id]
+        new_folder = service.files().create(body=folder_metadata, fields="id").execute()
+        return new_folder["id"]
+
     # ------------------------------------------------------------------
     # Conversion helpers
     # ------------------------------------------------------------------
@@ -241,51 +374,51 @@ class GoogleDriveService:
     def convert_to_pdf(self, file_id: str) -> bytes:
         """Convertit un fichier existant sur Drive en PDF et renvoie les octets.
 
+        • Le PDF est mis en cache par version du fichier (:mod:`pdf_cache`) :
+          une nouvelle conversion du même document ne coûte qu'un appel de
+          métadonnées.
         • Si l'API Drive est inactive ou la conversion échoue, on retourne la
           version téléchargée brute afin d'éviter une erreur HTTP 500.
+        • Drive indisponible (disjoncteur, quota) : ``DriveUnavailableError``.
         """
         import logging
+        from app.services.drive_guard import DriveUnavailableError
+        from app.services.pdf_cache import pdf_cache, version_of
 
         service = self._get_service()
-        if service is None:            # Drive non configuré : tentative de conversion locale avec docx2pdf
-            try:
-                import tempfile, io, os
-                from docx2pdf import convert  # type: ignore
-                from app.utils.docx_links import strip_hyperlinks
-
-                # Récupère le docx
-                docx_bytes = self.download(file_id)
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    docx_path = os.path.join(tmpdir, "input.docx")
-                    pdf_path = os.path.join(tmpdir, "output.pdf")
-
-                    clean_bytes = strip_hyperlinks(docx_bytes)
-                    with open(docx_path, "wb") as f:
-                        f.write(clean_bytes)
-
-                    # Lancement de la conversion (Word/LibreOffice requis)
-                    convert(docx_path, pdf_path)
-
-                    if os.path.exists(pdf_path):
-                        with open(pdf_path, "rb") as f:
-                            return f.read()
-            except Exception as e:
-                logging.warning("Conversion locale docx2pdf impossible: %s", e)
+        if service is None:            # Drive non configuré : conversion locale
+            from app.services.pdf_converter import convert_docx_locally
 
-            # En dernier recours, on renvoie le docx (l'appelant décidera)
-            return self.download(file_id)
+            return convert_docx_locally(self.download(file_id))
 
         try:
-            # Tentative d'export direct (fonctionne pour les fichiers Docs/Sheets).
-            pdf_bytes = (
-                service.files()
-                .export(fileId=file_id, mimeType="application/pdf")
-                .execute()
+            version = version_of(
+                service.files().get(fileId=file_id, fields=pdf_cache.FIELDS).execute()
             )
-            if pdf_bytes:
-                return pdf_bytes
+        except DriveUnavailableError:
+            raise
         except Exception as e:
-            logging.warning("Export PDF direct impossible: %s", e)
+            logging.warning("Métadonnées Drive de %s illisibles, PDF non mis en cache: %s", file_id, e)
+            version = None
+        cached = pdf_cache.get(file_id, version)
+        if cached is not None:
+            return cached
+
+        # Export direct (fichiers Docs/Sheets), sauf s'il a déjà échoué pour ce fichier
+        if not pdf_cache.needs_copy(file_id):
+            try:
+                pdf_bytes = (
+                    service.files()
+                    .export(fileId=file_id, mimeType="application/pdf")
+                    .execute()
+                )
+                if pdf_bytes:
+                    pdf_cache.put(file_id, version, pdf_bytes)
+                    return pdf_bytes
+            except DriveUnavailableError:
+                raise
+            except Exception as e:
+                logging.warning("Export PDF direct impossible: %s", e)
 
         # Fallback : on tente de copier + convertir (Drive crée un Google Doc)
         try:
@@ -305,9 +438,13 @@ class GoogleDriveService:
                 service.files().delete(fileId=tmp_id).execute()
             except Exception:
                 pass
+            pdf_cache.put(file_id, version, pdf_bytes, via_copy=True)
             return pdf_bytes
+        except DriveUnavailableError:
+            raise
         except Exception as e:
             logging.warning("Conversion Drive -> PDF fallback échouée: %s", e)
+            pdf_cache.discard(file_id)  # l'export direct sera retenté
             # En dernier recours, renvoie le docx brut
             return self.download(file_id)
 
@@ -331,5 +468,36 @@ class GoogleDriveService:
         except Exception:
             return f"https://drive.google.com/thumbnail?id={file_id}"
 
+    def get_thumbnail_urls(self, file_ids: list[str]) -> dict[str, Optional[str]]:
+        """``thumbnailLink`` de plusieurs fichiers, par requêtes batch Drive.
+
+        Drive génère la miniature quelques secondes après l'upload : ``None``
+        tant qu'elle n'existe pas. Les fichiers en erreur sont absents du
+        résultat ; lève ``DriveUnavailableError`` si Drive reste indisponible.
+        """
+        import logging
+        from app.core.config import settings
+        from app.services.drive_guard import drive_guard
+
+        service = self._get_service()
+        if service is None:
+            return {}  # Drive non configuré
+
+        links: dict[str, Optional[str]] = {}
+
+        def _on_response(request_id, response, exception):
+            if exception is None:
+                links[request_id] = (response or {}).get("thumbnailLink")
+            else:
+                logging.debug("Miniature de %s indisponible: %s", request_id, exception)
+
+        file_ids = list(dict.fromkeys(file_ids))
+        for start in range(0, len(file_ids), settings.DRIVE_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=_on_response)
+            for file_id in file_ids[start:start + settings.DRIVE_BATCH_SIZE]:
+                batch.add(service.files().get(fileId=file_id, fields="thumbnailLink"), request_id=file_id)
+            drive_guard.call(batch.execute)
+        return links
+
 
 google_drive_service = GoogleDriveService() 
\ No newline at end of file
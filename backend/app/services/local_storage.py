@@ -0,0 +1,183 @@
+"""Stockage des fichiers sur disque local (sites sans Drive, tests de charge).
+
+Même arborescence que sur Drive (``<Client>/<Produit>/<Ref_formule>/...``)
+sous ``LOCAL_STORAGE_ROOT`` ; l'ID d'un fichier ou d'un dossier est son
+chemin relatif à la racine. Les écritures passent par un fichier temporaire
+du même dossier puis ``os.replace`` : un lecteur ne voit jamais de fichier
+partiel. Les fichiers sont servis par ``GET /files/{id}`` (``FileResponse``,
+sans copie en mémoire) via des URLs signées avec ``SECRET_KEY``.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import IO, Optional
+from urllib.parse import quote
+
+from app.core.config import settings
+from app.services.storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER = 1024 * 1024
+
+
+def _clean_segment(name: str) -> str:
+    """Segment de chemin sûr : pas de séparateur, pas de ``..``."""
+    name = name.replace("/", "_").replace("\\", "_").replace("\x00", "").strip()
+    return name if name not in ("", ".", "..") else "_"
+
+
+class LocalStorageBackend(StorageBackend):
+    def __init__(self, root: str):
+        self.root = os.path.realpath(root)
+        self._name_lock = threading.Lock()
+        self._md5: dict[str, tuple[int, int, str]] = {}  # id -> (taille, mtime_ns, md5)
+
+    # ------------------------------------------------------------------
+    # Chemins
+    # ------------------------------------------------------------------
+
+    def path_for(self, file_id: str) -> str:
+        """Chemin absolu d'un ID ; ``FileNotFoundError`` s'il sort de la racine."""
+        path = os.path.realpath(os.path.join(self.root, file_id))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise FileNotFoundError(file_id)
+        return path
+
+    def _id_for(self, path: str) -> str:
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _reserve(self, directory: str, filename: str) -> str:
+        """Réserve un nom libre (``nom (2).ext``... comme les doublons Drive)."""
+        stem, ext = os.path.splitext(_clean_segment(filename))
+        with self._name_lock:
+            n = 1
+            while True:
+                candidate = os.path.join(directory, f"{stem}{ext}" if n == 1 else f"{stem} ({n}){ext}")
+                try:
+                    os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    return candidate
+                except FileExistsError:
+                    n += 1
+
+    # ------------------------------------------------------------------
+    # StorageBackend
+    # ------------------------------------------------------------------
+
+    def upload(
+        self,
+        file_obj: IO[bytes] | bytes,
+        filename: str,
+        mime_type: str = "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        *,
+        parent_id: str | None = None,
+    ) -> str:
+        directory = self.path_for(parent_id) if parent_id else self.root
+        os.makedirs(directory, exist_ok=True)
+        target = self._reserve(directory, filename)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(file_obj, (bytes, bytearray)):
+                    f.write(file_obj)
+                else:
+                    if hasattr(file_obj, "seek"):
+                        file_obj.seek(0)
+                    shutil.copyfileobj(file_obj, f, COPY_BUFFER)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            for leftover in (tmp_path, target):
+                try:
+                    os.remove(leftover)
+                except FileNotFoundError:
+                    pass
+            raise
+        return self._id_for(target)
+
+    def download(self, file_id: str) -> bytes:
+        try:
+            with open(self.path_for(file_id), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            logger.warning("Fichier local %s introuvable", file_id)
+            return b""
+
+    def get_md5(self, file_id: str) -> Optional[str]:
+        try:
+            path = self.path_for(file_id)
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        cached = self._md5.get(file_id)
+        if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_BUFFER), b""):
+                digest.update(block)
+        md5 = digest.hexdigest()
+        self._md5[file_id] = (st.st_size, st.st_mtime_ns, md5)
+        return md5
+
+    def ensure_folder(self, path: list[str]) -> str:
+        if not path:
+            raise ValueError("Path must contain at least one segment")
+        directory = os.path.join(self.root, *(_clean_segment(segment) for segment in path))
+        os.makedirs(directory, exist_ok=True)
+        return self._id_for(directory)
+
+    def delete(self, file_id: str) -> None:
+        try:
+            os.remove(self.path_for(file_id))
+        except FileNotFoundError:
+            pass
+        self._md5.pop(file_id, None)
+
+    def delete_many(self, file_ids: list[str]) -> dict[str, Exception]:
+        failures: dict[str, Exception] = {}
+        for file_id in file_ids:
+            try:
+                path = self.path_for(file_id)
+                if path == self.root:
+                    raise IsADirectoryError(f"Refus de supprimer la racine du stockage ({file_id!r})")
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failures[file_id] = e
+            self._md5.pop(file_id, None)
+        return failures
+
+    def convert_to_pdf(self, file_id: str) -> bytes:
+        from app.services.pdf_converter import convert_docx_locally
+
+        return convert_docx_locally(self.download(file_id))
+
+    def get_thumbnail_url(self, file_id: str) -> str:
+        """URL signée du fichier (pas de miniature générée : aperçu du fichier lui-même)."""
+        base = settings.LOCAL_STORAGE_PUBLIC_URL.rstrip("/")
+        return f"{base}{settings.API_V1_STR}/files/{quote(file_id)}?sig={self.sign(file_id)}"
+
+    def get_thumbnail_urls(self, file_ids: list[str]) -> dict[str, Optional[str]]:
+        return {file_id: self.get_thumbnail_url(file_id) for file_id in file_ids}
+
+    # ------------------------------------------------------------------
+    # URLs signées
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def sign(file_id: str) -> str:
+        return hmac.new(settings.SECRET_KEY.encode("utf-8"), file_id.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def check_signature(self, file_id: str, sig: str) -> bool:
+        return hmac.compare_digest(self.sign(file_id), sig or "")
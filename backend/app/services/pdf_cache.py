@@ -0,0 +1,90 @@
+"""Cache disque des PDF convertis depuis Drive.
+
+Chaque validation (et chaque nouvel aperçu) d'un même DIP réexportait le
+document en PDF ; pour un .docx, l'export direct échoue toujours et Drive
+passait par une copie convertie en Google Doc (copie + export + suppression).
+Les PDF sont conservés dans un :class:`DiskLRUCache` sous l'ID du fichier,
+avec sa version (``md5Checksum``, ou ``modifiedTime`` pour les fichiers
+natifs Google qui n'ont pas de md5) : un appel de métadonnées suffit pour
+resservir un PDF à jour. Le cache retient aussi les fichiers dont l'export
+direct a échoué, pour passer directement par la copie la fois suivante.
+Le cache a son propre répertoire (``PDF_CACHE_DIR``, par défaut
+``<CACHE_DIR>/pdf``), distinct de celui des modèles : chacun gère son budget
+sans évincer les fichiers de l'autre.
+"""
+import os
+import threading
+from typing import Optional
+
+from app.core.config import settings
+from app.services.disk_cache import DiskLRUCache
+
+
+def version_of(meta: dict) -> Optional[str]:
+    """Version d'un fichier Drive d'après ses métadonnées (``None`` si inconnue)."""
+    return meta.get("md5Checksum") or meta.get("modifiedTime")
+
+
+class ConvertedPdfCache:
+    # Champs Drive à demander pour calculer la version d'un fichier
+    FIELDS = "md5Checksum, modifiedTime"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.store = DiskLRUCache(directory, max_bytes, namespace="pdf")
+        self._lock = threading.Lock()
+        self._via_copy: set[str] = set()
+        self.conversions = 0
+        self.exports_skipped = 0
+
+    def get(self, file_id: str, version: Optional[str]) -> Optional[bytes]:
+        """PDF déjà converti pour cette version du fichier, sinon ``None``."""
+        if not version:
+            return None
+        entry = self.store.get_entry(file_id)
+        if entry is None or entry.get("version") != version:
+            return None
+        return self.store.get(file_id)
+
+    def needs_copy(self, file_id: str) -> bool:
+        """``True`` si l'export direct de ce fichier a déjà échoué."""
+        with self._lock:
+            if file_id in self._via_copy:
+                self.exports_skipped += 1
+                return True
+        entry = self.store.get_entry(file_id)
+        if entry is not None and entry.get("via_copy"):
+            with self._lock:
+                self._via_copy.add(file_id)
+                self.exports_skipped += 1
+            return True
+        return False
+
+    def mark_needs_copy(self, file_id: str) -> None:
+        with self._lock:
+            self._via_copy.add(file_id)
+
+    def put(self, file_id: str, version: Optional[str], pdf: bytes, *, via_copy: bool = False) -> None:
+        """Mémorise le PDF d'une conversion réussie (rien sans version connue)."""
+        with self._lock:
+            self.conversions += 1
+        if via_copy:
+            self.mark_needs_copy(file_id)
+        if not version or not pdf:
+            return
+        self.store.put(file_id, pdf, version=version, via_copy=via_copy)
+
+    def discard(self, file_id: str) -> None:
+        with self._lock:
+            self._via_copy.discard(file_id)
+        self.store.discard(file_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {"conversions": self.conversions, "exports_skipped": self.exports_skipped}
+        return {**self.store.stats(), **counters}
+
+
+pdf_cache = ConvertedPdfCache(
+    directory=settings.PDF_CACHE_DIR or os.path.join(settings.CACHE_DIR, "pdf"),
+    max_bytes=settings.PDF_CACHE_MAX_BYTES,
+)
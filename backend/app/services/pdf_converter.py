@@ -0,0 +1,345 @@
+"""Conversion locale DOCX -> PDF par un pool de LibreOffice headless.
+
+Utilisé quand Drive n'est pas configuré (``docx2pdf`` exige Word et relance un
+convertisseur à chaque document). Chaque worker possède son propre profil
+LibreOffice et traite les jobs d'une file commune :
+
+* si le module ``uno`` est importable, le worker garde un ``soffice``
+  persistant à l'écoute sur un pipe UNO et y charge chaque document ;
+* sinon, il lance ``soffice --convert-to pdf`` par job, avec son profil déjà
+  initialisé (le coût du premier démarrage n'est payé qu'une fois).
+
+Un job qui dépasse ``LIBREOFFICE_JOB_TIMEOUT`` tue le processus du worker,
+qui redémarre ; un worker est aussi recyclé après
+``LIBREOFFICE_MAX_JOBS_PER_WORKER`` conversions pour borner les fuites
+mémoire de LibreOffice.
+"""
+import json
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Options du filtre writer_pdf_Export : les signets Word (dont ``ANNEXE_*``,
+# voir app/utils/annex_markers.py) deviennent des destinations nommées du PDF
+PDF_EXPORT_OPTIONS = {"ExportBookmarksToPDFDestination": True}
+PDF_CONVERT_FILTER = "pdf:writer_pdf_Export:" + json.dumps(
+    {name: {"type": "boolean", "value": str(value).lower()} for name, value in PDF_EXPORT_OPTIONS.items()}
+)
+
+
+class ConversionError(Exception):
+    """La conversion a échoué ou dépassé le délai imparti."""
+
+
+def find_soffice() -> Optional[str]:
+    """Chemin de l'exécutable LibreOffice (réglage, sinon ``PATH``)."""
+    if settings.LIBREOFFICE_PATH:
+        return settings.LIBREOFFICE_PATH
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _uno_available() -> bool:
+    try:
+        import uno  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _Job:
+    def __init__(self, docx_bytes: bytes):
+        self.docx_bytes = docx_bytes
+        self.future: "Future[bytes]" = Future()
+        self.worker: Optional["_Worker"] = None
+
+
+class _Worker(threading.Thread):
+    """Thread qui dépile la file et pilote un profil LibreOffice dédié."""
+
+    def __init__(self, pool: "LibreOfficePool", index: int):
+        super().__init__(name=f"libreoffice-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.profile_dir = os.path.join(pool.work_dir, f"profile-{index}")
+        self.pipe_name = f"dip-easy-{os.getpid()}-{index}"
+        self.jobs_done = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._desktop = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Processus LibreOffice
+    # ------------------------------------------------------------------
+
+    def _base_args(self) -> list[str]:
+        return [
+            self.pool.soffice,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--norestore",
+            "--nodefault",
+            "--nolockcheck",
+            f"-env:UserInstallation=file://{self.profile_dir}",
+        ]
+
+    def _start_office(self) -> None:
+        import uno  # type: ignore
+
+        args = self._base_args() + [f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"]
+        with self._lock:
+            self._process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + self.pool.startup_timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if time.monotonic() > deadline or self._process.poll() is not None:
+                    self.kill()
+                    raise ConversionError("LibreOffice n'a pas démarré")
+                time.sleep(0.25)
+        self._desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def kill(self) -> None:
+        """Arrête le processus LibreOffice du worker (délai dépassé, recyclage)."""
+        with self._lock:
+            process, self._process = self._process, None
+            self._desktop = None
+        if process is not None and process.poll() is None:
+            process.kill()
+            try:
+                process.wait(5)
+            except subprocess.TimeoutExpired:
+                pass
+
+    # ------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------
+
+    def _convert_uno(self, docx_path: str, pdf_path: str) -> None:
+        import uno  # type: ignore
+        from com.sun.star.beans import PropertyValue  # type: ignore
+
+        def _prop(name, value):
+            p = PropertyValue()
+            p.Name, p.Value = name, value
+            return p
+
+        if self._desktop is None:
+            self._start_office()
+        doc = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(docx_path), "_blank", 0, (_prop("Hidden", True),)
+        )
+        filter_data = uno.Any(
+            "[]com.sun.star.beans.PropertyValue",
+            tuple(_prop(name, value) for name, value in PDF_EXPORT_OPTIONS.items()),
+        )
+        try:
+            # uno.invoke : FilterData doit garder son type de séquence UNO
+            store_args = (_prop("FilterName", "writer_pdf_Export"), _prop("FilterData", filter_data))
+            uno.invoke(doc, "storeToURL", (
+                uno.systemPathToFileUrl(pdf_path),
+                uno.Any("[]com.sun.star.beans.PropertyValue", store_args),
+            ))
+        finally:
+            doc.close(True)
+
+    def _convert_cli(self, docx_path: str, pdf_path: str) -> None:
+        # Options du filtre en JSON après son nom (LibreOffice >= 7.4)
+        args = self._base_args() + [
+            "--convert-to", PDF_CONVERT_FILTER, "--outdir", os.path.dirname(pdf_path), docx_path
+        ]
+        with self._lock:
+            self._process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            process = self._process
+        process.wait()
+        with self._lock:
+            self._process = None
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        with tempfile.TemporaryDirectory(dir=self.pool.work_dir) as tmpdir:
+            docx_path = os.path.join(tmpdir, "input.docx")
+            pdf_path = os.path.join(tmpdir, "input.pdf")
+            with open(docx_path, "wb") as f:
+                f.write(docx_bytes)
+            if self.pool.use_uno:
+                self._convert_uno(docx_path, pdf_path)
+            else:
+                self._convert_cli(docx_path, pdf_path)
+            if not os.path.exists(pdf_path):
+                raise ConversionError("LibreOffice n'a produit aucun PDF")
+            with open(pdf_path, "rb") as f:
+                return f.read()
+
+    def run(self) -> None:
+        while True:
+            job = self.pool._queue.get()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            job.worker = self
+            try:
+                job.future.set_result(self.convert(job.docx_bytes))
+            except Exception as e:
+                # Processus dans un état inconnu : on repart d'un LibreOffice neuf
+                self.kill()
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                job.worker = None
+            self.jobs_done += 1
+            if self.jobs_done >= self.pool.max_jobs_per_worker:
+                logger.info("Recyclage du worker LibreOffice %s après %s conversions", self.index, self.jobs_done)
+                self.kill()
+                self.jobs_done = 0
+        self.kill()
+
+
+class LibreOfficePool:
+    """Pool de workers LibreOffice alimenté par une file de conversions."""
+
+    def __init__(
+        self,
+        workers: int,
+        job_timeout: float,
+        max_jobs_per_worker: int,
+        queue_size: int,
+        startup_timeout: float = 30.0,
+    ):
+        self.size = max(1, workers)
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        self.startup_timeout = startup_timeout
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=queue_size)
+        self._workers: list[_Worker] = []
+        self._lock = threading.Lock()
+        self.soffice: Optional[str] = None
+        self.use_uno = False
+        self.work_dir = ""
+        self.conversions = 0
+        self.timeouts = 0
+
+    def is_available(self) -> bool:
+        return find_soffice() is not None
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._workers:
+                return
+            self.soffice = find_soffice()
+            if self.soffice is None:
+                raise ConversionError("LibreOffice introuvable (LIBREOFFICE_PATH)")
+            self.use_uno = _uno_available()
+            os.makedirs(settings.CACHE_DIR, exist_ok=True)
+            self.work_dir = tempfile.mkdtemp(prefix="libreoffice-", dir=settings.CACHE_DIR)
+            for i in range(self.size):
+                worker = _Worker(self, i)
+                worker.start()
+                self._workers.append(worker)
+            logger.info(
+                "Pool LibreOffice démarré (%s workers, mode %s)", self.size, "uno" if self.use_uno else "cli"
+            )
+
+    def convert(self, docx_bytes: bytes) -> bytes:
+        """Convertit un DOCX en PDF ; lève :class:`ConversionError` en cas d'échec."""
+        self._ensure_started()
+        job = _Job(docx_bytes)
+        try:
+            self._queue.put(job, timeout=self.job_timeout)
+        except queue.Full:
+            raise ConversionError("File de conversion LibreOffice saturée")
+        try:
+            pdf_bytes = job.future.result(timeout=self.job_timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            # Encore en file : annulé ; en cours : on tue le LibreOffice bloqué
+            if not job.future.cancel() and job.worker is not None:
+                job.worker.kill()
+            raise ConversionError(f"Conversion LibreOffice interrompue après {self.job_timeout}s")
+        except ConversionError:
+            raise
+        except Exception as e:
+            raise ConversionError(str(e)) from e
+        self.conversions += 1
+        return pdf_bytes
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for worker in workers:
+            worker.kill()
+        if self.work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            self.work_dir = ""
+
+
+libreoffice_pool = LibreOfficePool(
+    workers=settings.LIBREOFFICE_WORKERS,
+    job_timeout=settings.LIBREOFFICE_JOB_TIMEOUT,
+    max_jobs_per_worker=settings.LIBREOFFICE_MAX_JOBS_PER_WORKER,
+    queue_size=settings.LIBREOFFICE_QUEUE_SIZE,
+)
+
+
+def convert_docx_locally(docx_bytes: bytes) -> bytes:
+    """DOCX -> PDF sans Drive : pool LibreOffice (serveurs Linux), sinon docx2pdf (Word).
+
+    En dernier recours, renvoie le docx tel quel (l'appelant décidera).
+    """
+    if not docx_bytes:
+        return docx_bytes
+    from app.utils.docx_links import strip_hyperlinks
+
+    clean_bytes = strip_hyperlinks(docx_bytes)
+
+    if libreoffice_pool.is_available():
+        try:
+            return libreoffice_pool.convert(clean_bytes)
+        except Exception as e:
+            logger.warning("Conversion locale LibreOffice impossible: %s", e)
+    else:
+        try:
+            from docx2pdf import convert  # type: ignore
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                docx_path = os.path.join(tmpdir, "input.docx")
+                pdf_path = os.path.join(tmpdir, "output.pdf")
+
+                with open(docx_path, "wb") as f:
+                    f.write(clean_bytes)
+
+                # Lancement de la conversion (Word requis)
+                convert(docx_path, pdf_path)
+
+                if os.path.exists(pdf_path):
+                    with open(pdf_path, "rb") as f:
+                        return f.read()
+        except Exception as e:
+            logger.warning("Conversion locale docx2pdf impossible: %s", e)
+
+    return docx_bytes
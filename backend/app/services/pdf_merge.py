@@ -0,0 +1,44 @@
+"""Fusion des annexes PDF dans le PDF du document validé."""
+from io import BytesIO
+from typing import Dict, List
+
+from app.services.annex_cache import ParsedAnnex
+from app.utils.annex_markers import annex_pages
+
+
+def merge_annexes(pdf_bytes: bytes, annexes: Dict[str, ParsedAnnex]) -> bytes:
+    """Insère chaque annexe juste après la page qui porte ``[[ANNEXE:<alias>]]``.
+
+    ``annexes`` associe l'alias de la pièce jointe à son PDF analysé (voir
+    :mod:`app.services.annex_cache`). Les points d'insertion viennent des
+    destinations posées au rendu (:mod:`app.utils.annex_markers`) ; les
+    annexes sans destination sont cherchées dans le texte des pages.
+    Travail purement CPU (pypdf) : à exécuter dans l'étage ``pdf`` de
+    :mod:`app.services.executors`.
+    """
+    from pypdf import PdfReader, PdfWriter  # type: ignore
+
+    if not annexes:
+        return pdf_bytes
+
+    # Parcours du document principal
+    main_reader = PdfReader(BytesIO(pdf_bytes))
+    writer = PdfWriter()
+    aliases = list(annexes)
+    pages = annex_pages(main_reader, aliases)
+
+    for page_idx, page in enumerate(main_reader.pages):
+        writer.add_page(page)
+
+        page_aliases: List[str] = pages.get(page_idx, [])
+        for alias in page_aliases:
+            annex = annexes[alias]
+            # Insère toutes les pages de l'annexe juste après la page courante ;
+            # le reader est partagé via le cache, d'où le verrou
+            with annex.lock:
+                for annex_page in annex.reader.pages:
+                    writer.add_page(annex_page)
+
+    out_buf = BytesIO()
+    writer.write(out_buf)
+    return out_buf.getvalue()
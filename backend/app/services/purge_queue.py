@@ -0,0 +1,197 @@
+"""File de purge des fichiers du stockage, adossée à la table ``drive_deletions``.
+
+Les endpoints de suppression appelaient ``delete`` sur Drive dans la requête,
+un fichier à la fois, et ignoraient les échecs. Ils enregistrent maintenant
+les IDs à supprimer dans la même transaction que la suppression en base puis
+répondent aussitôt. Un worker réserve les lignes dues par lots (``FOR UPDATE
+SKIP LOCKED``, comme la file de génération), les supprime par requêtes batch
+Drive et replanifie les échecs avec un délai croissant. Un ID encore
+référencé en base (fichier partagé, dossier d'un autre produit) n'est pas
+supprimé.
+"""
+import logging
+import threading
+from typing import Collection, Iterable
+
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.core.config import settings
+from app.crud.crud_drive_deletion import DeletionStatus
+from app.db.base import SessionLocal
+from app.services.drive_guard import retry_after
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_deletion(db: Session, file_ids: Iterable[str], *, reason: str) -> int:
+    """Met des fichiers en file de purge (validés avec la transaction de l'appelant)."""
+    return len(crud.drive_deletion.enqueue(db, file_ids=file_ids, reason=reason))
+
+
+def enqueue_orphan(file_id: str, *, reason: str) -> None:
+    """Met en file un fichier qu'aucune ligne ne référence (upload corrompu), dans sa propre transaction."""
+    db = SessionLocal()
+    try:
+        enqueue_deletion(db, [file_id], reason=reason)
+        db.commit()
+    finally:
+        db.close()
+    purge_worker.wake()
+
+
+def enqueue_product_tree(db: Session, product: models.Product, *, also_deleted: Collection = ()) -> int:
+    """Met en file les fichiers d'un produit et son dossier ``<Client>/<Produit>``.
+
+    Le dossier n'est pas supprimé s'il sert aussi à un autre produit (même
+    client et même nom) que ceux supprimés avec lui (``also_deleted``) : seuls
+    les fichiers propres au produit le sont alors. Les annexes dédupliquées
+    ne partagent un fichier qu'entre produits d'un même dossier
+    (:mod:`app.services.file_dedup`), ce contrôle les protège donc aussi.
+    """
+    file_ids = [
+        g.drive_file_id
+        for g in db.query(models.Generation).filter(models.Generation.product_id == product.id)
+    ]
+    file_ids += [a.drive_file_id for a in crud.attachment.get_multi_by_product(db, product_id=product.id)]
+
+    folder_id = product.drive_folder_id
+    if folder_id:
+        deleted = [product.id, *also_deleted]
+        shared = (
+            db.query(models.Product)
+            .filter(models.Product.drive_folder_id == folder_id, models.Product.id.notin_(deleted))
+            .first()
+        )
+        if shared is None:
+            file_ids.append(folder_id)
+            _forget_folder(folder_id)
+    return enqueue_deletion(db, file_ids, reason="product")
+
+
+def _forget_folder(folder_id: str) -> None:
+    """Retire le dossier du cache des chemins : un nouveau produit homonyme en recrée un."""
+    from app.services.folder_cache import folder_cache
+
+    found = folder_cache.path_for(folder_id)
+    if found is not None:
+        folder_cache.invalidate(*found)
+
+
+def referenced_ids(db: Session, file_ids: set[str]) -> set[str]:
+    """IDs encore utilisés par une ligne en base (à ne pas supprimer)."""
+    columns = (
+        models.Generation.drive_file_id,
+        models.Attachment.drive_file_id,
+        models.Template.drive_file_id,
+        models.Product.drive_folder_id,
+    )
+    used: set[str] = set()
+    for column in columns:
+        used.update(value for (value,) in db.query(column).filter(column.in_(file_ids)))
+    return used
+
+
+class PurgeWorker:
+    """Thread qui vide la table ``drive_deletions`` par lots."""
+
+    def __init__(self, batch_size: int, poll_interval: float, stale_after: int, max_attempts: int):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.deleted = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="purge-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def wake(self) -> None:
+        """Réveille le worker sans attendre la prochaine scrutation."""
+        self._wake.set()
+
+    @staticmethod
+    def retry_delay(attempts: int, exc: Exception) -> float:
+        delay = min(settings.PURGE_RETRY_MAX, settings.PURGE_RETRY_BASE * (2 ** attempts))
+        return max(delay, retry_after(exc))
+
+    def run_once(self) -> bool:
+        """Traite au plus un lot ; renvoie ``False`` si rien n'est dû."""
+        from app.services.storage import storage
+
+        db = SessionLocal()
+        try:
+            rows = crud.drive_deletion.claim_batch(db, limit=self.batch_size, stale_after=self.stale_after)
+            if not rows:
+                return False
+            used = referenced_ids(db, {row.file_id for row in rows})
+            file_ids = list(dict.fromkeys(row.file_id for row in rows if row.file_id not in used))
+            try:
+                failures = storage.delete_many(file_ids) if file_ids else {}
+            except Exception as e:
+                logger.warning("Lot de suppressions en échec, nouvel essai plus tard: %s", e)
+                failures = {file_id: e for file_id in file_ids}
+
+            done = [row for row in rows if row.file_id not in failures]
+            self.deleted += sum(1 for row in done if row.file_id not in used)
+            self.skipped += sum(1 for row in done if row.file_id in used)
+            crud.drive_deletion.complete(db, rows=done)
+            for row in rows:
+                exc = failures.get(row.file_id)
+                if exc is None:
+                    continue
+                self.failures += 1
+                row = crud.drive_deletion.retry_later(
+                    db,
+                    db_obj=row,
+                    error=str(exc),
+                    delay=self.retry_delay(row.attempts, exc),
+                    max_attempts=self.max_attempts,
+                )
+                if row.status == DeletionStatus.ERROR:
+                    logger.error("Suppression de %s abandonnée après %d essais: %s", row.file_id, row.attempts, exc)
+            return True
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once()
+            except Exception:
+                logger.exception("Erreur inattendue du worker de purge")
+                busy = False
+            if not busy:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def stats(self) -> dict:
+        db = SessionLocal()
+        try:
+            queue = crud.drive_deletion.count_by_status(db)
+        finally:
+            db.close()
+        return {"deleted": self.deleted, "skipped": self.skipped, "failures": self.failures, "queue": queue}
+
+
+purge_worker = PurgeWorker(
+    batch_size=settings.PURGE_BATCH_SIZE,
+    poll_interval=settings.PURGE_POLL_INTERVAL,
+    stale_after=settings.PURGE_JOB_TIMEOUT,
+    max_attempts=settings.PURGE_MAX_ATTEMPTS,
+)
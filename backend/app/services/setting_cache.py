@@ -0,0 +1,85 @@
+"""Cache à durée de vie (TTL) des valeurs de la table ``settings``.
+
+Chaque opération Drive relisait ``drive_root_folder_id`` (et les credentials)
+en ouvrant une session dédiée. Les valeurs lues, absences comprises, sont
+gardées ``SETTINGS_CACHE_TTL`` secondes. ``CRUDSetting.set_value`` invalide la
+clé modifiée dans le processus courant ; les autres processus voient la
+nouvelle valeur au plus tard à l'expiration du TTL. Une valeur lue pendant
+qu'une invalidation a lieu est renvoyée mais pas mise en cache : elle peut
+être antérieure à la modification.
+"""
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.setting import Setting
+
+
+class SettingCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._values: dict[str, tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        # Incrémenté à chaque invalidation
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, db: Session | None = None) -> Optional[str]:
+        """Valeur du réglage ``key`` (``None`` s'il n'existe pas).
+
+        ``db`` évite d'ouvrir une session quand l'appelant en a déjà une.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(key)
+            if cached is not None and cached[1] > now:
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+            generation = self._generation
+
+        if db is not None:
+            value = self._load(db, key)
+        else:
+            db = SessionLocal()
+            try:
+                value = self._load(db, key)
+            finally:
+                db.close()
+        with self._lock:
+            if self._generation == generation:
+                self._values[key] = (value, now + self.ttl)
+        return value
+
+    @staticmethod
+    def _load(db: Session, key: str) -> Optional[str]:
+        row = db.query(Setting.value).filter(Setting.key == key).first()
+        return row[0] if row else None
+
+    def invalidate(self, key: str | None = None) -> None:
+        """Oublie ``key`` (ou tout le cache si ``key`` est ``None``)."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._values),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+setting_cache = SettingCache(ttl=settings.SETTINGS_CACHE_TTL)
@@ -0,0 +1,72 @@
+"""Backend de stockage actif, choisi par ``STORAGE_BACKEND``.
+
+* ``drive`` (défaut) : :data:`app.services.google_drive.google_drive_service`
+  et son client asynchrone ;
+* ``local`` : :class:`app.services.local_storage.LocalStorageBackend` sous
+  ``LOCAL_STORAGE_ROOT``.
+
+``storage`` sert le code synchrone (workers, crud, étage ``io``) et
+``async_storage`` les endpoints ``async`` : même surface, en coroutines.
+"""
+import logging
+from typing import IO, Any, Optional
+
+from app.core.config import settings
+from app.services import executors
+from app.services.storage_backend import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("drive", "local")
+
+
+class ThreadedStorage:
+    """Façade asynchrone d'un backend synchrone (appels dans l'étage ``io``)."""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    async def _call(self, name: str, *args, **kwargs) -> Any:
+        return await executors.run_in_thread("io", getattr(self.backend, name), *args, **kwargs)
+
+    async def upload(self, file_obj: IO[bytes] | bytes, filename: str, *args, **kwargs) -> str:
+        return await self._call("upload", file_obj, filename, *args, **kwargs)
+
+    async def download(self, file_id: str) -> bytes:
+        return await self._call("download", file_id)
+
+    async def get_md5(self, file_id: str) -> Optional[str]:
+        return await self._call("get_md5", file_id)
+
+    async def ensure_folder(self, path: list[str]) -> str:
+        return await self._call("ensure_folder", path)
+
+    async def delete(self, file_id: str) -> None:
+        await self._call("delete", file_id)
+
+    async def convert_to_pdf(self, file_id: str) -> bytes:
+        return await self._call("convert_to_pdf", file_id)
+
+    async def get_thumbnail_url(self, file_id: str) -> str:
+        return await self._call("get_thumbnail_url", file_id)
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _create():
+    name = settings.STORAGE_BACKEND
+    if name == "local":
+        from app.services.local_storage import LocalStorageBackend
+
+        backend = LocalStorageBackend(settings.LOCAL_STORAGE_ROOT)
+        return backend, ThreadedStorage(backend)
+    if name not in BACKENDS:
+        logger.warning("STORAGE_BACKEND=%s inconnu, utilisation de Google Drive", name)
+    from app.services.async_google_drive import async_drive_service
+    from app.services.google_drive import google_drive_service
+
+    return google_drive_service, async_drive_service
+
+
+storage, async_storage = _create()
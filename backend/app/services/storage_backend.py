@@ -0,0 +1,61 @@
+"""Interface commune des stockages de fichiers (Google Drive, disque local).
+
+Le reste de l'application ne manipule que des identifiants opaques
+(``drive_file_id`` en base) et l'arborescence ``<Client>/<Produit>/<Ref>`` :
+le backend effectif est choisi par ``STORAGE_BACKEND`` dans
+:mod:`app.services.storage`.
+"""
+from abc import ABC, abstractmethod
+from typing import IO, Optional
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def upload(
+        self,
+        file_obj: IO[bytes] | bytes,
+        filename: str,
+        mime_type: str = "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        *,
+        parent_id: str | None = None,
+    ) -> str:
+        """Enregistre un fichier (dans ``parent_id`` ou à la racine) et renvoie son ID."""
+
+    @abstractmethod
+    def download(self, file_id: str) -> bytes:
+        """Contenu du fichier ; ``b""`` s'il est introuvable."""
+
+    @abstractmethod
+    def get_md5(self, file_id: str) -> Optional[str]:
+        """md5 du contenu, ``None`` si inconnu (sert à revalider les caches locaux)."""
+
+    @abstractmethod
+    def ensure_folder(self, path: list[str]) -> str:
+        """ID du dossier ``path`` (segments depuis la racine), créé au besoin."""
+
+    @abstractmethod
+    def delete(self, file_id: str) -> None:
+        """Supprime un fichier ; sans erreur s'il n'existe plus."""
+
+    @abstractmethod
+    def delete_many(self, file_ids: list[str]) -> dict[str, Exception]:
+        """Supprime des fichiers ou des dossiers (avec leur contenu).
+
+        Renvoie les échecs par ID ; un fichier déjà absent compte comme supprimé.
+        """
+
+    @abstractmethod
+    def convert_to_pdf(self, file_id: str) -> bytes:
+        """PDF d'un document stocké ; à défaut, le document tel quel."""
+
+    @abstractmethod
+    def get_thumbnail_url(self, file_id: str) -> str:
+        """URL de miniature / d'aperçu affichable par le frontend."""
+
+    @abstractmethod
+    def get_thumbnail_urls(self, file_ids: list[str]) -> dict[str, Optional[str]]:
+        """Miniatures de plusieurs fichiers, sans lien de repli.
+
+        ``None`` si la miniature n'est pas encore générée ; un ID absent du
+        résultat n'a pas pu être interrogé (à retenter).
+        """
@@ -0,0 +1,85 @@
+"""Cache local des fichiers .docx des modèles.
+
+Les modèles changent rarement mais chaque génération les retéléchargeait
+depuis Drive. Les octets sont conservés dans un :class:`DiskLRUCache` sous la
+clé ``<drive_file_id>@<version>``. Au-delà de ``TEMPLATE_CACHE_REVALIDATE_SECONDS``
+depuis la dernière vérification, on compare le ``md5Checksum`` Drive (simple
+appel de métadonnées) avant de resservir la copie locale.
+"""
+import hashlib
+import logging
+import os
+import time
+
+from app.core.config import settings
+from app.services.disk_cache import DiskLRUCache
+from app.services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateCache:
+    def __init__(self, directory: str, max_bytes: int, revalidate_after: float):
+        self.store = DiskLRUCache(directory, max_bytes, namespace="templates")
+        self.revalidate_after = revalidate_after
+        self.downloads = 0
+
+    @staticmethod
+    def _key(drive_file_id: str, version: str | None) -> str:
+        return f"{drive_file_id}@{version or ''}"
+
+    def fetch(self, drive_file_id: str, version: str | None) -> bytes:
+        """Renvoie les octets du modèle, depuis le cache si la copie est valide.
+
+        Renvoie ``b""`` (comme :meth:`GoogleDriveService.download`) si le
+        fichier est introuvable.
+        """
+        key = self._key(drive_file_id, version)
+        entry = self.store.get_entry(key)
+        if entry is not None and time.time() - entry.get("checked_at", 0) < self.revalidate_after:
+            data = self.store.get(key)
+            if data is not None:
+                return data
+
+        remote_md5 = storage.get_md5(drive_file_id)
+        if entry is not None:
+            # md5 inconnu (Drive non configuré ou fichier natif Google) : on garde la copie
+            if remote_md5 is None or remote_md5 == entry.get("md5"):
+                data = self.store.get(key)
+                if data is not None:
+                    self.store.update_meta(key, checked_at=time.time())
+                    return data
+            else:
+                logger.info("Modèle %s modifié sur Drive, rechargement du cache", drive_file_id)
+
+        self.downloads += 1
+        data = storage.download(drive_file_id)
+        if data:
+            local_md5 = hashlib.md5(data).hexdigest()
+            if remote_md5 is not None and remote_md5 != local_md5:
+                # Fichier modifié pendant le téléchargement : on sert sans mettre en cache
+                logger.warning("md5 Drive incohérent pour %s, copie non mise en cache", drive_file_id)
+                return data
+            self.store.put(key, data, md5=local_md5, checked_at=time.time())
+        return data
+
+    def prime(self, drive_file_id: str, version: str | None, data: bytes) -> None:
+        """Pré-remplit le cache avec un modèle que l'on vient d'uploader."""
+        if not data:
+            return
+        self.store.put(
+            self._key(drive_file_id, version),
+            data,
+            md5=hashlib.md5(data).hexdigest(),
+            checked_at=time.time(),
+        )
+
+    def stats(self) -> dict:
+        return {**self.store.stats(), "downloads": self.downloads}
+
+
+template_cache = TemplateCache(
+    directory=os.path.join(settings.CACHE_DIR, "templates"),
+    max_bytes=settings.TEMPLATE_CACHE_MAX_BYTES,
+    revalidate_after=settings.TEMPLATE_CACHE_REVALIDATE_SECONDS,
+)
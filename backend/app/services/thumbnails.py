@@ -0,0 +1,173 @@
+"""Résolution différée des miniatures des annexes et des modèles.
+
+Les uploads appelaient ``get_thumbnail_url`` avant de répondre : un
+``files.get`` Drive de plus dans la latence, pour un lien souvent vide car
+Drive n'a pas encore généré la miniature. Les lignes sont maintenant créées
+sans lien (``attachments.url``, ``templates.thumbnail_url`` à ``NULL``) et
+un thread les complète par requêtes batch Drive : peu après l'upload
+(``THUMBNAIL_RESOLVE_DELAY``), puis à chaque relance périodique tant que
+Drive renvoie un lien vide. Après ``THUMBNAIL_MAX_ATTEMPTS`` réponses vides,
+le lien d'aperçu par défaut (``get_thumbnail_url``) est enregistré.
+
+Un fichier absent de la réponse n'a pas pu être interrogé (erreur Drive) :
+ce n'est pas compté comme un essai, le fichier est seulement écarté jusqu'à
+la relance périodique suivante. Les essais sont comptés en mémoire, par
+processus : un redémarrage (ou un autre worker) les reprend à zéro, ce qui
+retarde au pire le lien de repli de quelques relances.
+"""
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.db.base import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Colonne du lien à compléter, par modèle
+LINK_COLUMNS = {
+    models.Attachment: "url",
+    models.Template: "thumbnail_url",
+}
+
+
+class ThumbnailResolver:
+    """Thread qui complète les liens de miniature manquants en base."""
+
+    def __init__(self, resolve_delay: float, refresh_interval: float, batch_size: int, max_attempts: int):
+        self.resolve_delay = resolve_delay
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._attempts: dict[str, int] = {}
+        # Fichiers non interrogés (erreur Drive) -> instant de la prochaine tentative
+        self._deferred: dict[str, float] = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.resolved = 0
+        self.fallbacks = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="thumbnail-resolver", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def wake(self) -> None:
+        """Signale un upload : résolution après ``resolve_delay``."""
+        self._wake.set()
+
+    def _pending(self, db: Session, exclude: set[str]) -> list[str]:
+        """Fichiers dont une ligne attend encore son lien (au plus ``batch_size``)."""
+        file_ids: dict[str, None] = {}
+        for model, column in LINK_COLUMNS.items():
+            query = (
+                db.query(model.drive_file_id)
+                .filter(getattr(model, column).is_(None), model.drive_file_id.notin_([*exclude, *file_ids]))
+                .distinct()
+                .limit(self.batch_size - len(file_ids))
+            )
+            file_ids.update((file_id, None) for (file_id,) in query)
+            if len(file_ids) >= self.batch_size:
+                break
+        return list(file_ids)
+
+    @staticmethod
+    def _store(db: Session, links: dict[str, str]) -> int:
+        """Enregistre les liens sur toutes les lignes qui les attendent."""
+        updated = 0
+        for model, column in LINK_COLUMNS.items():
+            rows = db.query(model).filter(getattr(model, column).is_(None), model.drive_file_id.in_(list(links)))
+            for row in rows:
+                setattr(row, column, links[row.drive_file_id])
+                updated += 1
+        db.commit()
+        return updated
+
+    def run_once(self) -> int:
+        """Une passe sur les liens manquants ; renvoie le nombre de lignes complétées."""
+        from app.services.storage import storage
+
+        db = SessionLocal()
+        try:
+            now = time.monotonic()
+            self._deferred = {file_id: until for file_id, until in self._deferred.items() if until > now}
+            tried: set[str] = set(self._deferred)
+            updated = 0
+            while not self._stop.is_set():
+                file_ids = self._pending(db, tried)
+                if not file_ids:
+                    break
+                tried.update(file_ids)
+                try:
+                    links = storage.get_thumbnail_urls(file_ids)
+                except Exception as e:
+                    logger.warning("Miniatures non résolues, nouvel essai à la prochaine relance: %s", e)
+                    break
+                self.batches += 1
+
+                missing = [file_id for file_id in file_ids if file_id not in links]
+                for file_id in missing:
+                    self._deferred[file_id] = now + self.refresh_interval
+                for file_id in file_ids:
+                    if file_id in missing:
+                        continue
+                    if links[file_id] is not None:
+                        self._attempts.pop(file_id, None)
+                        continue
+                    attempts = self._attempts[file_id] = self._attempts.get(file_id, 0) + 1
+                    if attempts >= self.max_attempts:
+                        links[file_id] = storage.get_thumbnail_url(file_id)
+                        self._attempts.pop(file_id, None)
+                        self.fallbacks += 1
+                        logger.info("Pas de miniature Drive pour %s, lien d'aperçu par défaut", file_id)
+
+                updated += self._store(db, {file_id: link for file_id, link in links.items() if link is not None})
+                if len(missing) == len(file_ids):
+                    logger.warning("Miniatures non résolues (%d fichiers), nouvel essai à la prochaine relance", len(missing))
+                    break
+            self.resolved += updated
+            return updated
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._wake.wait(self.refresh_interval):
+                # Laisse Drive générer la miniature et regroupe les uploads proches
+                self._stop.wait(self.resolve_delay)
+            self._wake.clear()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Erreur inattendue lors de la résolution des miniatures")
+
+    def stats(self) -> dict:
+        return {
+            "resolved": self.resolved,
+            "fallbacks": self.fallbacks,
+            "batches": self.batches,
+            "waiting": len(self._attempts),
+            "deferred": len(self._deferred),
+        }
+
+
+thumbnail_resolver = ThumbnailResolver(
+    resolve_delay=settings.THUMBNAIL_RESOLVE_DELAY,
+    refresh_interval=settings.THUMBNAIL_REFRESH_INTERVAL,
+    batch_size=settings.THUMBNAIL_BATCH_SIZE,
+    max_attempts=settings.THUMBNAIL_MAX_ATTEMPTS,
+)
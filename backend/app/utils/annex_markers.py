@@ -0,0 +1,152 @@
+"""Marqueurs d'annexe ``[[ANNEXE:<alias>]]`` : signets DOCX et destinations PDF.
+
+Au rendu, chaque paragraphe qui contient un marqueur reçoit un signet Word
+dont le nom dérive de l'alias. LibreOffice exporte les signets en
+destinations nommées (``ExportBookmarksToPDFDestination``, voir
+app/services/pdf_converter.py) : la fusion PDF retrouve alors les points
+d'insertion sans extraire le texte des pages. Les annexes sans destination
+(export qui perd les signets, marqueur hors signet) retombent sur la
+recherche textuelle du marqueur.
+"""
+import hashlib
+import re
+from typing import Dict, List
+
+from docx.oxml import OxmlElement  # type: ignore
+from docx.oxml.ns import qn  # type: ignore
+
+MARKER_RX = re.compile(r"\[\[ANNEXE:(.+?)\]\]")
+
+BOOKMARK_PREFIX = "ANNEXE_"
+
+
+def marker(alias: str) -> str:
+    return f"[[ANNEXE:{alias}]]"
+
+
+def bookmark_name(alias: str) -> str:
+    """Nom de signet valide pour Word (lettre initiale, <= 40 caractères, [A-Za-z0-9_])."""
+    return BOOKMARK_PREFIX + hashlib.sha1(alias.encode("utf-8")).hexdigest()[:16]
+
+
+def add_annex_bookmarks(document) -> int:
+    """Pose un signet sur chaque paragraphe du corps portant un marqueur d'annexe.
+
+    Les paragraphes des tableaux (cellules, tableaux imbriqués) sont couverts :
+    le parcours descend dans tout le corps. Une occurrence répétée du même alias reçoit le suffixe ``_2``, ``_3``...
+    (les noms de signet sont uniques). Renvoie le nombre de signets posés.
+    """
+    body = document.element.body
+    w_p, w_t, w_ppr = qn("w:p"), qn("w:t"), qn("w:pPr")
+    w_id = qn("w:id")
+
+    ids = [int(el.get(w_id)) for el in body.iter(qn("w:bookmarkStart")) if (el.get(w_id) or "").isdigit()]
+    next_id = max(ids, default=-1) + 1
+    seen: Dict[str, int] = {}
+    count = 0
+    for paragraph in body.iter(w_p):
+        text = "".join(t.text or "" for t in paragraph.iter(w_t))
+        if "[[ANNEXE:" not in text:
+            continue
+        anchor = paragraph.find(w_ppr)
+        for alias in MARKER_RX.findall(text):
+            seen[alias] = seen.get(alias, 0) + 1
+            name = bookmark_name(alias)
+            if seen[alias] > 1:
+                name += f"_{seen[alias]}"
+
+            start = OxmlElement("w:bookmarkStart")
+            start.set(w_id, str(next_id))
+            start.set(qn("w:name"), name)
+            end = OxmlElement("w:bookmarkEnd")
+            end.set(w_id, str(next_id))
+            next_id += 1
+
+            # Débuts de signets en tête de paragraphe, dans l'ordre des marqueurs
+            if anchor is not None:
+                anchor.addnext(start)
+            else:
+                paragraph.insert(0, start)
+            anchor = start
+            paragraph.append(end)
+            count += 1
+    return count
+
+
+def annex_pages_from_destinations(reader, aliases: List[str]) -> Dict[int, List[str]] | None:
+    """Pages (index 0) après lesquelles insérer chaque annexe, d'après les destinations.
+
+    Lit les destinations nommées et le sommaire (outline) du PDF. Renvoie
+    ``None`` si le PDF ne porte aucune destination d'annexe : l'appelant doit
+    alors chercher les marqueurs dans le texte.
+    """
+    destinations = []
+    try:
+        destinations.extend(reader.named_destinations.items())
+    except Exception:
+        pass
+
+    def _walk(items):
+        for item in items:
+            if isinstance(item, list):
+                _walk(item)
+            else:
+                destinations.append((item.title or "", item))
+
+    try:
+        _walk(reader.outline)
+    except Exception:
+        pass
+
+    annex_dests = [
+        (str(name).lstrip("/"), dest) for name, dest in destinations if str(name).lstrip("/").startswith(BOOKMARK_PREFIX)
+    ]
+    if not annex_dests:
+        return None
+
+    by_name = {bookmark_name(alias): alias for alias in aliases}
+    pages: Dict[int, List[str]] = {}
+    placed = set()
+    for name, dest in annex_dests:
+        alias = by_name.get("_".join(name.split("_", 2)[:2]))
+        if alias is None:
+            continue
+        try:
+            page = reader.get_destination_page_number(dest)
+        except Exception:
+            continue
+        # Comme la recherche textuelle : une annexe au plus une fois par page
+        if page is None or page < 0 or (alias, page) in placed:
+            continue
+        placed.add((alias, page))
+        pages.setdefault(page, []).append(alias)
+
+    _sort(pages, aliases)
+    return pages
+
+
+def annex_pages(reader, aliases: List[str]) -> Dict[int, List[str]]:
+    """Pages (index 0) après lesquelles insérer chaque annexe.
+
+    Les destinations nommées placent les annexes qui en ont une ; les autres
+    sont cherchées dans le texte des pages (``extract_text``, coûteux : fait
+    seulement s'il reste des annexes à placer).
+    """
+    pages = annex_pages_from_destinations(reader, aliases) or {}
+    placed = {alias for page_aliases in pages.values() for alias in page_aliases}
+    missing = [alias for alias in aliases if alias not in placed]
+    if missing:
+        for page_idx, page in enumerate(reader.pages):
+            text = page.extract_text() or ""
+            for alias in missing:
+                if marker(alias) in text:
+                    pages.setdefault(page_idx, []).append(alias)
+        _sort(pages, aliases)
+    return pages
+
+
+def _sort(pages: Dict[int, List[str]], aliases: List[str]) -> None:
+    # Ordre d'insertion stable : celui des annexes fournies
+    order = {alias: i for i, alias in enumerate(aliases)}
+    for page_aliases in pages.values():
+        page_aliases.sort(key=order.__getitem__)
@@ -1,8 +1,9 @@
 import io
+import struct
 import zipfile
-import xml.etree.ElementTree as ET
 from typing import List
 import re
+from lxml import etree  # type: ignore
 from docx import Document  # type: ignore
 from docx.oxml import OxmlElement  # type: ignore
 from docx.oxml.ns import qn  # type: ignore
@@ -13,88 +14,190 @@ NAMESPACES = {
     "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
 }
 
-ET.register_namespace("w", NAMESPACES["w"])
-ET.register_namespace("r", NAMESPACES["r"])
-
 URL_RX = re.compile(r"https?://\S+", re.I)
 
+_XML_PARSER = etree.XMLParser(huge_tree=True, resolve_entities=False, remove_blank_text=False)
+
+_COPY_CHUNK = 1024 * 1024
+
+
 def strip_hyperlinks(docx_bytes: bytes) -> bytes:
     """Retire les balises <w:hyperlink> pour que les liens n'apparaissent plus.
 
-    1. Décompresse le fichier docx (zip)
+    1. Parcourt les entrées du fichier docx (zip)
     2. Modifie document.xml et document.xml.rels
-    3. Rezippe et renvoie les octets modifiés
+    3. Recopie les autres entrées telles quelles, sans les décompresser ni
+       les recompresser, et renvoie les octets modifiés
     """
+    # Parties réécrites ; toutes les autres sont recopiées brutes
+    handlers = {
+        "word/document.xml": _remove_hyperlink_elements,
+        "word/_rels/document.xml.rels": _remove_hyperlink_rels,
+    }
     in_mem = io.BytesIO(docx_bytes)
     out_mem = io.BytesIO()
 
     with zipfile.ZipFile(in_mem) as zin:
         with zipfile.ZipFile(out_mem, "w", compression=zipfile.ZIP_DEFLATED) as zout:
             for item in zin.infolist():
-                data = zin.read(item.filename)
-                if item.filename == "word/document.xml":
-                    data = _remove_hyperlink_elements(data)
-                elif item.filename == "word/_rels/document.xml.rels":
-                    data = _remove_hyperlink_rels(data)
-                zout.writestr(item, data)
+                handler = handlers.get(item.filename)
+                if handler is None:
+                    _copy_raw_entry(zin, zout, item)
+                    continue
+                zout.writestr(item, handler(zin.read(item.filename)))
     return out_mem.getvalue()
 
 
+def _copy_raw_entry(zin: zipfile.ZipFile, zout: zipfile.ZipFile, item: zipfile.ZipInfo) -> None:
+    """Recopie une entrée zip avec ses octets compressés d'origine.
+
+    ``zipfile`` ne sait que décompresser/recompresser ; on relit donc l'en-tête
+    local pour localiser les données brutes et on les transfère par blocs.
+    """
+    src = zin.fp
+    src.seek(item.header_offset)
+    header = src.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    src.seek(item.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+    out_info = zipfile.ZipInfo(item.filename, item.date_time)
+    out_info.compress_type = item.compress_type
+    out_info.external_attr = item.external_attr
+    out_info.create_system = item.create_system
+    out_info.comment = item.comment
+    out_info.CRC = item.CRC
+    out_info.compress_size = item.compress_size
+    out_info.file_size = item.file_size
+    # Tailles connues d'avance : pas de data descriptor après les données
+    out_info.flag_bits = item.flag_bits & ~0x08
+    out_info.header_offset = zout.fp.tell()
+
+    zout.fp.write(out_info.FileHeader())
+    remaining = item.compress_size
+    while remaining:
+        chunk = src.read(min(_COPY_CHUNK, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Entrée tronquée : {item.filename}")
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+
+    zout.filelist.append(out_info)
+    zout.NameToInfo[out_info.filename] = out_info
+    zout.start_dir = zout.fp.tell()
+
+
 def _remove_hyperlink_elements(xml_data: bytes) -> bytes:
-    tree = ET.fromstring(xml_data)
-    for hlink in list(tree.findall(".//w:hyperlink", NAMESPACES)):
-        parent = None
-        # ET fallback to find parent
-        for p in tree.iter():
-            if hlink in list(p):
-                parent = p
-                break
+    root = etree.fromstring(xml_data, _XML_PARSER)
+    # getparent() est O(1) : plus de recherche du parent dans tout l'arbre
+    for hlink in list(root.iterfind(".//w:hyperlink", NAMESPACES)):
+        parent = hlink.getparent()
         if parent is not None:
             parent.remove(hlink)  # supprime entièrement le lien + son texte
-    return ET.tostring(tree, encoding="utf-8")
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
 
 
 def _remove_hyperlink_rels(xml_data: bytes) -> bytes:
-    tree = ET.fromstring(xml_data)
-    to_remove: List[ET.Element] = []
-    for rel in tree.findall(".//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"):
+    root = etree.fromstring(xml_data, _XML_PARSER)
+    to_remove: List = []
+    for rel in root.iterfind("{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"):
         if rel.get("Type", "").endswith("/relationships/hyperlink"):
             to_remove.append(rel)
     for rel in to_remove:
-        tree.remove(rel)
-    return ET.tostring(tree, encoding="utf-8")
+        root.remove(rel)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
 
 # ---------------------------------------------------------------------
 # Ajout de liens cliquables post-rendu
 # ---------------------------------------------------------------------
 
-def make_links_clickable(docx_bytes: bytes) -> bytes:
-    """Parcourt le document et convertit les URL texte en hyperliens."""
-    doc = Document(io.BytesIO(docx_bytes))
+_HEADER_FOOTER_RELS = (RT.HEADER, RT.FOOTER)
+
 
-    for paragraph in doc.paragraphs:
-        for run in paragraph.runs:
-            match = URL_RX.search(run.text or "")
-            if match:
-                url = match.group(0)
-                full_text = run.text
-                # On remplace entièrement le run par l'hyperlien
-                run.clear()
+class _HyperlinkRels:
+    """Ajout de relations hyperlien en temps constant.
 
-                part = doc.part  # type: ignore
-                r_id = part.relate_to(url, RT.HYPERLINK, is_external=True)
+    ``part.relate_to`` parcourt toutes les relations existantes à chaque
+    appel (quadratique sur un document riche en liens) : on indexe une fois
+    les URL déjà présentes et on tient notre propre compteur de rId.
+    """
 
-                hyperlink = OxmlElement("w:hyperlink")
-                hyperlink.set(qn("r:id"), r_id)
+    def __init__(self, part):
+        self.rels = part.rels
+        self.by_url = {
+            rel.target_ref: rel.rId
+            for rel in self.rels.values()
+            if rel.is_external and rel.reltype == RT.HYPERLINK
+        }
+        self._n = 1
+
+    def rid_for(self, url: str) -> str:
+        r_id = self.by_url.get(url)
+        if r_id is None:
+            while f"rId{self._n}" in self.rels:
+                self._n += 1
+            r_id = f"rId{self._n}"
+            self.rels.add_relationship(RT.HYPERLINK, url, r_id, is_external=True)
+            self.by_url[url] = r_id
+        return r_id
+
+
+def _link_urls_in_tree(part, root) -> int:
+    """Entoure d'un <w:hyperlink> chaque run dont le texte contient une URL.
+
+    Le run est déplacé tel quel dans le lien : sa mise en forme et sa place
+    dans le paragraphe sont conservées. Renvoie le nombre de liens créés.
+    """
+    w_r, w_t, w_p, w_hyperlink = qn("w:r"), qn("w:t"), qn("w:p"), qn("w:hyperlink")
+    candidates = []
+    for run in root.iter(w_r):
+        parent = run.getparent()
+        # Les runs déjà dans un lien (ou hors paragraphe) ne sont pas touchés
+        if parent is None or parent.tag != w_p:
+            continue
+        text = "".join(t.text or "" for t in run.iter(w_t))
+        match = URL_RX.search(text)
+        if match:
+            candidates.append((run, match.group(0)))
+
+    rels = _HyperlinkRels(part) if candidates else None
+    for run, url in candidates:
+        r_id = rels.rid_for(url)
+        hyperlink = OxmlElement("w:hyperlink")
+        hyperlink.set(qn("r:id"), r_id)
+        run.addprevious(hyperlink)
+        hyperlink.append(run)
+    return len(candidates)
+
+
+def link_urls(document) -> int:
+    """Rend cliquables les URL texte d'un document python-docx déjà chargé.
+
+    Un seul passage lxml sur le corps (tableaux compris), les en-têtes et les
+    pieds de page, sans sérialiser le document : à appeler juste avant
+    l'unique ``save()``. Renvoie le nombre de liens créés.
+    """
+    main_part = document.part
+    count = _link_urls_in_tree(main_part, main_part.element)
+    seen = set()
+    for rel in list(main_part.rels.values()):
+        if rel.is_external or rel.reltype not in _HEADER_FOOTER_RELS:
+            continue
+        part = rel.target_part
+        if id(part) in seen or not hasattr(part, "element"):
+            continue
+        seen.add(id(part))
+        count += _link_urls_in_tree(part, part.element)
+    return count
 
-                new_run = OxmlElement("w:r")
-                text_elem = OxmlElement("w:t")
-                text_elem.text = full_text
-                new_run.append(text_elem)
-                hyperlink.append(new_run)
 
-                paragraph._p.append(hyperlink)
+def make_links_clickable(docx_bytes: bytes) -> bytes:
+    """Parcourt le document et convertit les URL texte en hyperliens.
 
+    Variante octets -> octets de :func:`link_urls` (relit et réécrit le
+    docx) ; le rendu de ``DocxService`` appelle directement ``link_urls``.
+    """
+    doc = Document(io.BytesIO(docx_bytes))
+    link_urls(doc)
     out = io.BytesIO()
     doc.save(out)
-    return out.getvalue() 
\ No newline at end of file
+    return out.getvalue()
@@ -0,0 +1,119 @@
+"""Benchmark du post-traitement des liens après rendu docxtpl.
+
+Compare, sur des documents de taille croissante :
+
+* ``avant`` : rendu + ``save()`` puis ``make_links_clickable`` historique
+  (relecture python-docx, parcours run par run, deuxième ``save()``) ;
+* ``après`` : rendu + ``link_urls`` sur l'arbre rendu + un seul ``save()``.
+
+Usage (depuis ``backend/``) ::
+
+    python -m benchmarks.bench_docx_postprocess --sizes 500 2000 8000
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+from docx import Document  # type: ignore
+from docx.opc.constants import RELATIONSHIP_TYPE as RT  # type: ignore
+from docx.oxml import OxmlElement  # type: ignore
+from docx.oxml.ns import qn  # type: ignore
+from docxtpl import DocxTemplate  # type: ignore
+
+from app.utils.docx_links import URL_RX, link_urls
+
+
+def _legacy_make_links_clickable(docx_bytes: bytes) -> bytes:
+    """Implémentation d'origine, conservée ici comme référence."""
+    doc = Document(io.BytesIO(docx_bytes))
+    for paragraph in doc.paragraphs:
+        for run in paragraph.runs:
+            match = URL_RX.search(run.text or "")
+            if match:
+                url = match.group(0)
+                full_text = run.text
+                run.clear()
+                r_id = doc.part.relate_to(url, RT.HYPERLINK, is_external=True)
+                hyperlink = OxmlElement("w:hyperlink")
+                hyperlink.set(qn("r:id"), r_id)
+                new_run = OxmlElement("w:r")
+                text_elem = OxmlElement("w:t")
+                text_elem.text = full_text
+                new_run.append(text_elem)
+                hyperlink.append(new_run)
+                paragraph._p.append(hyperlink)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def build_template(paragraphs: int) -> bytes:
+    doc = Document()
+    for i in range(paragraphs):
+        p = doc.add_paragraph(f"Section {i} – {{{{ nom_produit }}}} ")
+        if i % 4 == 0:
+            p.add_run(f"https://example.com/fiche/{i}")
+    table = doc.add_table(rows=max(1, paragraphs // 20), cols=3)
+    for row in table.rows:
+        row.cells[0].text = "{{ marque }}"
+        row.cells[1].text = "https://example.com/annexe"
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _before(template_bytes: bytes, context: dict) -> bytes:
+    tpl = DocxTemplate(io.BytesIO(template_bytes))
+    tpl.render(context)
+    buf = io.BytesIO()
+    tpl.save(buf)
+    return _legacy_make_links_clickable(buf.getvalue())
+
+
+def _after(template_bytes: bytes, context: dict) -> bytes:
+    tpl = DocxTemplate(io.BytesIO(template_bytes))
+    tpl.render(context)
+    link_urls(tpl.docx)
+    buf = io.BytesIO()
+    tpl.save(buf)
+    return buf.getvalue()
+
+
+def measure(fn, *args, repeat: int = 3) -> tuple[float, float]:
+    """Renvoie (durée médiane en s, pic mémoire en Mo).
+
+    Le pic mémoire est mesuré sur une exécution séparée : tracemalloc
+    ralentit fortement le code et fausserait les durées.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return durations[len(durations) // 2], peak / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 8000], help="nombre de paragraphes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    context = {"nom_produit": "Crème solaire SPF50", "marque": "DIP"}
+    print(f"{'paragraphes':>11} | {'avant (s)':>9} | {'après (s)':>9} | {'avant (Mo)':>10} | {'après (Mo)':>10}")
+    for size in args.sizes:
+        template_bytes = build_template(size)
+        t_before, m_before = measure(_before, template_bytes, context, repeat=args.repeat)
+        t_after, m_after = measure(_after, template_bytes, context, repeat=args.repeat)
+        print(f"{size:>11} | {t_before:>9.3f} | {t_after:>9.3f} | {m_before:>10.1f} | {m_after:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Benchmark des parcours Drive contre l'API de substitution locale.
+
+Lance :class:`benchmarks.drive_standin.DriveStandIn`, y pointe
+l'application (``DRIVE_API_ENDPOINT``, compte de service dont ``token_uri``
+vise le serveur) et exécute le code réel des services :
+
+* ``product`` : les trois ``ensure_folder`` de la création d'un produit ;
+* ``generation`` : téléchargement du modèle (cache local + revalidation md5),
+  dossier cible, upload du DOCX rendu ;
+* ``validation`` : conversion PDF (export, sinon copie Google Doc + export),
+  annexes PDF (``annex_cache``), fusion, upload du PDF ;
+* ``attachment`` : upload asynchrone d'une annexe (``async_storage``), la
+  miniature étant résolue plus tard, par lots (``thumbnails``).
+
+Pour chaque parcours : débit, latences p50/p95/p99, appels d'API Drive par
+opération (détail par méthode, sous-requêtes des batchs comprises : c'est ce
+que compte le quota) et allers-retours HTTP par opération, avec la latence
+et le taux d'erreurs injectés dans le serveur. ``--sharing-mode`` et
+``--permission-batch-delay`` comparent les réglages de partage des fichiers.
+
+La base sert au cache des dossiers et aux réglages (credentials) : utiliser
+une base jetable, jamais celle de production.
+
+Usage (depuis ``backend/``) ::
+
+    python -m benchmarks.bench_drive_storage --database-url postgresql://.../bench \\
+        --iterations 200 --concurrency 8 --latency 0.03 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from benchmarks.drive_standin import DriveStandIn
+
+SCENARIOS = ("product", "generation", "validation", "attachment")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par rang le plus proche (valeurs triées)."""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def service_account_info(token_uri: str) -> dict:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode("ascii")
+    return {
+        "type": "service_account",
+        "project_id": "bench",
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": "bench@bench.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": token_uri,
+    }
+
+
+def _docx(size_kb: int) -> bytes:
+    from docx import Document  # type: ignore
+
+    doc = Document()
+    doc.add_paragraph("{{ product.nom_produit }}")
+    doc.add_paragraph("x" * (size_kb * 1024))
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _pdf(pages: int) -> bytes:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+class Bench:
+    def __init__(self, args, standin: DriveStandIn):
+        from app.services.storage import async_storage, storage
+
+        self.args = args
+        self.standin = standin
+        self.storage = storage
+        self.async_storage = async_storage
+        self.docx = _docx(args.doc_kb)
+        self.template = None
+        self.generated: List[str] = []
+        self.annexes: List[SimpleNamespace] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def product(i: int) -> SimpleNamespace:
+        return SimpleNamespace(
+            id=f"bench-{i}", nom_client=f"Client {i % 20}", marque="DIP", nom_produit=f"Produit {i}", ref_formule="REF-1"
+        )
+
+    def setup(self) -> None:
+        """Modèle, documents générés à valider et annexes PDF (hors mesures)."""
+        from app.services.generation_service import formula_folder_path
+
+        template_id = self.storage.upload(self.docx, "modele.docx")
+        self.template = SimpleNamespace(id="bench-template", drive_file_id=template_id, version="1")
+        folder = self.storage.ensure_folder(formula_folder_path(self.product(0)) + ["Annexes"])
+        for n in range(self.args.annexes):
+            file_id = self.storage.upload(_pdf(2), f"annexe_{n}.pdf", mime_type="application/pdf", parent_id=folder)
+            self.annexes.append(
+                SimpleNamespace(alias=f"annexe_{n}", file_name=f"annexe_{n}.pdf", drive_file_id=file_id, mime_type="application/pdf")
+            )
+
+    # -- parcours ------------------------------------------------------
+
+    def op_product(self, i: int) -> None:
+        product = self.product(i)
+        self.storage.ensure_folder([product.nom_client, product.nom_produit])
+        self.storage.ensure_folder([product.nom_client, product.nom_produit, product.ref_formule])
+        self.storage.ensure_folder([product.nom_client, product.nom_produit, product.ref_formule, "Annexes"])
+
+    def op_generation(self, i: int) -> None:
+        from app.services.generation_service import download_template, upload_document
+
+        template_bytes = download_template(self.template)
+        file_id = upload_document(self.product(i), template_bytes)
+        with self._lock:
+            self.generated.append(file_id)
+
+    def op_validation(self, i: int) -> None:
+        from app.services import executors
+        from app.services.annex_cache import annex_cache
+        from app.services.generation_service import document_filename, formula_folder_path
+        from app.services.pdf_merge import merge_annexes
+
+        with self._lock:
+            file_id = self.generated[i % len(self.generated)] if self.generated else self.template.drive_file_id
+        pdf_bytes = self.storage.convert_to_pdf(file_id)
+        annexes = annex_cache.fetch(self.annexes)
+        if annexes:
+            pdf_bytes = executors.run_in_stage("pdf", merge_annexes, pdf_bytes, annexes)
+        product = self.product(i)
+        folder = self.storage.ensure_folder(formula_folder_path(product))
+        self.storage.upload(pdf_bytes, document_filename(product, "pdf"), mime_type="application/pdf", parent_id=folder)
+
+    async def op_attachment(self, i: int) -> None:
+        product = self.product(i)
+        folder = await self.async_storage.ensure_folder([product.nom_client, product.nom_produit, product.ref_formule, "Annexes"])
+        await self.async_storage.upload(
+            io.BytesIO(self.docx), "annexe.docx", mime_type="application/octet-stream", parent_id=folder
+        )
+
+    # -- exécution -----------------------------------------------------
+
+    def run(self, name: str) -> dict:
+        from app.services.drive_guard import drive_guard
+        from app.services.drive_sharing import drive_sharing
+
+        drive_sharing.stop()  # partages en attente de la mise en place
+        self.standin.reset_stats()
+        guard_before = drive_guard.stats()
+        durations: List[float] = []
+        failures: Counter = Counter()
+        iterations = range(1, self.args.iterations + 1)
+        start = time.perf_counter()
+
+        if name == "attachment":
+            durations, failures = asyncio.run(self._run_async(self.op_attachment, iterations))
+        else:
+            op: Callable[[int], None] = getattr(self, f"op_{name}")
+
+            def _timed(i: int):
+                t0 = time.perf_counter()
+                try:
+                    op(i)
+                except Exception as e:
+                    return None, type(e).__name__
+                return time.perf_counter() - t0, None
+
+            with ThreadPoolExecutor(self.args.concurrency) as pool:
+                for duration, error in pool.map(_timed, iterations):
+                    if error:
+                        failures[error] += 1
+                    else:
+                        durations.append(duration)
+
+        elapsed = time.perf_counter() - start
+        # Partages regroupés encore en attente : comptés avec ce parcours
+        drive_sharing.stop()
+        guard_after = drive_guard.stats()
+        stats = self.standin.stats()
+        durations.sort()
+        return {
+            "scenario": name,
+            "ops": len(durations),
+            "failures": dict(failures),
+            "ops_per_s": len(durations) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(durations, 50) * 1000,
+            "p95_ms": percentile(durations, 95) * 1000,
+            "p99_ms": percentile(durations, 99) * 1000,
+            "calls_per_op": sum(stats["calls"].values()) / self.args.iterations,
+            "requests_per_op": stats["requests"] / self.args.iterations,
+            "calls": {k: round(v / self.args.iterations, 2) for k, v in sorted(stats["calls"].items())},
+            "injected_errors": sum(stats["errors"].values()),
+            "retries": guard_after["retries"] - guard_before["retries"],
+        }
+
+    async def _run_async(self, op, iterations):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        durations: List[float] = []
+        failures: Counter = Counter()
+
+        async def _timed(i: int):
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    await op(i)
+                except Exception as e:
+                    failures[type(e).__name__] += 1
+                    return
+                durations.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(_timed(i) for i in iterations))
+        await self.async_storage.aclose()
+        return durations, failures
+
+
+def print_report(results: List[dict]) -> None:
+    print(
+        f"{'parcours':<11} | {'ops':>5} | {'échecs':>6} | {'ops/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | "
+        f"{'p99 ms':>8} | {'appels/op':>9} | {'requêtes/op':>11} | {'erreurs inj.':>12} | {'reprises':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['scenario']:<11} | {r['ops']:>5} | {sum(r['failures'].values()):>6} | {r['ops_per_s']:>7.1f} | "
+            f"{r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f} | {r['p99_ms']:>8.1f} | {r['calls_per_op']:>9.2f} | "
+            f"{r['requests_per_op']:>11.2f} | "
+            f"{r['injected_errors']:>12} | {r['retries']:>8}"
+        )
+    print()
+    for r in results:
+        detail = ", ".join(f"{k}={v}" for k, v in r["calls"].items())
+        print(f"{r['scenario']:<11} appels/op : {detail}")
+        if r["failures"]:
+            print(f"{'':<11} échecs    : {r['failures']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="base jetable (cache des dossiers, réglages)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="latence par requête du serveur (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 503])
+    parser.add_argument("--doc-kb", type=int, default=64, help="taille du DOCX uploadé (Ko)")
+    parser.add_argument("--annexes", type=int, default=3, help="annexes PDF par validation")
+    parser.add_argument("--rate-limit", type=float, help="remplace DRIVE_RATE_LIMIT (requêtes/s)")
+    parser.add_argument("--sharing-mode", choices=("file", "folder"), help="remplace DRIVE_SHARING_MODE")
+    parser.add_argument("--permission-batch-delay", type=float, help="remplace DRIVE_PERMISSION_BATCH_DELAY (s)")
+    parser.add_argument("--json", action="store_true", help="résultats au format JSON")
+    args = parser.parse_args()
+
+    standin = DriveStandIn(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_statuses=args.error_statuses
+    ).start()
+
+    # Réglages lus à l'import des modules de l'application
+    os.environ["SQLALCHEMY_DATABASE_URI"] = args.database_url
+    os.environ["STORAGE_BACKEND"] = "drive"
+    os.environ["DRIVE_API_ENDPOINT"] = standin.url
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="dip-easy-bench-")
+    if args.rate_limit:
+        os.environ["DRIVE_RATE_LIMIT"] = str(args.rate_limit)
+        os.environ["DRIVE_RATE_BURST"] = str(max(1, int(args.rate_limit * 2)))
+    if args.sharing_mode:
+        os.environ["DRIVE_SHARING_MODE"] = args.sharing_mode
+    if args.permission_batch_delay is not None:
+        os.environ["DRIVE_PERMISSION_BATCH_DELAY"] = str(args.permission_batch_delay)
+
+    from app import crud
+    from app.db.base import Base, SessionLocal, engine
+    from app.models import DriveFolder, Setting
+
+    Base.metadata.create_all(bind=engine, tables=[Setting.__table__, DriveFolder.__table__])
+    db = SessionLocal()
+    try:
+        crud.setting.set_value(db, "drive_credentials", json.dumps(service_account_info(f"{standin.url}/token")))
+    finally:
+        db.close()
+
+    try:
+        bench = Bench(args, standin)
+        bench.setup()
+        results: Dict[str, dict] = {}
+        for name in args.scenarios:
+            results[name] = bench.run(name)
+    finally:
+        standin.stop()
+
+    if args.json:
+        print(json.dumps(list(results.values()), indent=2))
+    else:
+        print(
+            f"Serveur : latence {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f}), "
+            f"erreurs {args.error_rate:.1%} {args.error_statuses} ; concurrence {args.concurrency}"
+        )
+        print_report(list(results.values()))
+
+
+if __name__ == "__main__":
+    main()
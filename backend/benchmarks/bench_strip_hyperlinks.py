@@ -0,0 +1,94 @@
+"""Benchmark de ``strip_hyperlinks`` (chemin de conversion PDF).
+
+Compare l'implémentation d'origine (recherche du parent de chaque lien en
+parcourant tout l'arbre ElementTree, rezippage complet) à l'implémentation
+actuelle (``getparent()`` lxml, entrées inchangées recopiées brutes) pour
+10, 1 000 et 10 000 hyperliens.
+
+L'implémentation d'origine est quadratique : au-delà de ``--legacy-max``
+liens elle n'est pas exécutée.
+
+Usage (depuis ``backend/``) ::
+
+    python -m benchmarks.bench_strip_hyperlinks --links 10 1000 10000
+"""
+import argparse
+import io
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+
+from docx import Document  # type: ignore
+
+from app.utils.docx_links import NAMESPACES, _remove_hyperlink_rels, link_urls, strip_hyperlinks
+
+
+def _legacy_remove_hyperlink_elements(xml_data: bytes) -> bytes:
+    tree = ET.fromstring(xml_data)
+    for hlink in list(tree.findall(".//w:hyperlink", NAMESPACES)):
+        parent = None
+        for p in tree.iter():
+            if hlink in list(p):
+                parent = p
+                break
+        if parent is not None:
+            parent.remove(hlink)
+    return ET.tostring(tree, encoding="utf-8")
+
+
+def _legacy_strip_hyperlinks(docx_bytes: bytes) -> bytes:
+    out_mem = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zin:
+        with zipfile.ZipFile(out_mem, "w", compression=zipfile.ZIP_DEFLATED) as zout:
+            for item in zin.infolist():
+                data = zin.read(item.filename)
+                if item.filename == "word/document.xml":
+                    data = _legacy_remove_hyperlink_elements(data)
+                elif item.filename == "word/_rels/document.xml.rels":
+                    data = _remove_hyperlink_rels(data)
+                zout.writestr(item, data)
+    return out_mem.getvalue()
+
+
+def build_document(links: int) -> bytes:
+    doc = Document()
+    for i in range(links):
+        p = doc.add_paragraph(f"Annexe {i} : ")
+        p.add_run(f"https://example.com/annexe/{i}")
+        doc.add_paragraph("Paragraphe de texte courant sans lien.")
+    link_urls(doc)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def timed(fn, data: bytes, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return durations[len(durations) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max", type=int, default=1000, help="taille max pour l'implémentation d'origine")
+    args = parser.parse_args()
+
+    print(f"{'liens':>7} | {'taille (Ko)':>11} | {'origine (s)':>11} | {'actuel (s)':>10}")
+    for links in args.links:
+        data = build_document(links)
+        current = timed(strip_hyperlinks, data, args.repeat)
+        if links <= args.legacy_max:
+            legacy = f"{timed(_legacy_strip_hyperlinks, data, args.repeat):>11.4f}"
+        else:
+            legacy = f"{'ignoré':>11}"
+        print(f"{links:>7} | {len(data) / 1024:>11.0f} | {legacy} | {current:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""Serveur local imitant le sous-ensemble de l'API Drive v3 utilisé par l'application.
+
+Permet de charger les parcours Drive (création de produit, génération,
+validation) sans consommer les quotas Google. Implémente :
+
+* ``files.list`` (requêtes ``name=`` / ``in parents`` / ``mimeType=``),
+  ``files.create`` (métadonnées seules, multipart et resumable),
+  ``files.get`` (métadonnées et ``alt=media`` avec ``Range``),
+  ``files.export``, ``files.copy``, ``files.delete`` (récursif pour un
+  dossier) ;
+* ``permissions.create`` ;
+* les requêtes batch (``POST /batch/drive/v3``) regroupant ces appels ;
+* l'échange de jeton OAuth des comptes de service (``POST /token``).
+
+Comme Drive, seuls les fichiers Google (``application/vnd.google-apps.*``)
+sont exportables : un DOCX passe par ``copy`` vers un Google Doc puis
+``export``. L'export renvoie un PDF d'une page.
+
+``latency`` (+ ``jitter``) est ajouté à chaque requête ; ``error_rate`` fait
+échouer une fraction des requêtes avec l'un des ``error_statuses`` (429,
+403 ``rateLimitExceeded``, 500, 503) et le corps d'erreur Drive correspondant.
+Dans un batch, la latence compte une fois et les erreurs s'appliquent à
+chaque sous-requête, comme sur Drive. ``thumbnail_delay`` imite la
+génération différée des miniatures : ``thumbnailLink`` est absent des
+métadonnées d'un fichier pendant ce délai après sa création.
+
+Usage autonome (depuis ``backend/``) ::
+
+    python -m benchmarks.drive_standin --port 8765 --latency 0.05 --error-rate 0.02
+
+puis ``DRIVE_API_ENDPOINT=http://127.0.0.1:8765`` et un compte de service
+dont ``token_uri`` vaut ``http://127.0.0.1:8765/token``.
+"""
+import argparse
+import email
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+GOOGLE_DOC_MIME = "application/vnd.google-apps.document"
+
+ERROR_REASONS = {
+    403: "rateLimitExceeded",
+    429: "rateLimitExceeded",
+    500: "backendError",
+    503: "backendError",
+}
+
+_FILE_RX = re.compile(r"^/drive/v3/files/([^/]+)(/export|/copy|/permissions)?$")
+_Q_NAME = re.compile(r"name='((?:\\'|[^'])*)'")
+_Q_PARENT = re.compile(r"'([^']+)' in parents")
+_Q_MIME = re.compile(r"mimeType='([^']+)'")
+
+
+class _SubRequest:
+    """Sous-requête d'un batch : la réponse est capturée au lieu d'être envoyée."""
+
+    def __init__(self, command: str, headers):
+        self.command = command
+        self.headers = headers
+        self.status = 500
+        self.response_headers: list[tuple[str, str]] = []
+        self.wfile = io.BytesIO()
+
+    def send_response(self, status: int) -> None:
+        self.status = status
+
+    def send_header(self, key: str, value: str) -> None:
+        self.response_headers.append((key, value))
+
+    def end_headers(self) -> None:
+        pass
+
+    def serialize(self) -> str:
+        lines = [f"HTTP/1.1 {self.status} {HTTPStatus(self.status).phrase}"]
+        lines += [f"{key}: {value}" for key, value in self.response_headers]
+        return "\r\n".join(lines) + "\r\n\r\n" + self.wfile.getvalue().decode("utf-8")
+
+
+def _one_page_pdf() -> bytes:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=595, height=842)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+class DriveStandIn:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Sequence[int] = (429, 503),
+        seed: Optional[int] = None,
+        thumbnail_delay: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.thumbnail_delay = thumbnail_delay
+        self.files: Dict[str, dict] = {"root": {"id": "root", "name": "root", "mimeType": FOLDER_MIME, "parents": []}}
+        self.sessions: Dict[str, dict] = {}
+        self.calls: Counter = Counter()  # opérations d'API (quota), sous-requêtes de batch comprises
+        self.errors: Counter = Counter()
+        self.requests = 0  # allers-retours HTTP (hors jeton)
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._pdf = _one_page_pdf()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "DriveStandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="drive-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            self.requests = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "errors": dict(self.errors),
+                "requests": self.requests,
+                "files": len(self.files) - 1,
+            }
+
+    # ------------------------------------------------------------------
+    # Stockage
+    # ------------------------------------------------------------------
+
+    def _create(self, metadata: dict, content: Optional[bytes] = None, mime_type: Optional[str] = None) -> dict:
+        file_id = uuid.uuid4().hex
+        entry = {
+            "id": file_id,
+            "name": metadata.get("name", "Untitled"),
+            "mimeType": metadata.get("mimeType") or mime_type or "application/octet-stream",
+            "parents": metadata.get("parents") or ["root"],
+            "content": content,
+            "created": time.monotonic(),
+        }
+        if content is not None:
+            entry["md5Checksum"] = hashlib.md5(content).hexdigest()
+            entry["size"] = str(len(content))
+        with self._lock:
+            self.files[file_id] = entry
+        return entry
+
+    def _list(self, q: str) -> list:
+        name = _Q_NAME.search(q)
+        parent = _Q_PARENT.search(q)
+        mime = _Q_MIME.search(q)
+        with self._lock:
+            entries = list(self.files.values())
+        result = []
+        for entry in entries:
+            if entry["id"] == "root":
+                continue
+            if name and entry["name"] != name.group(1).replace("\\'", "'"):
+                continue
+            if parent and parent.group(1) not in entry["parents"]:
+                continue
+            if mime and entry["mimeType"] != mime.group(1):
+                continue
+            result.append(entry)
+        return result
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                standin._dispatch(self, "GET")
+
+            def do_POST(self):
+                standin._dispatch(self, "POST")
+
+            def do_PUT(self):
+                standin._dispatch(self, "PUT")
+
+            def do_DELETE(self):
+                standin._dispatch(self, "DELETE")
+
+        return Handler
+
+    @staticmethod
+    def _send(handler, status: int, body: bytes = b"", content_type: str = "application/json", headers=()) -> None:
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for key, value in headers:
+            handler.send_header(key, value)
+        handler.end_headers()
+        if body and handler.command != "HEAD":
+            handler.wfile.write(body)
+
+    def _json(self, handler, status: int, payload) -> None:
+        self._send(handler, status, json.dumps(payload).encode("utf-8"))
+
+    def _error(self, handler, status: int, reason: str) -> None:
+        self._json(handler, status, {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}})
+
+    def _dispatch(self, handler, method: str) -> None:
+        url = urlparse(handler.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        operation = self._operation(method, url.path, params)
+        status = self._account(operation)
+        with self._lock:
+            self.requests += operation != "token"
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        self._run(handler, operation, url.path, params, body, status)
+
+    def _account(self, operation: str) -> Optional[int]:
+        """Compte l'appel ; renvoie le statut d'erreur à injecter, le cas échéant."""
+        with self._lock:
+            if operation != "batch":
+                self.calls[operation] += 1
+            inject = operation not in ("token", "batch") and self.error_rate > 0 and self._random.random() < self.error_rate
+            if not inject:
+                return None
+            self.errors[operation] += 1
+            return self._random.choice(self.error_statuses)
+
+    def _run(self, handler, operation: str, path: str, params: dict, body: bytes, status: Optional[int]) -> None:
+        if status is not None:
+            return self._error(handler, status, ERROR_REASONS.get(status, "backendError"))
+        try:
+            getattr(self, "_op_" + operation.replace(".", "_"))(handler, path, params, body)
+        except KeyError:
+            self._error(handler, 404, "notFound")
+
+    @staticmethod
+    def _operation(method: str, path: str, params: dict) -> str:
+        if path == "/token":
+            return "token"
+        if path.startswith("/batch/"):
+            return "batch"
+        if path.startswith("/upload/drive/v3/files"):
+            return "files.create_media" if method == "POST" else "files.upload_chunk"
+        if path == "/drive/v3/files":
+            return "files.list" if method == "GET" else "files.create"
+        match = _FILE_RX.match(path)
+        if not match:
+            return "unknown"
+        suffix = match.group(2)
+        if suffix == "/export":
+            return "files.export"
+        if suffix == "/copy":
+            return "files.copy"
+        if suffix == "/permissions":
+            return "permissions.create"
+        if method == "DELETE":
+            return "files.delete"
+        return "files.get_media" if params.get("alt") == "media" else "files.get"
+
+    # -- opérations ----------------------------------------------------
+
+    def _op_unknown(self, handler, path, params, body):
+        self._error(handler, 404, "notFound")
+
+    def _op_token(self, handler, path, params, body):
+        self._json(handler, 200, {"access_token": uuid.uuid4().hex, "expires_in": 3600, "token_type": "Bearer"})
+
+    def _op_files_list(self, handler, path, params, body):
+        files = [{"id": f["id"], "name": f["name"]} for f in self._list(params.get("q", ""))]
+        self._json(handler, 200, {"files": files})
+
+    def _op_files_create(self, handler, path, params, body):
+        entry = self._create(json.loads(body or b"{}"))
+        self._json(handler, 200, {"id": entry["id"]})
+
+    def _op_files_create_media(self, handler, path, params, body):
+        upload_type = params.get("uploadType")
+        if upload_type == "resumable":
+            session = uuid.uuid4().hex
+            self.sessions[session] = {
+                "metadata": json.loads(body or b"{}"),
+                "mime_type": handler.headers.get("X-Upload-Content-Type"),
+                "size": int(handler.headers.get("X-Upload-Content-Length") or 0),
+                "data": bytearray(),
+            }
+            location = f"{self.url}/upload/drive/v3/files?uploadType=resumable&upload_id={session}"
+            return self._send(handler, 200, b"", headers=[("Location", location)])
+        if upload_type == "multipart":
+            metadata, mime_type, content = self._parse_multipart(handler.headers.get("Content-Type", ""), body)
+        else:
+            metadata, mime_type, content = {}, handler.headers.get("Content-Type"), body
+        entry = self._create(metadata, content, mime_type)
+        self._json(handler, 200, {"id": entry["id"], "md5Checksum": entry.get("md5Checksum")})
+
+    def _op_files_upload_chunk(self, handler, path, params, body):
+        session = self.sessions[params["upload_id"]]
+        match = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", handler.headers.get("Content-Range", ""))
+        if match:
+            start = int(match.group(1))
+            if start <= len(session["data"]):
+                del session["data"][start:]
+                session["data"] += body
+        if len(session["data"]) >= session["size"]:
+            self.sessions.pop(params["upload_id"], None)
+            entry = self._create(session["metadata"], bytes(session["data"]), session["mime_type"])
+            return self._json(handler, 200, {"id": entry["id"], "md5Checksum": entry.get("md5Checksum")})
+        headers = [("Range", f"bytes=0-{len(session['data']) - 1}")] if session["data"] else []
+        self._send(handler, 308, b"", headers=headers)
+
+    def _op_files_get(self, handler, path, params, body):
+        entry = self.files[_FILE_RX.match(path).group(1)]
+        meta = {k: v for k, v in entry.items() if k not in ("content", "created")}
+        if time.monotonic() - entry.get("created", 0) >= self.thumbnail_delay:
+            meta["thumbnailLink"] = f"{self.url}/thumbnails/{entry['id']}"
+        meta["webViewLink"] = f"{self.url}/view/{entry['id']}"
+        self._json(handler, 200, meta)
+
+    def _op_files_get_media(self, handler, path, params, body):
+        entry = self.files[_FILE_RX.match(path).group(1)]
+        content = entry.get("content")
+        if content is None:
+            return self._error(handler, 403, "fileNotDownloadable")
+        match = re.match(r"bytes=(\d+)-(\d*)", handler.headers.get("Range", ""))
+        if not match:
+            return self._send(handler, 200, content, entry["mimeType"])
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(content) - 1), len(content) - 1)
+        headers = [("Content-Range", f"bytes {start}-{end}/{len(content)}")]
+        self._send(handler, 206, content[start : end + 1], entry["mimeType"], headers)
+
+    def _op_files_export(self, handler, path, params, body):
+        entry = self.files[_FILE_RX.match(path).group(1)]
+        if not entry["mimeType"].startswith("application/vnd.google-apps."):
+            return self._error(handler, 403, "fileNotExportable")
+        self._send(handler, 200, self._pdf, "application/pdf")
+
+    def _op_files_copy(self, handler, path, params, body):
+        source = self.files[_FILE_RX.match(path).group(1)]
+        metadata = json.loads(body or b"{}")
+        mime_type = metadata.get("mimeType") or source["mimeType"]
+        content = None if mime_type.startswith("application/vnd.google-apps.") else source.get("content")
+        entry = self._create({"name": source["name"], "parents": source["parents"], "mimeType": mime_type}, content)
+        self._json(handler, 200, {"id": entry["id"]})
+
+    def _op_files_delete(self, handler, path, params, body):
+        with self._lock:
+            pending = [_FILE_RX.match(path).group(1)]
+            del self.files[pending[0]]
+            # Comme Drive, supprimer un dossier supprime son contenu
+            while pending:
+                parent = pending.pop()
+                children = [f["id"] for f in self.files.values() if parent in f["parents"]]
+                for child in children:
+                    del self.files[child]
+                pending += children
+        self._send(handler, 204)
+
+    def _op_permissions_create(self, handler, path, params, body):
+        self.files[_FILE_RX.match(path).group(1)]
+        self._json(handler, 200, {"id": "anyoneWithLink"})
+
+    def _op_batch(self, handler, path, params, body):
+        boundary = re.search(r'boundary="?([^";]+)"?', handler.headers.get("Content-Type", "")).group(1)
+        parts = [p for p in body.split(b"--" + boundary.encode("ascii")) if p.strip() not in (b"", b"--")]
+        responses = []
+        for part in parts:
+            head, inner = re.split(rb"\r?\n\r?\n", part.lstrip(b"\r\n"), maxsplit=1)
+            head = re.sub(rb"\r?\n(?=[ \t])", b"", head)  # en-têtes repliés
+            content_id = re.search(rb"content-id:\s*<([^>\r\n]+)>", head, re.I).group(1).decode("ascii")
+            request_line, _, rest = inner.partition(b"\n")
+            method, target = request_line.decode("ascii").split(" ")[:2]
+            inner_head, *inner_body = re.split(rb"\r?\n\r?\n", rest, maxsplit=1)
+            sub = _SubRequest(method, email.message_from_bytes(inner_head))
+            url = urlparse(target)
+            sub_params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            operation = self._operation(method, url.path, sub_params)
+            sub_body = inner_body[0].rstrip(b"\r\n") if inner_body else b""
+            self._run(sub, operation, url.path, sub_params, sub_body, self._account(operation))
+            responses.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n{sub.serialize()}\r\n"
+            )
+        payload = ("".join(responses) + f"--{boundary}--\r\n").encode("utf-8")
+        self._send(handler, 200, payload, content_type=f"multipart/mixed; boundary={boundary}")
+
+    @staticmethod
+    def _parse_multipart(content_type: str, body: bytes) -> tuple[dict, Optional[str], bytes]:
+        boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode("ascii")
+        parts = [p for p in body.split(b"--" + boundary) if p.strip() not in (b"", b"--")]
+        metadata, mime_type, content = {}, None, b""
+        for i, part in enumerate(parts):
+            # googleapiclient sépare par "\n", httpx et les navigateurs par "\r\n"
+            head, payload = re.split(rb"\r?\n\r?\n", part.lstrip(b"\r\n"), maxsplit=1)
+            payload = re.sub(rb"\r?\n\Z", b"", payload)
+            if i == 0:
+                metadata = json.loads(payload or b"{}")
+            else:
+                match = re.search(rb"content-type:\s*([^\r\n]+)", head, re.I)
+                mime_type = match.group(1).decode("ascii").strip() if match else None
+                content = payload
+        return metadata, mime_type, content
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence ajoutée par requête (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latence aléatoire supplémentaire max (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction de requêtes en erreur")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 503])
+    parser.add_argument("--thumbnail-delay", type=float, default=0.0, help="délai de génération des miniatures (s)")
+    args = parser.parse_args()
+
+    standin = DriveStandIn(
+        args.host,
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_statuses=args.error_statuses,
+        thumbnail_delay=args.thumbnail_delay,
+    )
+    print(f"API Drive de substitution sur {standin.url} (token_uri: {standin.url}/token)")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import sqltypes
+
+from app.db.base import Base
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    """Base SQLite en mémoire avec toutes les tables, partagée entre threads.
+
+    Les UUID y sont stockés en texte (forme attendue par ``CRUDBase.get``) et
+    les fonctions ``uuid_generate_v4``/``gen_random_uuid`` de PostgreSQL sont
+    fournies pour les valeurs par défaut des clés.
+    """
+    def _bind_processor(self, dialect):
+        return lambda value: None if value is None else str(uuid.UUID(str(value)))
+
+    monkeypatch.setattr(sqltypes.Uuid, "bind_processor", _bind_processor)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def _functions(conn, _record):
+        for name in ("uuid_generate_v4", "gen_random_uuid"):
+            conn.create_function(name, 0, lambda: str(uuid.uuid4()))
+
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
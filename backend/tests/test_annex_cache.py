@@ -0,0 +1,77 @@
+import hashlib
+from io import BytesIO
+from types import SimpleNamespace
+
+from pypdf import PdfWriter
+
+from app.services import annex_cache as annex_module
+from app.services.annex_cache import AnnexCache
+from app.services.pdf_merge import merge_annexes
+
+
+def _pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=100, height=100)
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+class _FakeDrive:
+    def __init__(self, files):
+        self.files = files
+        self.downloads = 0
+
+    def get_md5(self, file_id):
+        return hashlib.md5(self.files[file_id]).hexdigest() if file_id in self.files else None
+
+    def download(self, file_id):
+        self.downloads += 1
+        return self.files.get(file_id, b"")
+
+
+def test_fetch_caches_parsed_annexes_by_checksum(monkeypatch):
+    drive = _FakeDrive({"f1": _pdf(1), "f2": _pdf(2)})
+    monkeypatch.setattr(annex_module, "storage", drive)
+    cache = AnnexCache(max_bytes=10 * 1024 * 1024)
+    attachments = [
+        SimpleNamespace(alias="A", file_name="a.pdf", drive_file_id="f1"),
+        SimpleNamespace(alias=None, file_name="b.pdf", drive_file_id="f2"),
+        SimpleNamespace(alias="missing", file_name="c.pdf", drive_file_id="absent"),
+    ]
+
+    annexes = cache.fetch(attachments)
+    assert set(annexes) == {"A", "b.pdf"}
+    assert len(annexes["b.pdf"].reader.pages) == 2
+
+    again = cache.fetch(attachments)
+    assert again["A"] is annexes["A"]
+    assert drive.downloads == 4  # seul le fichier absent est redemandé
+
+    # Fichier modifié sur Drive : nouveau md5, nouvelle analyse
+    drive.files["f1"] = _pdf(3)
+    assert len(cache.fetch(attachments)["A"].reader.pages) == 3
+
+
+def test_lru_respects_byte_budget(monkeypatch):
+    data = _pdf(1)
+    drive = _FakeDrive({"f1": data, "f2": data})
+    monkeypatch.setattr(annex_module, "storage", drive)
+    cache = AnnexCache(max_bytes=len(data))
+    cache.load("f1")
+    cache.load("f2")
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_merge_without_markers_keeps_document(monkeypatch):
+    drive = _FakeDrive({"f1": _pdf(2)})
+    monkeypatch.setattr(annex_module, "storage", drive)
+    annexes = AnnexCache(max_bytes=1024 * 1024).fetch(
+        [SimpleNamespace(alias="A", file_name="a.pdf", drive_file_id="f1")]
+    )
+    from pypdf import PdfReader
+
+    merged = merge_annexes(_pdf(1), annexes)
+    assert len(PdfReader(BytesIO(merged)).pages) == 1
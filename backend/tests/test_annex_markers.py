@@ -0,0 +1,74 @@
+from io import BytesIO
+from types import SimpleNamespace
+
+from docx import Document
+from docx.oxml.ns import qn
+from pypdf import PdfReader, PdfWriter
+
+from app.services.annex_cache import ParsedAnnex
+from app.services.pdf_merge import merge_annexes
+from app.utils.annex_markers import add_annex_bookmarks, annex_pages, annex_pages_from_destinations, bookmark_name
+
+
+def _pdf(sizes, destinations=()):
+    """PDF dont la page i mesure ``sizes[i]`` points de large (pour reconnaître les pages)."""
+    writer = PdfWriter()
+    for width in sizes:
+        writer.add_blank_page(width=width, height=100)
+    for name, page in destinations:
+        writer.add_named_destination(name, page)
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def _widths(pdf_bytes):
+    return [int(p.mediabox.width) for p in PdfReader(BytesIO(pdf_bytes)).pages]
+
+
+def test_add_annex_bookmarks_marks_paragraphs():
+    doc = Document()
+    doc.add_paragraph("Intro")
+    doc.add_paragraph("Voir [[ANNEXE:Fiche sécurité]]")
+    p = doc.add_paragraph("[[ANNEXE:")
+    p.add_run("Fiche sécurité]] et [[ANNEXE:B]]")
+
+    assert add_annex_bookmarks(doc) == 3
+    names = [el.get(qn("w:name")) for el in doc.element.body.iter(qn("w:bookmarkStart"))]
+    base = bookmark_name("Fiche sécurité")
+    assert names == [base, base + "_2", bookmark_name("B")]
+    assert all(len(n) <= 40 for n in names)
+
+
+def test_add_annex_bookmarks_marks_table_cells():
+    doc = Document()
+    cell = doc.add_table(rows=1, cols=2).cell(0, 1)
+    cell.text = "Voir [[ANNEXE:A]]"
+    cell.add_table(rows=1, cols=1).cell(0, 0).text = "[[ANNEXE:B]]"
+
+    assert add_annex_bookmarks(doc) == 2
+    names = [el.get(qn("w:name")) for el in doc.element.body.iter(qn("w:bookmarkStart"))]
+    assert names == [bookmark_name("A"), bookmark_name("B")]
+
+
+def test_merge_uses_named_destinations():
+    main = _pdf([101, 102, 103], destinations=[(bookmark_name("A"), 0), (bookmark_name("B") + "_2", 2)])
+    annexes = {"A": ParsedAnnex(_pdf([201, 202])), "B": ParsedAnnex(_pdf([301]))}
+    assert _widths(merge_annexes(main, annexes)) == [101, 201, 202, 102, 103, 301]
+
+
+def test_destinations_absent_means_text_fallback():
+    reader = PdfReader(BytesIO(_pdf([101])))
+    assert annex_pages_from_destinations(reader, ["A"]) is None
+    # Pas de marqueur dans le texte : document inchangé
+    annexes = {"A": ParsedAnnex(_pdf([201]))}
+    assert _widths(merge_annexes(_pdf([101]), annexes)) == [101]
+
+
+def test_alias_without_destination_falls_back_to_text():
+    reader = PdfReader(BytesIO(_pdf([101, 102, 103], destinations=[(bookmark_name("A"), 2)])))
+    texts = ["", "Voir [[ANNEXE:B]]", "[[ANNEXE:A]]"]
+    for page, text in zip(reader.pages, texts):
+        page.extract_text = lambda text=text: text
+
+    assert annex_pages(reader, ["A", "B", "C"]) == {2: ["A"], 1: ["B"]}
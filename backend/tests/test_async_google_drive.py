@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+
+import httpx
+import pytest
+
+from app import models
+from app.services import async_google_drive, executors, generation_service
+from app.services.async_google_drive import AsyncGoogleDriveService
+from app.services.drive_guard import CircuitBreaker, DriveError, DriveGuard, DriveUnavailableError, TokenBucket
+from app.services.drive_sharing import drive_sharing
+from app.services.drive_upload import ChecksumMismatchError
+
+CHUNK = 256 * 1024
+
+
+class _Credentials:
+    valid = True
+
+    def apply(self, headers):
+        headers["authorization"] = "Bearer token"
+
+
+class _FakeDrive:
+    """API Drive v3 minimale : upload resumable (avec 308) et multipart, lecture, partage."""
+
+    def __init__(self, md5=None, fail=()):
+        self.md5 = md5
+        self.fail = list(fail)  # statuts renvoyés, dans l'ordre, avant de répondre normalement
+        self.received = b""
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append((request.method, request.url.path, request.headers.get("content-range")))
+        if self.fail:
+            return httpx.Response(self.fail.pop(0), json={"error": {"errors": [{"reason": "backendError"}]}})
+        path = request.url.path
+        if request.method == "POST" and path == "/upload/drive/v3/files":
+            if request.url.params["uploadType"] == "resumable":
+                return httpx.Response(200, headers={"Location": "https://drive.test/session/1"})
+            return httpx.Response(200, json={"id": "small", "md5Checksum": self.md5})
+        if request.method == "PUT" and path == "/session/1":
+            size = int(request.headers["content-range"].rsplit("/", 1)[1])
+            if request.content:
+                self.received += request.content
+            if len(self.received) < size:
+                return httpx.Response(308, headers={"Range": f"bytes=0-{len(self.received) - 1}"})
+            md5 = self.md5 or hashlib.md5(self.received).hexdigest()
+            return httpx.Response(200, json={"id": "big", "md5Checksum": md5})
+        if request.method == "GET" and path.startswith("/drive/v3/files/"):
+            if path.endswith("/missing"):
+                return httpx.Response(404)
+            return httpx.Response(200, content=b"contenu")
+        if path.endswith("/permissions"):
+            return httpx.Response(200, json={"id": "anyoneWithLink"})
+        return httpx.Response(400)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    guard = DriveGuard(
+        TokenBucket(rate=1000, burst=1000),
+        CircuitBreaker(threshold=100, reset_timeout=60),
+        max_retries=2,
+        backoff_base=0,
+        backoff_max=0,
+    )
+    monkeypatch.setattr(async_google_drive, "drive_guard", guard)
+    monkeypatch.setattr(async_google_drive.drive_client_pool, "credentials", lambda user_id=None: _Credentials())
+    monkeypatch.setattr(async_google_drive.settings, "DRIVE_RESUMABLE_THRESHOLD", CHUNK)
+    monkeypatch.setattr(async_google_drive.settings, "DRIVE_UPLOAD_CHUNK_SIZE", CHUNK)
+    monkeypatch.setattr(drive_sharing, "mode", "file")
+    monkeypatch.setattr(drive_sharing, "batch_delay", 0)
+
+    def _service(fake):
+        service = AsyncGoogleDriveService(base_url="https://drive.test")
+        service._http = lambda: httpx.AsyncClient(transport=httpx.MockTransport(fake))
+        return service
+
+    return _service
+
+
+def test_resumable_upload_follows_308_and_resumes_after_error(drive):
+    data = os.urandom(2 * CHUNK + 1000)
+    # Le deuxième morceau tombe sur un 503 : Drive est interrogé puis l'envoi reprend
+    fake = _FakeDrive()
+    service = drive(fake)
+    puts = []
+
+    def _handler(request):
+        if request.method == "PUT" and request.content:
+            puts.append(request.headers["content-range"])
+            if len(puts) == 2:
+                return httpx.Response(503)
+        return fake(request)
+
+    service._http = lambda: httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+    assert asyncio.run(service.upload(data, "gros.docx", parent_id="folder")) == "big"
+
+    assert fake.received == data
+    assert puts == [
+        f"bytes 0-{CHUNK - 1}/{len(data)}",
+        f"bytes {CHUNK}-{2 * CHUNK - 1}/{len(data)}",  # 503
+        f"bytes {CHUNK}-{2 * CHUNK - 1}/{len(data)}",
+        f"bytes {2 * CHUNK}-{len(data) - 1}/{len(data)}",
+    ]
+    assert ("PUT", "/session/1", f"bytes */{len(data)}") in fake.requests
+
+
+def test_resumable_upload_checks_md5(drive):
+    service = drive(_FakeDrive(md5="0" * 32))
+    with pytest.raises(ChecksumMismatchError) as exc:
+        asyncio.run(service._create_file(_Credentials(), os.urandom(CHUNK + 1), "gros.docx", "application/pdf", None))
+    assert exc.value.file_id == "big"
+
+
+def test_errors_map_onto_drive_guard_errors(drive):
+    # 5xx persistants : Drive indisponible (503 côté API)
+    with pytest.raises(DriveUnavailableError):
+        asyncio.run(drive(_FakeDrive(fail=[500, 500, 500])).download("f1"))
+    # Erreur passagère puis succès : rejouée
+    assert asyncio.run(drive(_FakeDrive(fail=[503])).download("f1")) == b"contenu"
+    # 404 : erreur définitive, pas de reprise
+    fake = _FakeDrive()
+    assert asyncio.run(drive(fake).download("missing")) == b""
+    assert len(fake.requests) == 1
+    # Refus Drive (403) pendant un upload : DriveError (502), pas d'ID factice
+    with pytest.raises(DriveError) as exc:
+        asyncio.run(drive(_FakeDrive(fail=[403])).upload(b"petit", "doc.docx", parent_id="folder"))
+    assert not isinstance(exc.value, DriveUnavailableError)
+
+
+def test_simple_upload_is_not_resent_when_drive_already_has_it(drive):
+    md5 = hashlib.md5(b"petit").hexdigest()
+    fake = _FakeDrive(md5=md5, fail=[503])
+    service = drive(fake)
+
+    def _handler(request):
+        if request.method == "GET" and request.url.path == "/drive/v3/files":
+            query = request.url.params["q"]
+            assert "dipUploadToken" in query
+            return httpx.Response(200, json={"files": [{"id": "created", "md5Checksum": md5}]})
+        return fake(request)
+
+    service._http = lambda: httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+    assert asyncio.run(service.upload(b"petit", "doc.docx", parent_id="folder")) == "created"
+    assert [r for r in fake.requests if r[1] == "/upload/drive/v3/files"] == [("POST", "/upload/drive/v3/files", None)]
+
+
+def test_folder_cache_miss_is_resolved_by_sync_service_on_io_pool(drive, monkeypatch):
+    from app.crud.crud_setting import setting as crud_setting
+    from app.services.folder_cache import folder_cache
+
+    cached = {("root", ("C", "P")): "cached-folder"}
+    threads = []
+    monkeypatch.setattr(crud_setting, "get_cached_value", lambda key, db=None: "root")
+    monkeypatch.setattr(folder_cache, "get", lambda root_id, path: cached.get((root_id, tuple(path))))
+
+    def _ensure_folder(path):
+        threads.append(threading.current_thread().name)
+        return "created-folder"
+
+    monkeypatch.setattr(async_google_drive.google_drive_service, "ensure_folder", _ensure_folder)
+    service = drive(_FakeDrive())
+
+    assert asyncio.run(service.ensure_folder(["C", "P"])) == "cached-folder"
+    assert threads == []
+    assert asyncio.run(service.ensure_folder(["C", "Q"])) == "created-folder"
+    assert len(threads) == 1 and threads[0].startswith("dip-io")
+
+
+def test_render_and_upload_async(drive, monkeypatch):
+    md5 = hashlib.md5(b"rendu").hexdigest()
+    fake = _FakeDrive(md5=md5)
+    service = drive(fake)
+    folders = []
+
+    async def _ensure_folder(path):
+        folders.append(path)
+        return "formula-folder"
+
+    def _submit_render(template_bytes, context, cache_key):
+        future = Future()
+        future.set_result(b"rendu")
+        return future
+
+    monkeypatch.setattr(service, "ensure_folder", _ensure_folder)
+    monkeypatch.setattr(generation_service, "async_storage", service)
+    monkeypatch.setattr(generation_service, "download_template", lambda template: b"modele")
+    monkeypatch.setattr(executors, "submit_render", _submit_render)
+    product = models.Product(nom_client="C", nom_produit="P", ref_formule="F1")
+    template = models.Template(name="DIP", version="1", drive_file_id="tpl")
+
+    file_id = asyncio.run(generation_service.render_and_upload_async(template=template, product=product, context={}))
+
+    assert file_id == "small"
+    assert folders == [generation_service.formula_folder_path(product)]
+    upload = next(r for r in fake.requests if r[1] == "/upload/drive/v3/files")
+    assert upload[0] == "POST"
+    assert ("POST", "/drive/v3/files/small/permissions", None) in fake.requests
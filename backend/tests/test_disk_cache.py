@@ -0,0 +1,67 @@
+import os
+
+from app.services.disk_cache import DiskLRUCache
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1024)
+    assert cache.get("a") is None
+    cache.put("a", b"hello", md5="x")
+    assert cache.get("a") == b"hello"
+    assert cache.get_entry("a")["md5"] == "x"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1024)
+    d1 = cache.put("a", b"same bytes")
+    d2 = cache.put("b", b"same bytes")
+    assert d1 == d2
+    assert cache.stats()["bytes"] == len(b"same bytes")
+    cache.discard("a")
+    # Le blob reste référencé par "b"
+    assert cache.get("b") == b"same bytes"
+
+
+def test_lru_eviction_respects_byte_budget(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    cache.get("a")  # "b" devient le moins récemment utilisé
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_index_survives_restart(tmp_path):
+    DiskLRUCache(str(tmp_path), max_bytes=1024).put("a", b"persisted")
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1024)
+    assert cache.get("a") == b"persisted"
+    assert os.path.exists(os.path.join(tmp_path, "index.json"))
+
+
+def test_two_instances_share_index_and_blobs(tmp_path):
+    # Deux workers uvicorn sur le même CACHE_DIR
+    first = DiskLRUCache(str(tmp_path), max_bytes=12)
+    second = DiskLRUCache(str(tmp_path), max_bytes=12)
+    first.put("a", b"shared")
+    second.put("b", b"shared")  # même blob que "a"
+    first.put("c", b"cc")
+
+    # Aucune écriture n'a écrasé l'index de l'autre instance
+    assert second.get("c") == b"cc"
+    assert first.get("b") == b"shared"
+
+    # "a" est retiré par le premier, le blob reste utilisé par "b" du second
+    first.discard("a")
+    assert second.get("b") == b"shared"
+
+    # Lecture de "b" par le second persistée : "c" est le moins récent
+    first.get("c")
+    second.get("b")
+    first.put("d", b"ddddd")
+    assert second.get_entry("c") is None
+    assert first.get("b") == b"shared"
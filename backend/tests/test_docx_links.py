@@ -0,0 +1,67 @@
+import io
+import zipfile
+
+from docx import Document
+from docx.oxml.ns import qn
+
+from app.utils.docx_links import link_urls, make_links_clickable, strip_hyperlinks
+
+
+def _hyperlink_texts(element):
+    return [h.xpath("string(.)") for h in element.iter(qn("w:hyperlink"))]
+
+
+def test_link_urls_wraps_runs_in_place():
+    doc = Document()
+    p = doc.add_paragraph("Voir ")
+    p.add_run("https://example.com/a").bold = True
+    p.add_run(" ensuite")
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "http://example.org/table"
+    doc.sections[0].header.paragraphs[0].text = "https://example.com/header"
+
+    assert link_urls(doc) == 3
+    assert doc.paragraphs[0].text == "Voir https://example.com/a ensuite"
+    assert _hyperlink_texts(doc.element.body) == ["https://example.com/a", "http://example.org/table"]
+    assert _hyperlink_texts(doc.sections[0].header._element) == ["https://example.com/header"]
+    # La mise en forme du run est conservée
+    assert doc.paragraphs[0]._p.xpath(".//w:hyperlink/w:r/w:rPr/w:b")
+
+
+def test_link_urls_reuses_relationship_for_same_url():
+    doc = Document()
+    doc.add_paragraph("https://example.com/same")
+    doc.add_paragraph("https://example.com/same")
+    link_urls(doc)
+    targets = [r.target_ref for r in doc.part.rels.values() if r.is_external]
+    assert targets == ["https://example.com/same"]
+
+
+def test_make_links_clickable_roundtrip():
+    doc = Document()
+    doc.add_paragraph("https://example.com/doc")
+    buf = io.BytesIO()
+    doc.save(buf)
+
+    out = Document(io.BytesIO(make_links_clickable(buf.getvalue())))
+    assert _hyperlink_texts(out.element.body) == ["https://example.com/doc"]
+
+
+def test_strip_hyperlinks_removes_links_and_keeps_other_parts():
+    doc = Document()
+    doc.add_paragraph("Texte ").add_run("https://example.com/strip")
+    doc.add_paragraph("Sans lien")
+    link_urls(doc)
+    buf = io.BytesIO()
+    doc.save(buf)
+
+    stripped = strip_hyperlinks(buf.getvalue())
+
+    with zipfile.ZipFile(io.BytesIO(stripped)) as z:
+        assert z.testzip() is None
+        with zipfile.ZipFile(io.BytesIO(buf.getvalue())) as orig:
+            assert z.namelist() == orig.namelist()
+            assert z.read("word/styles.xml") == orig.read("word/styles.xml")
+    out = Document(io.BytesIO(stripped))
+    assert _hyperlink_texts(out.element.body) == []
+    assert [p.text for p in out.paragraphs] == ["Texte ", "Sans lien"]
+    assert not [r for r in out.part.rels.values() if r.is_external]
@@ -0,0 +1,66 @@
+import io
+
+from docx import Document
+
+from app.services.docx_service import DocxService
+
+
+def _template(body="Produit {{ nom_produit }}", header="Client {{ nom_client }}") -> bytes:
+    doc = Document()
+    doc.add_paragraph(body)
+    doc.sections[0].header.paragraphs[0].text = header
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _texts(docx_bytes: bytes) -> tuple[str, str]:
+    doc = Document(io.BytesIO(docx_bytes))
+    return doc.paragraphs[0].text, doc.sections[0].header.paragraphs[0].text
+
+
+def test_same_key_and_digest_is_a_hit():
+    service = DocxService(cache_size=4)
+    template = _template()
+    service.render(template, {"nom_produit": "A"}, cache_key=("tpl", "1"))
+    service.render(template, {"nom_produit": "B"}, cache_key=("tpl", "1"))
+    stats = service.cache_stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_changed_bytes_under_same_key_are_recompiled():
+    service = DocxService(cache_size=4)
+    service.render(_template(), {"nom_produit": "A"}, cache_key=("tpl", "1"))
+    # Modèle modifié sur Drive sans changement de version
+    rendered = service.render(_template(body="Nouveau {{ nom_produit }}"), {"nom_produit": "A"}, cache_key=("tpl", "1"))
+
+    assert _texts(rendered)[0] == "Nouveau A"
+    stats = service.cache_stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 0, 2)
+
+
+def test_lru_eviction_and_counters():
+    service = DocxService(cache_size=2)
+    templates = {name: _template(body=f"{name} {{{{ nom_produit }}}}") for name in "abc"}
+    service.render(templates["a"], {}, cache_key="a")
+    service.render(templates["b"], {}, cache_key="b")
+    service.render(templates["a"], {}, cache_key="a")  # "b" devient le moins récent
+    service.render(templates["c"], {}, cache_key="c")  # évince "b"
+    service.render(templates["a"], {}, cache_key="a")
+    service.render(templates["b"], {}, cache_key="b")  # recompilé, évince "c"
+
+    assert service.cache_stats() == {"entries": 2, "max_entries": 2, "hits": 2, "misses": 4, "evictions": 2}
+    service.clear_cache()
+    assert service.cache_stats()["entries"] == 0
+
+
+def test_consecutive_renders_do_not_leak_context():
+    service = DocxService(cache_size=4)
+    template = _template()
+    first = service.render(template, {"nom_produit": "Crème", "nom_client": "Acme"}, cache_key=("tpl", "1"))
+    second = service.render(template, {"product": {"nom_produit": "Gel"}}, cache_key=("tpl", "1"))
+
+    assert _texts(first) == ("Produit Crème", "Client Acme")
+    # Ni le corps ni l'en-tête ne gardent les valeurs du rendu précédent
+    assert _texts(second) == ("Produit Gel", "Client ")
+    assert service.cache_stats()["hits"] == 1
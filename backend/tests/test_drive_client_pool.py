@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from google.oauth2 import service_account
+from googleapiclient import discovery
+
+from app import crud
+from app.api.v1.endpoints import admin_drive, drive
+from app.services import drive_client_pool as pool_module
+from app.services import setting_cache as setting_cache_module
+from app.services.drive_client_pool import DriveClientPool
+
+
+@pytest.fixture
+def pool(db, session_factory, monkeypatch):
+    monkeypatch.setattr(setting_cache_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(
+        service_account.Credentials,
+        "from_service_account_info",
+        staticmethod(lambda info, scopes: SimpleNamespace(account=info["client_email"])),
+    )
+    # Un client factice par construction, relié aux credentials de son tenant
+    monkeypatch.setattr(pool_module, "create_thread_http", lambda creds: SimpleNamespace(account=creds.account))
+    monkeypatch.setattr(
+        discovery, "build_from_document", lambda doc, http, requestBuilder: SimpleNamespace(account=http.account)
+    )
+    pool = DriveClientPool(max_tenants=2)
+    monkeypatch.setattr(pool_module, "drive_client_pool", pool)
+    yield pool
+    setting_cache_module.setting_cache.invalidate()
+
+
+def _configure(db, user_id, account):
+    key = pool_module.credentials_key(user_id)
+    crud.setting.set_value(db, key, json.dumps({"client_email": account}))
+
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join(5)
+    return result[0]
+
+
+def test_each_thread_gets_its_own_client_per_tenant(db, pool):
+    _configure(db, None, "global@sa")
+    _configure(db, "u1", "u1@sa")
+
+    client = pool.get()
+    assert pool.get() is client
+    assert pool.get("u1") is not client and pool.get("u1").account == "u1@sa"
+    # httplib2 n'est pas thread-safe : un autre thread a son propre client
+    other = _in_thread(pool.get)
+    assert other is not client and other.account == "global@sa"
+    assert pool.get("u2") is None  # tenant non configuré
+    assert pool.stats()["clients_built"] == 3
+
+
+def test_tenants_are_bounded_lru(db, pool):
+    for user_id in ("u1", "u2", "u3"):
+        _configure(db, user_id, f"{user_id}@sa")
+    first = pool.get("u1")
+    pool.get("u2")
+    pool.get("u1")  # "u2" devient le moins récent
+    pool.get("u3")
+
+    stats = pool.stats()
+    assert (stats["tenants"], stats["evictions"]) == (2, 1)
+    assert pool.get("u1") is first
+    pool.get("u2")  # reconstruit, évince "u3"
+    assert pool.stats()["clients_built"] == 4
+
+
+def test_changed_credentials_evict_cached_client(db, pool):
+    user = SimpleNamespace(id=uuid.uuid4())
+    _configure(db, str(user.id), "old@sa")
+    _configure(db, None, "old-global@sa")
+    before, global_before = pool.get(str(user.id)), pool.get()
+
+    def _upload(content):
+        async def _read():
+            return json.dumps(content).encode()
+
+        return SimpleNamespace(filename="sa.json", read=_read)
+
+    asyncio.run(drive.upload_credentials(db=db, file=_upload({"client_email": "new@sa"}), current_user=user))
+    asyncio.run(admin_drive.upload_credentials(db=db, file=_upload({"client_email": "new-global@sa"}), current_user=user))
+
+    assert pool.stats()["evictions"] == 2
+    assert pool.get(str(user.id)) is not before and pool.get(str(user.id)).account == "new@sa"
+    assert pool.get() is not global_before and pool.get().account == "new-global@sa"
+
+    # Credentials modifiés par un autre chemin : détectés à l'empreinte du JSON
+    _configure(db, None, "rotated@sa")
+    assert pool.get().account == "rotated@sa"
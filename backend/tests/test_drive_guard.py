@@ -0,0 +1,148 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import drive_guard as guard_module
+from app.services.drive_guard import (
+    CircuitBreaker,
+    DriveGuard,
+    DriveUnavailableError,
+    TokenBucket,
+    classify,
+)
+
+
+class _HttpError(Exception):
+    """Forme de ``googleapiclient.errors.HttpError`` (resp.status + content)."""
+
+    def __init__(self, status, reason=None):
+        super().__init__(status)
+        self.resp = SimpleNamespace(status=status, get=lambda key, default=None: default)
+        self.content = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode() if reason else b""
+
+
+def _guard(max_retries=3, threshold=3):
+    return DriveGuard(
+        TokenBucket(rate=1000, burst=1000),
+        CircuitBreaker(threshold=threshold, reset_timeout=60),
+        max_retries=max_retries,
+        backoff_base=0.01,
+        backoff_max=0.01,
+    )
+
+
+@pytest.fixture(autouse=True)
+def _no_sleep(monkeypatch):
+    monkeypatch.setattr(guard_module.time, "sleep", lambda _s: None)
+
+
+def test_classify():
+    assert classify(_HttpError(429)) == "rate_limited"
+    assert classify(_HttpError(403, "userRateLimitExceeded")) == "rate_limited"
+    assert classify(_HttpError(403, "insufficientFilePermissions")) is None
+    assert classify(_HttpError(503)) == "unavailable"
+    assert classify(_HttpError(404)) is None
+    assert classify(ConnectionResetError()) == "unavailable"
+
+
+def test_retries_rate_limits_then_succeeds():
+    guard = _guard()
+    outcomes = [_HttpError(429), _HttpError(403, "rateLimitExceeded"), "ok"]
+
+    def _call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert guard.call(_call) == "ok"
+    assert guard.retries == 2
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_and_fails_fast():
+    guard = _guard(max_retries=1, threshold=2)
+    calls = []
+
+    def _down():
+        calls.append(1)
+        raise _HttpError(500)
+
+    with pytest.raises(DriveUnavailableError):
+        guard.call(_down)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    # Disjoncteur ouvert : plus aucun appel réseau
+    with pytest.raises(DriveUnavailableError):
+        guard.call(_down)
+    assert len(calls) == 2
+
+    # Une erreur définitive (404) n'est pas rejouée
+    guard.breaker.record_success()
+    with pytest.raises(_HttpError):
+        guard.call(lambda: (_ for _ in ()).throw(_HttpError(404)))
+
+
+def test_cancelled_trial_does_not_block_breaker():
+    guard = _guard(max_retries=0, threshold=1)
+    guard.breaker.reset_timeout = 0
+    with pytest.raises(DriveUnavailableError):
+        guard.call(lambda: (_ for _ in ()).throw(_HttpError(500)))
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    async def _cancelled():
+        raise asyncio.CancelledError()
+
+    # L'essai (demi-ouvert) est annulé : l'appel suivant peut essayer à son tour
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(guard.call_async(_cancelled))
+    with pytest.raises(KeyboardInterrupt):
+        guard.call(lambda: (_ for _ in ()).throw(KeyboardInterrupt()))
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_create_is_not_retried_blindly():
+    guard = _guard()
+    calls = []
+
+    def _create():
+        calls.append(1)
+        raise _HttpError(503)
+
+    # Sans moyen de retrouver le fichier : pas de nouvel essai
+    with pytest.raises(DriveUnavailableError):
+        guard.call_create(_create, None)
+    assert (len(calls), guard.retries) == (1, 0)
+
+    # Le premier essai avait créé le fichier : il est retrouvé, pas renvoyé
+    found = {"id": "created", "md5Checksum": "x"}
+    assert guard.call_create(_create, lambda: found) == found
+    assert len(calls) == 2
+
+
+def test_simple_upload_looks_for_created_file_before_resending(monkeypatch):
+    from googleapiclient.discovery import build
+    from googleapiclient.http import HttpMockSequence
+
+    from app.services.google_drive import GoogleDriveService
+
+    monkeypatch.setattr(guard_module.drive_guard.breaker, "threshold", 100)
+    md5 = "9a0364b9e99bb480dd25e1f0284c8555"  # md5("content")
+    listed = json.dumps({"files": [{"id": "created", "md5Checksum": md5}]})
+    http = HttpMockSequence([
+        ({"status": "503"}, ""),  # files.create : réponse perdue, fichier créé
+        ({"status": "200"}, listed),  # files.list par jeton
+    ])
+    service = build("drive", "v3", http=http, requestBuilder=guard_module.request_builder(), static_discovery=True)
+
+    assert GoogleDriveService._create_file(service, b"content", {"name": "doc.txt"}, "text/plain") == "created"
+    assert http._iterable == []
+
+    # Fichier absent : le create est renvoyé, avec un nouveau jeton par upload
+    created = json.dumps({"id": "second", "md5Checksum": md5})
+    http._iterable = [({"status": "503"}, ""), ({"status": "200"}, json.dumps({"files": []})), ({"status": "200"}, created)]
+    assert GoogleDriveService._create_file(service, b"content", {"name": "doc.txt"}, "text/plain") == "second"
+    assert http._iterable == []
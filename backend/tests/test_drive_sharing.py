@@ -0,0 +1,84 @@
+from app.services import google_drive
+from app.services.drive_sharing import DriveSharing
+from app.services.folder_cache import folder_cache
+
+
+class _FakeRequest:
+    def __init__(self, service, file_id):
+        self.service = service
+        self.file_id = file_id
+
+    def execute(self):
+        if self.file_id in self.service.refused:
+            raise RuntimeError("403 insufficientFilePermissions")
+        self.service.granted.append(self.file_id)
+        return {"id": "anyoneWithLink"}
+
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batches.append([request.file_id for _, request in self.requests])
+        for request_id, _ in self.requests:
+            self.callback(request_id, {"id": "anyoneWithLink"}, None)
+
+
+class _FakeService:
+    def __init__(self, refused=()):
+        self.batches = []
+        self.granted = []
+        self.refused = set(refused)
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(self, callback)
+
+    def permissions(self):
+        return self
+
+    def create(self, fileId, body, fields):
+        return _FakeRequest(self, fileId)
+
+
+def test_folder_mode_shares_managed_folders_once_and_batches_grants(monkeypatch):
+    service = _FakeService()
+    monkeypatch.setattr(google_drive.google_drive_service, "_get_service", lambda user_id=None: service)
+    monkeypatch.setattr(folder_cache, "path_for", lambda folder_id: ("", ["C", "P"]) if folder_id == "folder" else None)
+    sharing = DriveSharing(mode="folder", batch_delay=60, batch_size=100)
+
+    assert not sharing.file_needs_grant("folder")
+    assert not sharing.file_needs_grant("folder")
+    # Dossier inconnu du cache (racine configurée...) : partage du fichier
+    assert sharing.file_needs_grant("other")
+    sharing.grant("f1")
+    sharing.grant("f2")
+    sharing.stop(timeout=5)
+
+    assert service.granted == ["folder"]
+    assert service.batches == [["f1", "f2"]]
+    stats = sharing.stats()
+    assert (stats["grants"], stats["folders_shared"], stats["inherited"]) == (3, 1, 2)
+
+
+def test_folder_is_not_marked_shared_when_grant_fails(monkeypatch):
+    service = _FakeService(refused={"folder"})
+    monkeypatch.setattr(google_drive.google_drive_service, "_get_service", lambda user_id=None: service)
+    monkeypatch.setattr(folder_cache, "path_for", lambda folder_id: ("", ["C", "P"]))
+    sharing = DriveSharing(mode="folder", batch_delay=0, batch_size=100)
+
+    # Partage du dossier refusé : le fichier est partagé lui-même
+    assert sharing.file_needs_grant("folder")
+    assert sharing.stats()["folders_shared"] == 0
+
+    # Nouvel essai au fichier suivant, qui hérite cette fois du dossier
+    service.refused.clear()
+    assert not sharing.file_needs_grant("folder")
+    assert service.granted == ["folder"]
+    stats = sharing.stats()
+    assert (stats["folders_shared"], stats["failures"], stats["inherited"]) == (1, 1, 1)
@@ -0,0 +1,97 @@
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import drive_transport
+from app.services.drive_transport import _HttpxHttp, _RequestsHttp, create_shared_http, http2_available
+
+
+class _Credentials:
+    def __init__(self):
+        self.token = "old"
+        self.refreshed = 0
+
+    def before_request(self, request, method, url, headers):
+        self.apply(headers)
+
+    def apply(self, headers):
+        headers["authorization"] = f"Bearer {self.token}"
+
+    def refresh(self, request):
+        self.refreshed += 1
+        self.token = "new"
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    def _use(name):
+        monkeypatch.setattr(drive_transport.settings, "DRIVE_HTTP_TRANSPORT", name)
+
+    return _use
+
+
+def test_transport_is_chosen_from_settings(transport):
+    transport("httplib2")
+    assert create_shared_http(_Credentials()) is None
+    transport("inconnu")
+    assert create_shared_http(_Credentials()) is None
+    transport("requests")
+    assert isinstance(create_shared_http(_Credentials()), _RequestsHttp)
+    transport("httpx")
+    assert isinstance(create_shared_http(_Credentials()), _HttpxHttp)
+
+
+@pytest.mark.parametrize("name, module", [("httpx", "httpx"), ("requests", "google.auth.transport.requests")])
+def test_missing_package_falls_back_to_httplib2(transport, monkeypatch, name, module):
+    transport(name)
+    monkeypatch.setitem(sys.modules, module, None)  # import -> ImportError
+    assert create_shared_http(_Credentials()) is None
+
+
+def test_http2_requires_h2(monkeypatch):
+    monkeypatch.setitem(sys.modules, "h2", None)
+    assert not http2_available()
+    monkeypatch.setitem(sys.modules, "h2", SimpleNamespace())
+    assert http2_available()
+
+
+def test_httpx_adapter_maps_httplib2_calls_and_refreshes_on_401(transport):
+    transport("httpx")
+    seen = []
+
+    def _handler(request):
+        seen.append((request.method, str(request.url), request.headers["authorization"], request.content))
+        if request.headers["authorization"] == "Bearer old":
+            return httpx.Response(401)
+        return httpx.Response(200, headers={"Content-Type": "application/json", "X-Trace": "1"}, content=b'{"id": "f1"}')
+
+    creds = _Credentials()
+    http = create_shared_http(creds)
+    http.client = httpx.Client(transport=httpx.MockTransport(_handler))
+
+    resp, content = http.request("https://drive.test/files?fields=id", "POST", body=b"{}", headers={"x-a": "1"})
+
+    assert (resp.status, resp["content-type"], resp["x-trace"], content) == (200, "application/json", "1", b'{"id": "f1"}')
+    assert creds.refreshed == 1
+    assert seen == [
+        ("POST", "https://drive.test/files?fields=id", "Bearer old", b"{}"),
+        ("POST", "https://drive.test/files?fields=id", "Bearer new", b"{}"),
+    ]
+
+
+def test_requests_adapter_maps_httplib2_calls(transport):
+    transport("requests")
+    http = create_shared_http(_Credentials())
+    calls = []
+
+    def _request(method, uri, data, headers, timeout):
+        calls.append((method, uri, data, headers, timeout))
+        return SimpleNamespace(status_code=404, headers={"Content-Type": "text/plain"}, content=b"missing")
+
+    http.session = SimpleNamespace(request=_request)
+    resp, content = http.request("https://drive.test/files/x", headers={"x-a": "1"})
+
+    assert (resp.status, resp["content-type"], content) == (404, "text/plain", b"missing")
+    assert calls == [("GET", "https://drive.test/files/x", None, {"x-a": "1"}, http.timeout)]
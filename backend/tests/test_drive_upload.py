@@ -0,0 +1,59 @@
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+
+from app.services.drive_upload import ChecksumMismatchError, HashingReader, verify_md5
+
+
+def test_md5_survives_resent_chunks():
+    data = os.urandom(100_000)
+    reader = HashingReader(BytesIO(data))
+
+    assert reader.read_at(0, 40_000) == data[:40_000]
+    assert reader.md5() is None
+    # Reprise : Drive n'a reçu que 30 000 octets, le morceau suivant repart de là
+    assert reader.read_at(30_000, 40_000) == data[30_000:70_000]
+    reader.seek(70_000)
+    reader.read()
+
+    assert reader.md5() == hashlib.md5(data).hexdigest()
+
+
+def test_verify_md5():
+    reader = HashingReader(b"contenu")
+    reader.read()
+
+    verify_md5(reader, hashlib.md5(b"contenu").hexdigest(), "f1")
+    verify_md5(reader, None, "f1")  # Google Docs : pas de md5Checksum
+    with pytest.raises(ChecksumMismatchError):
+        verify_md5(reader, hashlib.md5(b"autre").hexdigest(), "f1")
+
+
+def test_corrupted_upload_is_purged_before_retry(monkeypatch):
+    from app.services import purge_queue
+    from app.services.drive_sharing import drive_sharing
+    from app.services.google_drive import GoogleDriveService
+
+    created = iter(["bad-1", "good", "bad-2", "bad-3"])
+    purged = []
+
+    def _create_file(service, file_obj, file_metadata, mime_type):
+        file_id = next(created)
+        if file_id.startswith("bad"):
+            raise ChecksumMismatchError(f"md5 différent pour {file_id}", file_id)
+        return file_id
+
+    drive = GoogleDriveService()
+    monkeypatch.setattr(drive, "_get_service", lambda user_id=None: object())
+    monkeypatch.setattr(drive, "_create_file", _create_file)
+    monkeypatch.setattr(drive_sharing, "grant", lambda file_id: None)
+    monkeypatch.setattr(purge_queue, "enqueue_orphan", lambda file_id, reason: purged.append(file_id))
+
+    assert drive.upload(b"contenu", "doc.docx", parent_id="folder") == "good"
+    assert purged == ["bad-1"]
+    # Deux envois corrompus : l'erreur remonte, aucun des deux fichiers ne reste sur Drive
+    with pytest.raises(ChecksumMismatchError):
+        drive.upload(b"contenu", "doc.docx", parent_id="folder")
+    assert purged == ["bad-1", "bad-2", "bad-3"]
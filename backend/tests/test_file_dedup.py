@@ -0,0 +1,64 @@
+import hashlib
+import uuid
+from io import BytesIO
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.services import file_dedup
+
+
+class _FakeStorage:
+    def __init__(self, files):
+        self.files = files
+
+    def get_md5(self, file_id):
+        return hashlib.md5(self.files[file_id]).hexdigest() if file_id in self.files else None
+
+
+def _product(db, user_id, folder_id):
+    product = models.Product(id=uuid.uuid4(), user_id=user_id, nom_client="C", drive_folder_id=folder_id)
+    db.add(product)
+    return product
+
+
+def test_identical_content_reuses_verified_file_of_same_product_tree(monkeypatch):
+    engine = create_engine("sqlite://")
+    for model in (models.Product, models.Attachment, models.Template):
+        model.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+
+    report = b"%PDF rapport SPF"
+    content = file_dedup.digest(BytesIO(report))
+    assert content == file_dedup.digest(report)
+    assert content.size == len(report)
+    monkeypatch.setattr(file_dedup, "storage", _FakeStorage({"drive-1": report, "drive-other": report}))
+
+    user_id = uuid.uuid4()
+    owner = _product(db, user_id, "folder-a")
+    same_tree = _product(db, user_id, "folder-a")
+    other_tree = _product(db, user_id, "folder-b")
+    other_user = _product(db, uuid.uuid4(), "folder-a")
+    assert file_dedup.find_existing(db, content, product=same_tree) is None
+    for file_id in ("drive-gone", "drive-1"):
+        db.add(models.Attachment(
+            id=uuid.uuid4(), product_id=owner.id, field_key="spf", file_name="spf.pdf",
+            drive_file_id=file_id, content_hash=content.sha256,
+        ))
+    db.commit()
+
+    # Le fichier supprimé de Drive est ignoré, l'autre est réutilisé dans le même dossier produit
+    assert file_dedup.find_existing(db, content, product=same_tree) == "drive-1"
+    assert file_dedup.find_existing(db, file_dedup.digest(b"autre contenu"), product=same_tree) is None
+    # Ni un autre dossier, ni un autre utilisateur, ni les modèles
+    assert file_dedup.find_existing(db, content, product=other_tree) is None
+    assert file_dedup.find_existing(db, content, product=other_user) is None
+    assert file_dedup.find_existing(db, content) is None
+
+    db.add(models.Template(
+        id=uuid.uuid4(), name="DIP", version="1", drive_file_id="drive-other", content_hash=content.sha256
+    ))
+    db.commit()
+    assert file_dedup.find_existing(db, content) == "drive-other"
+    assert file_dedup.find_existing(db, content, product=other_tree) is None
@@ -0,0 +1,106 @@
+import re
+import threading
+import time
+
+import pytest
+
+from app import crud
+from app.crud.crud_setting import setting as crud_setting
+from app.services import folder_cache as folder_cache_module
+from app.services.folder_cache import FolderPathCache
+from app.services.google_drive import google_drive_service
+
+
+class _Call:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result()
+
+
+class _FakeDrive:
+    """``files().list``/``files().create`` sur une arborescence en mémoire."""
+
+    def __init__(self):
+        self.folders = []  # (id, nom, parent)
+        self.created = 0
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def list(self, q, spaces, fields):
+        name = re.search(r"name='(.*)'", q).group(1)
+        parent = re.search(r"'(\S+)' in parents", q).group(1)
+
+        def _result():
+            time.sleep(0.01)  # laisse les autres threads arriver au même segment
+            with self._lock:
+                return {"files": [{"id": f[0]} for f in self.folders if f[1:] == (name, parent)]}
+
+        return _Call(_result)
+
+    def create(self, body, fields):
+        def _result():
+            with self._lock:
+                self.created += 1
+                folder_id = f"folder-{self.created}"
+                self.folders.append((folder_id, body["name"], body.get("parents", ["root"])[0]))
+            return {"id": folder_id}
+
+        return _Call(_result)
+
+
+@pytest.fixture
+def cache(monkeypatch, session_factory):
+    monkeypatch.setattr(folder_cache_module, "SessionLocal", session_factory)
+    cache = FolderPathCache()
+    monkeypatch.setattr(folder_cache_module, "folder_cache", cache)
+    return cache
+
+
+def test_memory_hit_then_db_hit_with_cold_memory(cache):
+    assert cache.get("root", ["C", "P"]) is None
+    cache.set("root", ["C", "P"], "folder-p")
+    assert cache.get("root", ["C", "P"]) == "folder-p"
+    assert (cache.hits, cache.db_hits, cache.misses) == (1, 0, 1)
+
+    # Autre processus (ou redémarrage) : mémoire vide, ligne drive_folders présente
+    cold = FolderPathCache()
+    assert cold.get("root", ["C", "P"]) == "folder-p"
+    assert cold.get("root", ["C", "P"]) == "folder-p"
+    assert (cold.hits, cold.db_hits, cold.misses) == (1, 1, 0)
+    assert cold.path_for("folder-p") == ("root", ["C", "P"])
+
+
+def test_remove_subtree_keeps_sibling_prefixes(db):
+    for path, folder_id in [("C/P", "p"), ("C/P/R", "r"), ("C/PX", "px"), ("C/P_", "underscore")]:
+        crud.drive_folder.set_folder_id(db, root_id="root", path=path, folder_id=folder_id)
+    crud.drive_folder.set_folder_id(db, root_id="root", path="C/P", folder_id="p2")
+
+    assert crud.drive_folder.remove_subtree(db, root_id="root", path="C/P") == 2
+    assert crud.drive_folder.get_by_folder_id(db, folder_id="px") is not None
+    assert crud.drive_folder.get_by_path(db, root_id="root", path="C/P_").folder_id == "underscore"
+
+
+def test_concurrent_ensure_folder_creates_each_folder_once(monkeypatch, cache):
+    drive = _FakeDrive()
+    monkeypatch.setattr(google_drive_service, "_get_service", lambda user_id=None: drive)
+    monkeypatch.setattr(crud_setting, "get_cached_value", lambda key, db=None: "root")
+    barrier = threading.Barrier(8)
+    results = []
+
+    def _ensure():
+        barrier.wait()
+        results.append(google_drive_service.ensure_folder(["Client", "Produit"]))
+
+    threads = [threading.Thread(target=_ensure) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert drive.created == 2
+    assert results == ["folder-2"] * 8
+    assert cache.get("root", ["Client"]) == "folder-1"
@@ -0,0 +1,93 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import crud, models
+from app.api.v1.endpoints.generations import _prepare_generation, read_generation
+from app.crud.crud_task import TaskStatus
+from app.services import generation_queue, generation_service
+from app.services.generation_queue import GenerationWorkerPool
+
+
+@pytest.fixture(autouse=True)
+def _worker_sessions(session_factory, monkeypatch):
+    monkeypatch.setattr(generation_queue, "SessionLocal", session_factory)
+
+
+def _queued_generation(db):
+    user = SimpleNamespace(id=uuid.uuid4())
+    product = models.Product(id=uuid.uuid4(), user_id=user.id, nom_client="C", nom_produit="P")
+    template = models.Template(id=uuid.uuid4(), name="DIP", version="1", drive_file_id="tpl")
+    db.add_all([product, template])
+    db.commit()
+    generation = _prepare_generation(
+        db, template_id=template.id, product_id=product.id, async_job=True, force=False, user_id=user.id
+    )
+    return user, generation
+
+
+def _pool(**kwargs):
+    options = {"workers": 1, "poll_interval": 0.01, "stale_after": 600, "heartbeat_interval": 60, "max_attempts": 3}
+    return GenerationWorkerPool(**{**options, **kwargs})
+
+
+def test_async_job_is_rendered_by_worker_with_heartbeat(db, monkeypatch):
+    user, generation = _queued_generation(db)
+    assert generation.status == "pending" and generation.drive_file_id is None
+    task = db.query(models.Task).one()
+    assert task.status == TaskStatus.QUEUED
+
+    def _render(db, **kwargs):
+        time.sleep(0.1)  # rendu long : la tâche doit donner signe de vie
+        return "drive-doc"
+
+    touches = []
+    monkeypatch.setattr(generation_service, "render_and_upload", _render)
+    monkeypatch.setattr(crud.task, "touch", lambda db, task_id: touches.append(task_id))
+
+    pool = _pool(heartbeat_interval=0.02)
+    assert pool.run_once() is True
+    assert pool.run_once() is False
+    assert touches and set(touches) == {task.id}
+
+    db.expire_all()
+    assert (task.status, task.attempts, task.result) == (TaskStatus.SUCCESS, 1, "drive-doc")
+    assert db.get(models.Generation, generation.id).drive_file_id == "drive-doc"
+    assert asyncio.run(read_generation(db=db, generation_id=generation.id, current_user=user)).id == generation.id
+
+
+def test_touch_refreshes_only_running_tasks(db):
+    _, generation = _queued_generation(db)
+    task = db.query(models.Task).one()
+    assert crud.task.touch(db, task_id=task.id) is False
+
+    task.status, task.updated_at = TaskStatus.RUNNING, datetime(2020, 1, 1)
+    db.commit()
+    assert crud.task.touch(db, task_id=task.id) is True
+    db.expire_all()
+    assert task.updated_at.year > 2020
+
+
+def test_job_reclaimed_too_many_times_is_abandoned(db, monkeypatch):
+    _, generation = _queued_generation(db)
+    task = db.query(models.Task).one()
+    task.attempts = 3  # trois reprises après des workers tombés en cours de rendu
+    db.commit()
+    monkeypatch.setattr(generation_service, "render_and_upload", lambda db, **kwargs: pytest.fail("relancé"))
+
+    assert _pool(max_attempts=3).run_once() is True
+    db.expire_all()
+    assert task.status == TaskStatus.ERROR
+    assert db.get(models.Generation, generation.id).status == "error"
+
+
+def test_read_generation_is_limited_to_owner(db):
+    _, generation = _queued_generation(db)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(read_generation(db=db, generation_id=generation.id, current_user=SimpleNamespace(id=uuid.uuid4())))
+    assert exc.value.status_code == 404
@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.db.base import Base
+from app.api.v1.endpoints.generations import _prepare_generation
+from app.services import generation_batch
+from app.services.generation_service import build_context, context_hash
+
+
+@pytest.fixture(autouse=True)
+def _uuid_lookups(monkeypatch):
+    # Les crud reçoivent des id texte, que le type UUID refuse sous SQLite
+    def _by_id(model):
+        return lambda db, id: db.get(model, uuid.UUID(str(id)))
+
+    monkeypatch.setattr(crud.template, "get", _by_id(models.Template))
+    monkeypatch.setattr(crud.product, "get", _by_id(models.Product))
+    monkeypatch.setattr(
+        crud.attachment,
+        "get_multi_by_product",
+        lambda db, product_id: db.query(models.Attachment).filter_by(product_id=uuid.UUID(str(product_id))).all(),
+    )
+
+
+def _setup():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime(2024, 1, 1)
+    product = models.Product(
+        id=uuid.uuid4(), user_id=uuid.uuid4(), nom_client="C", nom_produit="P",
+        progression=0, tox_nanomaterials=False, status="DRAFT", created_at=now, updated_at=now,
+    )
+    template = models.Template(id=uuid.uuid4(), name="DIP", version="1", drive_file_id="tpl")
+    attachment = models.Attachment(
+        id=uuid.uuid4(), product_id=product.id, field_key="spf", alias="test_spf",
+        file_name="test_spf.pdf", drive_file_id="spf", uploaded_at=now,
+    )
+    db.add_all([product, template, attachment])
+    db.commit()
+    return db, product, template, attachment
+
+
+def _generation(db, product, template, ctx_hash, **fields):
+    generation = models.Generation(
+        id=uuid.uuid4(), product_id=product.id, template_id=template.id, context_hash=ctx_hash,
+        **{"format": "docx", "status": "pending", "drive_file_id": "docx", **fields},
+    )
+    db.add(generation)
+    db.commit()
+    return generation
+
+
+def _prepare(db, product, template, force=False):
+    return _prepare_generation(
+        db, template_id=template.id, product_id=product.id, async_job=False, force=force, user_id=product.user_id
+    )
+
+
+def test_context_hash_ignores_resolved_thumbnail_and_product_timestamp():
+    db, product, template, attachment = _setup()
+    before = context_hash(build_context(db, product), template)
+
+    attachment.url = "https://drive.example/thumbnail"
+    product.updated_at = datetime(2024, 6, 1)
+    db.commit()
+    assert context_hash(build_context(db, product), template) == before
+
+    attachment.file_name = "spf-v2.pdf"
+    db.commit()
+    assert context_hash(build_context(db, product), template) != before
+
+
+def test_rendered_docx_is_reused_unless_forced_validated_or_finalized():
+    db, product, template, _ = _setup()
+    ctx_hash = context_hash(build_context(db, product), template)
+
+    # Rien à réutiliser : le contexte est renvoyé pour un rendu
+    assert not isinstance(_prepare(db, product, template), models.Generation)
+
+    rendered = _generation(db, product, template, ctx_hash)
+    assert _prepare(db, product, template) == rendered
+    assert not isinstance(_prepare(db, product, template, force=True), models.Generation)
+
+    # Validé (PDF) ou finalisé (fichier de l'utilisateur) : plus un rendu de ce contexte
+    rendered.format, rendered.status = "pdf", "success"
+    _generation(db, product, template, ctx_hash, status="success", drive_file_id="edited")
+    _generation(db, product, template, ctx_hash, status="error", drive_file_id=None)
+    assert not isinstance(_prepare(db, product, template), models.Generation)
+
+
+def test_batch_reports_queued_generation_as_pending(monkeypatch):
+    db, product, template, _ = _setup()
+    ctx_hash = context_hash(build_context(db, product), template)
+    queued = _generation(db, product, template, ctx_hash, drive_file_id=None)
+    queued_id = str(queued.id)
+    monkeypatch.setattr(generation_batch, "SessionLocal", lambda: db)
+    monkeypatch.setattr(generation_batch, "download_template", lambda template: b"tpl")
+
+    items = list(generation_batch.run_batch([product.id], [template.id], user_id=product.user_id))
+
+    assert [(i["status"], i["generation_id"], i["drive_file_id"]) for i in items] == [("pending", queued_id, None)]
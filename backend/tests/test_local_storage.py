@@ -0,0 +1,51 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+
+from app.services.local_storage import LocalStorageBackend
+
+
+def test_upload_in_folder_hierarchy(tmp_path):
+    storage = LocalStorageBackend(str(tmp_path))
+    folder_id = storage.ensure_folder(["Client", "Produit", "REF/1"])
+    assert folder_id == "Client/Produit/REF_1"
+
+    first = storage.upload(BytesIO(b"v1"), "doc.pdf", parent_id=folder_id)
+    second = storage.upload(b"v2", "doc.pdf", parent_id=folder_id)
+
+    assert first == "Client/Produit/REF_1/doc.pdf"
+    assert second == "Client/Produit/REF_1/doc (2).pdf"
+    assert storage.download(second) == b"v2"
+    assert storage.get_md5(first) == hashlib.md5(b"v1").hexdigest()
+    # Pas de fichier temporaire laissé dans le dossier
+    assert sorted(p.name for p in (tmp_path / folder_id).iterdir()) == ["doc (2).pdf", "doc.pdf"]
+
+    storage.delete(first)
+    storage.delete(first)
+    assert storage.download(first) == b""
+    assert storage.get_md5(first) is None
+
+
+def test_ids_cannot_escape_root(tmp_path):
+    storage = LocalStorageBackend(str(tmp_path / "root"))
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+
+    with pytest.raises(FileNotFoundError):
+        storage.path_for("../secret.txt")
+    assert storage.download("../secret.txt") == b""
+    assert storage.check_signature("a.pdf", storage.sign("a.pdf"))
+    assert not storage.check_signature("b.pdf", storage.sign("a.pdf"))
+
+
+def test_delete_many_removes_folder_trees(tmp_path):
+    storage = LocalStorageBackend(str(tmp_path))
+    product_id = storage.ensure_folder(["Client", "Produit"])
+    doc_id = storage.upload(b"doc", "doc.pdf", parent_id=storage.ensure_folder(["Client", "Produit", "REF"]))
+    other_id = storage.upload(b"autre", "autre.pdf", parent_id=storage.ensure_folder(["Client", "Autre"]))
+
+    failures = storage.delete_many([doc_id, product_id, "absent.pdf", "."])
+
+    assert list(failures) == ["."]  # la racine n'est jamais supprimée
+    assert not (tmp_path / product_id).exists()
+    assert storage.download(other_id) == b"autre"
@@ -0,0 +1,41 @@
+import pytest
+
+from app.services.pdf_cache import ConvertedPdfCache, version_of
+
+
+def test_pdf_is_served_only_for_the_same_version(tmp_path):
+    cache = ConvertedPdfCache(str(tmp_path), max_bytes=1024)
+    assert version_of({"modifiedTime": "2024-01-01T00:00:00Z"}) == "2024-01-01T00:00:00Z"
+    cache.put("f1", "md5-a", b"%PDF-a")
+    assert cache.get("f1", "md5-a") == b"%PDF-a"
+    assert cache.get("f1", "md5-b") is None
+    # Version inconnue : rien n'est mis en cache
+    cache.put("f2", None, b"%PDF-x")
+    assert cache.get("f2", None) is None
+
+
+def test_copy_fallback_is_remembered_across_instances(tmp_path):
+    cache = ConvertedPdfCache(str(tmp_path), max_bytes=1024)
+    assert not cache.needs_copy("f1")
+    cache.put("f1", "md5-a", b"%PDF-a", via_copy=True)
+
+    reloaded = ConvertedPdfCache(str(tmp_path), max_bytes=1024)
+    assert reloaded.needs_copy("f1")
+    reloaded.discard("f1")
+    assert not reloaded.needs_copy("f1")
+    assert reloaded.stats()["exports_skipped"] == 1
+
+
+def test_pdf_cache_refuses_a_directory_owned_by_another_cache(tmp_path):
+    from app.services.template_cache import TemplateCache
+
+    templates = TemplateCache(str(tmp_path / "templates"), max_bytes=1024, revalidate_after=60)
+    templates.prime("tpl", "1", b"docx bytes")
+    with pytest.raises(ValueError):
+        ConvertedPdfCache(str(tmp_path / "templates"), max_bytes=4).put("f1", "md5-a", b"%PDF-a")
+    # Le modèle n'a pas été évincé par le budget du cache PDF
+    assert templates.store.get("tpl@1") == b"docx bytes"
+
+    pdfs = ConvertedPdfCache(str(tmp_path / "pdf"), max_bytes=4)
+    pdfs.put("f1", "md5-a", b"%PDF-a")
+    assert templates.store.get("tpl@1") == b"docx bytes"
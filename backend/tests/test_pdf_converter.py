@@ -0,0 +1,25 @@
+import json
+from types import SimpleNamespace
+
+from app.services import pdf_converter
+
+
+def test_cli_conversion_exports_bookmarks_as_destinations(monkeypatch, tmp_path):
+    calls = []
+
+    class _Process:
+        def __init__(self, args, **kwargs):
+            calls.append(args)
+
+        def wait(self, timeout=None):
+            return 0
+
+    monkeypatch.setattr(pdf_converter.subprocess, "Popen", _Process)
+    pool = SimpleNamespace(work_dir=str(tmp_path), soffice="soffice")
+    worker = pdf_converter._Worker(pool, 0)
+    worker._convert_cli(str(tmp_path / "input.docx"), str(tmp_path / "input.pdf"))
+
+    target = calls[0][calls[0].index("--convert-to") + 1]
+    name, options = target.split(":", 2)[:2], json.loads(target.split(":", 2)[2])
+    assert name == ["pdf", "writer_pdf_Export"]
+    assert options["ExportBookmarksToPDFDestination"] == {"type": "boolean", "value": "true"}
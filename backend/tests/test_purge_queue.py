@@ -0,0 +1,175 @@
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app import models, schemas
+from app.api.v1.endpoints import products as products_endpoint
+from app.crud import crud_drive_deletion
+from app.crud.crud_drive_deletion import DeletionStatus
+from app.services import google_drive, purge_queue
+from app.services.purge_queue import PurgeWorker, enqueue_deletion
+
+
+class _Storage:
+    def __init__(self, failures=None):
+        self.calls = []
+        self.failures = failures or {}
+
+    def delete_many(self, file_ids):
+        self.calls.append(list(file_ids))
+        return {file_id: self.failures[file_id] for file_id in file_ids if file_id in self.failures}
+
+
+@pytest.fixture(autouse=True)
+def _purge_sessions(session_factory, monkeypatch):
+    monkeypatch.setattr(purge_queue, "SessionLocal", session_factory)
+    monkeypatch.setattr(purge_queue.purge_worker, "wake", lambda: None)
+    # SQLite ne sait pas ajouter un intervalle à CURRENT_TIMESTAMP : horloge Python
+    now = lambda: datetime.now(timezone.utc).replace(tzinfo=None)  # noqa: E731
+    monkeypatch.setattr(crud_drive_deletion, "func", SimpleNamespace(now=now, count=crud_drive_deletion.func.count))
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    from app.services import storage as storage_module
+
+    fake = _Storage()
+    monkeypatch.setattr(storage_module, "storage", fake)
+    return fake
+
+
+def _worker(max_attempts=3):
+    return PurgeWorker(batch_size=10, poll_interval=1, stale_after=300, max_attempts=max_attempts)
+
+
+def _product(db, user_id, folder_id, attachments=()):
+    product = models.Product(id=uuid.uuid4(), user_id=user_id, nom_client="C", nom_produit="P", drive_folder_id=folder_id)
+    db.add(product)
+    for file_id in attachments:
+        db.add(models.Attachment(product_id=product.id, field_key="spf", alias="spf", file_name="spf.pdf", drive_file_id=file_id))
+    return product
+
+
+def _queue(db):
+    return sorted((row.file_id, row.status, row.attempts) for row in db.query(models.DriveDeletion))
+
+
+def test_run_once_skips_ids_still_referenced(db, storage):
+    user_id = uuid.uuid4()
+    # Annexe dédupliquée partagée par deux produits du même dossier
+    _product(db, user_id, "folder-shared", attachments=["dedup-file"])
+    enqueue_deletion(db, ["dedup-file", "folder-shared", "orphan"], reason="product")
+    db.commit()
+
+    worker = _worker()
+    assert worker.run_once() is True
+    assert storage.calls == [["orphan"]]
+    assert (worker.deleted, worker.skipped) == (1, 2)
+    assert _queue(db) == []
+    assert worker.run_once() is False
+
+
+def test_failed_deletions_back_off_until_max_attempts(db, storage, monkeypatch):
+    storage.failures = {"flaky": RuntimeError("503 backendError")}
+    delays = []
+    monkeypatch.setattr(PurgeWorker, "retry_delay", staticmethod(lambda attempts, exc: delays.append(attempts) or 60))
+    enqueue_deletion(db, ["flaky", "fine"], reason="generation")
+    db.commit()
+
+    worker = _worker(max_attempts=2)
+    worker.run_once()
+    db.expire_all()
+    assert _queue(db) == [("flaky", DeletionStatus.QUEUED, 1)]
+    assert db.query(models.DriveDeletion).one().last_error == "503 backendError"
+    # Replanifiée dans 60 s : rien n'est dû pour l'instant
+    assert worker.run_once() is False
+
+    # Délai écoulé : deuxième échec, abandon (la ligne reste pour diagnostic)
+    db.query(models.DriveDeletion).update({"next_attempt_at": models.DriveDeletion.created_at})
+    db.commit()
+    worker.run_once()
+    db.expire_all()
+    assert _queue(db) == [("flaky", DeletionStatus.ERROR, 2)]
+    assert delays == [0, 1]
+    assert worker.failures == 2
+    assert worker.run_once() is False
+
+
+def test_retry_delay_grows_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(purge_queue.settings, "PURGE_RETRY_BASE", 30.0)
+    monkeypatch.setattr(purge_queue.settings, "PURGE_RETRY_MAX", 100.0)
+    rate_limited = HttpError(httplib2.Response({"status": 429, "retry-after": "300"}), b"")
+    assert [PurgeWorker.retry_delay(n, RuntimeError()) for n in range(4)] == [30, 60, 100, 100]
+    assert PurgeWorker.retry_delay(0, rate_limited) == 300
+
+
+class _FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.ids = []
+
+    def add(self, request, request_id):
+        self.ids.append(request_id)
+
+    def execute(self):
+        for file_id in self.ids:
+            status = 404 if file_id == "already-gone" else 200
+            error = HttpError(httplib2.Response({"status": status}), b"") if status != 200 else None
+            self.callback(file_id, None, error)
+
+
+class _FakeDrive:
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(callback)
+
+    def files(self):
+        return self
+
+    def delete(self, fileId):
+        return fileId
+
+
+def test_drive_404_counts_as_deleted(db, monkeypatch):
+    from app.services import storage as storage_module
+
+    drive = google_drive.GoogleDriveService()
+    monkeypatch.setattr(drive, "_get_service", lambda user_id=None: _FakeDrive())
+    monkeypatch.setattr(storage_module, "storage", drive)
+    enqueue_deletion(db, ["already-gone", "present"], reason="attachment")
+    db.commit()
+
+    worker = _worker()
+    worker.run_once()
+    assert (worker.deleted, worker.failures) == (2, 0)
+    assert _queue(db) == []
+
+
+def test_bulk_delete_enqueues_in_the_callers_transaction(db, monkeypatch):
+    user = SimpleNamespace(id=uuid.uuid4())
+    first = _product(db, user.id, "folder-1", attachments=["spf-1"])
+    second = _product(db, user.id, "folder-2", attachments=["spf-2"])
+    db.commit()
+    payload = schemas.ProductBulkDelete(product_ids=[first.id, second.id])
+    # Le cache des dossiers ouvre ses propres sessions (connexion SQLite partagée ici)
+    forgotten = []
+    monkeypatch.setattr(purge_queue, "_forget_folder", forgotten.append)
+
+    # Échec au milieu : rien n'est validé, ni suppression ni purge
+    delete = db.delete
+    monkeypatch.setattr(db, "delete", lambda obj: delete(obj) if obj is first else (_ for _ in ()).throw(RuntimeError()))
+    with pytest.raises(RuntimeError):
+        products_endpoint.bulk_delete_products(db=db, payload=payload, current_user=user)
+    db.rollback()
+    assert db.query(models.Product).count() == 2
+    assert _queue(db) == []
+
+    monkeypatch.setattr(db, "delete", delete)
+    result = products_endpoint.bulk_delete_products(db=db, payload=payload, current_user=user)
+    assert result.queued_files == 4
+    assert db.query(models.Product).count() == 0
+    assert [file_id for file_id, _, _ in _queue(db)] == ["folder-1", "folder-2", "spf-1", "spf-2"]
+    assert forgotten[-2:] == ["folder-1", "folder-2"]
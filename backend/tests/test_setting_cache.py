@@ -0,0 +1,21 @@
+from app.services.setting_cache import SettingCache
+
+
+def test_value_loaded_during_invalidate_is_not_cached(monkeypatch):
+    cache = SettingCache(ttl=60)
+    stored = {"drive_root_folder_id": "old"}
+
+    def _load(db, key):
+        value = stored[key]
+        # Modification (set_value + invalidate) pendant la lecture
+        stored[key] = "new"
+        cache.invalidate(key)
+        return value
+
+    monkeypatch.setattr(cache, "_load", _load)
+    assert cache.get("drive_root_folder_id", db=object()) == "old"
+
+    monkeypatch.setattr(cache, "_load", lambda db, key: stored[key])
+    assert cache.get("drive_root_folder_id", db=object()) == "new"
+    assert cache.get("drive_root_folder_id", db=object()) == "new"
+    assert (cache.hits, cache.misses) == (1, 2)
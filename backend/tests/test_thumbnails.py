@@ -0,0 +1,91 @@
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.services import storage as storage_module
+from app.services import thumbnails
+from app.services.thumbnails import ThumbnailResolver
+
+
+class _FakeStorage:
+    def __init__(self):
+        self.ready: set[str] = set()
+        self.calls = []
+
+    def get_thumbnail_urls(self, file_ids):
+        self.calls.append(sorted(file_ids))
+        return {file_id: f"thumb/{file_id}" if file_id in self.ready else None for file_id in file_ids}
+
+    def get_thumbnail_url(self, file_id):
+        return f"preview/{file_id}"
+
+
+def test_links_are_resolved_in_batches_and_refreshed_until_available(monkeypatch):
+    engine = create_engine("sqlite://")
+    models.Attachment.__table__.create(engine)
+    models.Template.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(thumbnails, "SessionLocal", Session)
+    fake = _FakeStorage()
+    monkeypatch.setattr(storage_module, "storage", fake)
+
+    db = Session()
+    product_id = uuid.uuid4()
+    for file_id in ("a", "a", "b"):
+        db.add(models.Attachment(
+            id=uuid.uuid4(), product_id=product_id, field_key="spf", file_name="spf.pdf", drive_file_id=file_id
+        ))
+    db.add(models.Template(id=uuid.uuid4(), name="DIP", version="1", drive_file_id="t"))
+    db.commit()
+
+    resolver = ThumbnailResolver(resolve_delay=0, refresh_interval=60, batch_size=2, max_attempts=3)
+    fake.ready = {"a", "t"}
+    assert resolver.run_once() == 3
+    assert fake.calls == [["a", "b"], ["t"]]
+
+    # Miniature toujours absente : relancée, puis lien d'aperçu par défaut
+    assert resolver.run_once() == 0
+    assert resolver.run_once() == 1
+    db.expire_all()
+    assert sorted(a.url for a in db.query(models.Attachment)) == ["preview/b", "thumb/a", "thumb/a"]
+    assert db.query(models.Template).one().thumbnail_url == "thumb/t"
+    assert resolver.stats()["fallbacks"] == 1
+
+
+def test_ids_missing_from_answer_are_deferred_not_counted(monkeypatch):
+    engine = create_engine("sqlite://")
+    models.Attachment.__table__.create(engine)
+    models.Template.__table__.create(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(thumbnails, "SessionLocal", Session)
+    fake = _FakeStorage()
+    monkeypatch.setattr(storage_module, "storage", fake)
+    clock = [1000.0]
+    monkeypatch.setattr(thumbnails.time, "monotonic", lambda: clock[0])
+
+    db = Session()
+    db.add(models.Attachment(id=uuid.uuid4(), product_id=uuid.uuid4(), field_key="spf", file_name="spf.pdf", drive_file_id="a"))
+    db.commit()
+
+    resolver = ThumbnailResolver(resolve_delay=0, refresh_interval=60, batch_size=10, max_attempts=1)
+    # Panne Drive : l'ID n'est pas dans la réponse, ce n'est pas un essai
+    answer = fake.get_thumbnail_urls
+    monkeypatch.setattr(fake, "get_thumbnail_urls", lambda file_ids: fake.calls.append(sorted(file_ids)) or {})
+    assert resolver.run_once() == 0
+    assert resolver.stats()["fallbacks"] == 0
+    assert resolver.stats()["deferred"] == 1
+
+    # Réveil avant la relance suivante : le fichier n'est pas réinterrogé
+    assert resolver.run_once() == 0
+    assert fake.calls == [["a"]]
+
+    # Drive rétabli, miniature prête : le vrai lien, pas le repli
+    clock[0] += 60
+    monkeypatch.setattr(fake, "get_thumbnail_urls", answer)
+    fake.ready = {"a"}
+    assert resolver.run_once() == 1
+    db.expire_all()
+    assert db.query(models.Attachment).one().url == "thumb/a"
+    assert (resolver.stats()["fallbacks"], resolver.stats()["deferred"]) == (0, 0)